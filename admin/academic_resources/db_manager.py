@@ -5,6 +5,7 @@ import re
 from functools import wraps
 from PyQt5.QtWidgets import QMessageBox
 from config.utils_constants import DATABASE_PATH
+from config.db_connection import get_connection
 
 class DatabaseManager:
     """
@@ -18,28 +19,18 @@ class DatabaseManager:
         with cls._lock:
             if cls._instance is None:
                 cls._instance = super(DatabaseManager, cls).__new__(cls)
-                cls._instance.db_path = db_path
-                cls._instance.connection_pool = []
-                cls._instance.max_connections = 5  # Maximum number of connections in the pool
+                cls._instance.db_path = db_path or DATABASE_PATH
             elif db_path and cls._instance.db_path != db_path:
                 cls._instance.db_path = db_path
         return cls._instance
     
     def get_connection(self):
-        """Get a connection from the pool or create a new one if needed"""
-        if not self.connection_pool:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row  # Enable row factory for named columns
-            return conn
-        else:
-            return self.connection_pool.pop()
+        """Get a handle to this thread's shared connection (rows support named columns)"""
+        return get_connection(self.db_path, row_factory=sqlite3.Row)
     
     def release_connection(self, conn):
-        """Return a connection to the pool"""
-        if len(self.connection_pool) < self.max_connections:
-            self.connection_pool.append(conn)
-        else:
-            conn.close()
+        """Release a connection handle obtained from get_connection"""
+        conn.close()
 
     def execute_query(self, query, params=(), fetchone=False, fetchall=False, commit=False):
         """
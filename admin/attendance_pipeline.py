@@ -0,0 +1,567 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import cv2
+from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtGui import QImage
+
+from admin.face_quality import FaceQualityScorer, QualityStats
+from admin.face_recognition_service import (
+    prepare_detection, locate_faces_scaled, face_crops, encode_face_crops, measure_detection_speedup
+)
+
+
+class DropOldestQueue:
+    """
+    Bounded frame queue that never blocks the producer.
+
+    When the queue is full the oldest frame is discarded, so consumers always
+    work on the most recent frames instead of an ever-growing backlog.
+    """
+
+    def __init__(self, maxsize=2):
+        self._items = deque(maxlen=maxsize)
+        self._condition = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        """Add an item, dropping the oldest one if the queue is full"""
+        with self._condition:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """Return the oldest item, or None if nothing arrived within timeout"""
+        with self._condition:
+            if not self._items and not self._closed:
+                self._condition.wait(timeout)
+            if self._items:
+                return self._items.popleft()
+            return None
+
+    def close(self):
+        """Mark the queue as finished and wake up any waiting consumer"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    @property
+    def closed(self):
+        with self._condition:
+            return self._closed and not self._items
+
+
+class FrameCaptureThread(threading.Thread):
+    """Reads frames from the camera as fast as it delivers them"""
+
+    def __init__(self, cap, frame_queue):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.frame_queue = frame_queue
+        self._stop_event = threading.Event()
+        self.frames_read = 0
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                ret, frame = self.cap.read()
+                if not ret:
+                    print("❌ Camera stopped delivering frames")
+                    break
+                self.frame_queue.put((self.frames_read, time.time(), frame))
+                self.frames_read += 1
+        finally:
+            self.frame_queue.close()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class RecognitionWorker(QThread):
+    """
+    Staged live recognition pipeline.
+
+    Frames flow capture thread -> drop-oldest queue -> detect/encode pool ->
+    matcher (this thread) -> Qt signals. Detection and encoding run on a pool
+    of worker processes so throughput scales with cores, while the GUI thread
+    only receives finished, annotated frames and recognition results. To keep
+    the cost of sending work to the processes low, this thread converts and
+    downscales each frame, the pool detects on the small frame and returns
+    boxes, and only padded face crops are sent back to it for encoding.
+
+    When a FaceTracker is supplied the worker runs in tracking mode instead:
+    full detection only happens every few frames, trackers carry identities
+    in between and only faces without a confirmed identity are encoded.
+
+    In both modes faces that fail the quality gate in the detection options
+    are never encoded; how many were checked and rejected, by reason, is
+    kept in quality_stats and included in the emitted stats.
+    """
+    frame_ready = pyqtSignal(QImage)
+    faces_processed = pyqtSignal(object, list)
+    stats_updated = pyqtSignal(dict)
+    capture_stopped = pyqtSignal()
+    detection_calibrated = pyqtSignal(dict)
+
+    def __init__(self, cap, face_service, gallery, tolerance, workers=None, tracker=None, parent=None):
+        """
+        Initialize the pipeline
+
+        Args:
+            cap: Opened cv2.VideoCapture
+            face_service (FaceRecognitionService): Service used for matching
+            gallery (FaceGallery): Known faces to match against
+            tolerance (float): Recognition tolerance
+            workers (int): Detect/encode pool size, defaults to one per spare core
+            tracker (FaceTracker): Enables tracking mode when given
+        """
+        super().__init__(parent)
+        self.cap = cap
+        self.face_service = face_service
+        self.gallery = gallery
+        self.tolerance = tolerance
+        self.workers = workers or max(1, min(4, (os.cpu_count() or 2) - 1))
+        self.tracker = tracker
+        self.detection_options = face_service.detection_options()
+        self.quality_scorer = self.detection_options.get('quality')
+        self.quality_stats = QualityStats()
+        self._running = True
+        self._gallery_changed = False
+        self._calibration = None
+
+    def set_gallery(self, gallery):
+        """Swap the gallery used for matching; takes effect on the next frame"""
+        self.gallery = gallery
+        self._gallery_changed = True
+
+    def start(self, *args, **kwargs):
+        # Set before the thread exists, so a stop() that comes before run() is scheduled sticks
+        self._running = True
+        super().start(*args, **kwargs)
+
+    def stop(self):
+        """Ask the pipeline to finish; call wait() to block until it has"""
+        self._running = False
+
+    def _create_executor(self):
+        """Prefer worker processes, fall back to threads where they are unavailable"""
+        try:
+            return ProcessPoolExecutor(max_workers=self.workers)
+        except (OSError, NotImplementedError) as e:
+            print(f"⚠️ Process pool unavailable ({e}), using threads for detection")
+            return ThreadPoolExecutor(max_workers=self.workers)
+
+    def _start_calibration(self, executor, frame):
+        """Time full vs scaled detection once, on the first real frame"""
+        if self.detection_options.get('detection_scale', 1.0) < 1.0:
+            self._calibration = executor.submit(measure_detection_speedup, frame,
+                                                self.detection_options)
+
+    def _check_calibration(self):
+        """Emit the calibration result once it is available"""
+        if self._calibration is None or not self._calibration.done():
+            return
+        try:
+            self.detection_calibrated.emit(self._calibration.result())
+        except Exception as e:
+            print(f"⚠️ Detection calibration failed: {e}")
+        self._calibration = None
+
+    def run(self):
+        frame_queue = DropOldestQueue(maxsize=self.workers + 1)
+        capture = FrameCaptureThread(self.cap, frame_queue)
+        executor = self._create_executor()
+        capture.start()
+
+        try:
+            if self.tracker is not None:
+                self._run_tracking(frame_queue, executor)
+            else:
+                self._run_pipelined(frame_queue, executor)
+        finally:
+            capture.stop()
+            capture.join(timeout=2)
+            if self._calibration is not None:
+                self._calibration.cancel()
+                self._calibration = None
+            executor.shutdown(wait=True)
+
+    def _submit_frame(self, executor, frame):
+        """
+        Start detection of a frame on the pool
+
+        Returns:
+            dict: Frame job with 'low_light', the full 'rgb_frame' (kept here),
+                  the 'detection' future and, later, the 'encoding' future
+        """
+        job = {'low_light': False, 'rgb_frame': None, 'detection': None, 'encoding': None,
+               'face_locations': [], 'rejected_faces': []}
+        prepared = prepare_detection(frame, self.detection_options)
+        if prepared is None:
+            job['low_light'] = True
+            return job
+        job['rgb_frame'], detection_frame, scale = prepared
+        job['detection'] = executor.submit(locate_faces_scaled, detection_frame, scale,
+                                           job['rgb_frame'].shape, self.detection_options.get('model', "hog"))
+        return job
+
+    def _start_encoding(self, executor, job):
+        """Quality-check a job's detected faces and send crops of the good ones for encoding"""
+        face_locations = job['detection'].result()
+        job['detection'] = None
+        if self.quality_scorer is not None and face_locations:
+            face_locations, job['rejected_faces'] = self.quality_scorer.filter(job['rgb_frame'], face_locations)
+        job['face_locations'] = face_locations
+        if face_locations:
+            job['encoding'] = executor.submit(encode_face_crops, face_crops(job['rgb_frame'], face_locations))
+
+    @staticmethod
+    def _job_done(job):
+        return job['detection'] is None and (job['encoding'] is None or job['encoding'].done())
+
+    @staticmethod
+    def _cancel_job(job):
+        for future in (job['detection'], job['encoding']):
+            if future is not None:
+                future.cancel()
+
+    def _run_pipelined(self, frame_queue, executor):
+        """Detect and encode every frame, spread over the worker pool"""
+        pending = deque()
+        stats = _ThroughputStats(self.workers)
+        first_frame = True
+
+        try:
+            while self._running:
+                self._check_calibration()
+
+                # Finished detections go on to encoding right away
+                for job in pending:
+                    detection = job['detection']
+                    if detection is not None and detection.done() and detection.exception() is None:
+                        self._start_encoding(executor, job)
+
+                # Keep every detection worker busy with the newest frames
+                if len(pending) < self.workers:
+                    item = frame_queue.get(timeout=0.01 if pending else 0.2)
+                    if item is not None:
+                        index, captured_at, frame = item
+                        if first_frame:
+                            self._start_calibration(executor, frame)
+                            first_frame = False
+                        job = self._submit_frame(executor, frame)
+                        job.update(index=index, captured_at=captured_at, frame=frame)
+                        pending.append(job)
+                        continue
+                    if not pending:
+                        if frame_queue.closed:
+                            self.capture_stopped.emit()
+                            break
+                        continue
+
+                # Results are consumed in capture order, so frames never go back in time
+                if not self._job_done(pending[0]) and len(pending) < self.workers and not frame_queue.closed:
+                    continue
+
+                job = pending.popleft()
+                try:
+                    if job['detection'] is not None:
+                        self._start_encoding(executor, job)
+                    face_encodings = job['encoding'].result() if job['encoding'] is not None else []
+                except Exception as e:
+                    print(f"❌ Error analysing frame {job['index']}: {e}")
+                    continue
+
+                analysis = {
+                    'low_light': job['low_light'],
+                    'face_locations': job['face_locations'],
+                    'face_encodings': face_encodings,
+                    'rejected_faces': job['rejected_faces']
+                }
+                rejected = analysis['rejected_faces']
+                self.quality_stats.add(len(analysis['face_locations']) + len(rejected),
+                                       [reason for _, reason in rejected])
+                self._publish(job['frame'], analysis)
+                stats.frame_done(job['captured_at'], detected=True)
+                self._emit_stats(stats, frame_queue)
+        finally:
+            for job in pending:
+                self._cancel_job(job)
+
+    def _run_tracking(self, frame_queue, executor):
+        """
+        Detect every N frames and let the tracker carry identities in between
+
+        Detection and encoding run on the worker pool. The tracker needs
+        detections in frame order, so this thread waits for a detection
+        before moving on, but encoding of the unconfirmed faces overlaps
+        with tracking of the following frames; its votes are applied when
+        it finishes.
+        """
+        tracker = self.tracker
+        stats = _ThroughputStats(self.workers)
+        first_frame = True
+        pending_encoding = None
+
+        try:
+            while self._running:
+                self._check_calibration()
+
+                item = frame_queue.get(timeout=0.2)
+                if item is None:
+                    if frame_queue.closed:
+                        self.capture_stopped.emit()
+                        break
+                    continue
+
+                index, captured_at, frame = item
+                if first_frame:
+                    self._start_calibration(executor, frame)
+                    first_frame = False
+
+                if self._gallery_changed:
+                    # Identities may no longer be valid against the new gallery
+                    if pending_encoding is not None:
+                        pending_encoding[0].cancel()
+                        pending_encoding = None
+                    tracker.reset()
+                    self._gallery_changed = False
+
+                fresh_encodings = {}
+                status = None
+                detected = tracker.needs_detection()
+                try:
+                    if detected:
+                        # Votes from the previous detection decide which tracks still need encoding
+                        if pending_encoding is not None:
+                            fresh_encodings.update(self._apply_encodings(pending_encoding, wait=True))
+                            pending_encoding = None
+
+                        job = self._submit_frame(executor, frame)
+                        if job['low_light']:
+                            tracker.reset()
+                            tracks = []
+                            status = "Low light detected"
+                        else:
+                            face_locations = self._wait(job['detection'])
+                            if face_locations is None:
+                                break
+                            tracks = tracker.associate(frame, face_locations)
+                            pending_encoding = self._submit_encoding(executor, job['rgb_frame'], tracks)
+                    else:
+                        tracks = tracker.update(frame)
+
+                    if pending_encoding is not None and pending_encoding[0].done():
+                        fresh_encodings.update(self._apply_encodings(pending_encoding))
+                        pending_encoding = None
+                except Exception as e:
+                    print(f"❌ Error tracking frame {index}: {e}")
+                    pending_encoding = None
+                    continue
+
+                if not tracks and status is None:
+                    status = "No face detected"
+                self._publish_tracks(frame, tracks, fresh_encodings, status)
+                stats.frame_done(captured_at, detected=detected)
+                self._emit_stats(stats, frame_queue)
+        finally:
+            if pending_encoding is not None:
+                pending_encoding[0].cancel()
+
+    def _wait(self, future):
+        """Result of a pool job, or None if the pipeline was stopped first"""
+        while self._running:
+            try:
+                return future.result(timeout=0.05)
+            except FutureTimeout:
+                self._check_calibration()
+        future.cancel()
+        return None
+
+    def _submit_encoding(self, executor, rgb_frame, tracks):
+        """
+        Queue encoding of the tracks whose identity is not yet confirmed
+
+        Returns:
+            tuple: (future, tracks being encoded), or None if nothing needs encoding
+        """
+        unconfirmed = [track for track in tracks if track.needs_encoding()]
+        if unconfirmed and self.quality_scorer is not None:
+            # Poor crops get no vote; the track is retried on the next detection
+            checked = [(track, self.quality_scorer.check(rgb_frame, track.box)) for track in unconfirmed]
+            unconfirmed = [track for track, reason in checked if reason is None]
+            self.quality_stats.add(len(checked), [reason for _, reason in checked if reason is not None])
+        if not unconfirmed:
+            return None
+
+        future = executor.submit(encode_face_crops, face_crops(rgb_frame, [track.box for track in unconfirmed]))
+        return future, unconfirmed
+
+    def _apply_encodings(self, pending_encoding, wait=False):
+        """
+        Match finished encodings and record a vote on each track
+
+        Returns:
+            dict: track_id -> encoding for every track that got a fresh vote
+        """
+        future, tracks = pending_encoding
+        encodings = self._wait(future) if wait else future.result()
+        if not encodings:
+            return {}
+
+        matches = self.face_service.recognize_faces(encodings, self.gallery, self.tolerance)
+
+        fresh_encodings = {}
+        for track, encoding, (student_id, name, is_known, score, margin) in zip(
+                tracks, encodings, matches):
+            track.record_match(student_id, name, is_known, score, margin, self.tracker.required_votes)
+            fresh_encodings[track.track_id] = encoding
+        return fresh_encodings
+
+    def _emit_stats(self, stats, frame_queue):
+        """Publish throughput figures roughly once a second"""
+        report = stats.report(frame_queue.dropped)
+        if report is not None:
+            report['quality'] = self.quality_stats.as_dict()
+            self.stats_updated.emit(report)
+
+    def _publish(self, frame, analysis):
+        """Match analysed faces, annotate a copy of the frame and hand both to the GUI"""
+        results = []
+        display = frame.copy()
+
+        rejected = analysis.get('rejected_faces', [])
+        for face_location, reason in rejected:
+            self._draw_rejected(display, face_location, reason)
+
+        if analysis['low_light']:
+            self._draw_status(display, "Low light detected")
+        elif not analysis['face_locations']:
+            if not rejected:
+                self._draw_status(display, "No face detected")
+        else:
+            matches = self.face_service.recognize_faces(
+                analysis['face_encodings'], self.gallery, self.tolerance
+            )
+            for face_location, face_encoding, (student_id, name, is_known, score, margin) in zip(
+                    analysis['face_locations'], analysis['face_encodings'], matches):
+                results.append({
+                    'face_location': face_location,
+                    'encoding': face_encoding,
+                    'student_id': student_id,
+                    'name': name,
+                    'is_known': is_known,
+                    'score': score,
+                    'margin': margin,
+                    'fresh': True
+                })
+                self._draw_face(display, face_location, student_id, name, is_known)
+
+        self.faces_processed.emit(frame, results)
+        self.frame_ready.emit(self.to_qimage(display))
+
+    def _publish_tracks(self, frame, tracks, fresh_encodings, status=None):
+        """
+        Hand tracked faces to the GUI
+
+        Only tracks encoded on this frame are marked 'fresh'; the window
+        counts those as recognition votes, carried identities are display only.
+        """
+        results = []
+        display = frame.copy()
+
+        if status:
+            self._draw_status(display, status)
+
+        for track in tracks:
+            if track.student_id is None:
+                continue
+            results.append({
+                'face_location': track.box,
+                'encoding': fresh_encodings.get(track.track_id),
+                'student_id': track.student_id,
+                'name': track.name,
+                'is_known': track.is_known,
+                'score': track.score,
+                'margin': track.margin,
+                'fresh': track.track_id in fresh_encodings,
+                'track_id': track.track_id
+            })
+            self._draw_face(display, track.box, track.student_id, track.name, track.is_known)
+
+        self.faces_processed.emit(frame, results)
+        self.frame_ready.emit(self.to_qimage(display))
+
+    @staticmethod
+    def _draw_status(display, text):
+        cv2.putText(display, text, (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+
+    @staticmethod
+    def _draw_face(display, face_location, student_id, name, is_known):
+        # Draw face box
+        top, right, bottom, left = face_location
+        color = (0, 255, 0) if is_known else (0, 0, 255)
+        cv2.rectangle(display, (left, top), (right, bottom), color, 2)
+
+        # Display name
+        label = f"{name} ({student_id})" if is_known else "Unknown Person"
+        cv2.putText(display, label, (left, top - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+
+    @staticmethod
+    def _draw_rejected(display, face_location, reason):
+        # Thin orange box: seen, but not good enough to recognize
+        top, right, bottom, left = face_location
+        cv2.rectangle(display, (left, top), (right, bottom), (0, 165, 255), 1)
+        cv2.putText(display, FaceQualityScorer.REASON_LABELS[reason], (left, top - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 165, 255), 1)
+
+    @staticmethod
+    def to_qimage(frame):
+        """Convert a BGR frame to a QImage that owns its pixel data"""
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        height, width, channels = rgb_frame.shape
+        return QImage(rgb_frame.data, width, height, channels * width, QImage.Format_RGB888).copy()
+
+
+class _ThroughputStats:
+    """Frame rate, latency and detector call rate over roughly one-second windows"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.processed = 0
+        self.detections = 0
+        self.latency = 0.0
+        self.window_start = time.time()
+
+    def frame_done(self, captured_at, detected):
+        self.processed += 1
+        if detected:
+            self.detections += 1
+        self.latency = time.time() - captured_at
+
+    def report(self, dropped_frames):
+        """Return the stats for the finished window, or None if it is still open"""
+        elapsed = time.time() - self.window_start
+        if elapsed < 1.0:
+            return None
+
+        report = {
+            'fps': self.processed / elapsed,
+            'detections_per_second': self.detections / elapsed,
+            'latency': self.latency,
+            'dropped_frames': dropped_frames,
+            'workers': self.workers
+        }
+        self.processed = 0
+        self.detections = 0
+        self.window_start = time.time()
+        return report
@@ -0,0 +1,117 @@
+import queue
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+
+
+class AttendanceWriter(threading.Thread):
+    """
+    Background writer for attendance marks.
+
+    Marks are queued from the GUI and written by this thread in batches, one
+    transaction per batch (attendance rows plus their activity log entries),
+    so a burst of students arriving never stalls recognition or the camera
+    feed. Every submitted mark returns a Future that resolves to True when
+    the student was newly marked and False when already present.
+    """
+    _FLUSH = object()
+    _STOP = object()
+
+    def __init__(self, db_service, batch_window=0.2, max_batch=100):
+        """
+        Initialize the writer
+
+        Args:
+            db_service (DatabaseService): Service used for the batched writes
+            batch_window (float): Seconds to wait for more marks before writing
+            max_batch (int): Largest number of marks written in one transaction
+        """
+        super().__init__(daemon=True)
+        self.db_service = db_service
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._stopped = False
+
+    def submit(self, student_id, session_id):
+        """
+        Queue a student for marking
+
+        Returns:
+            Future: Resolves to the result of the write
+        """
+        future = Future()
+        if self._stopped:
+            future.set_exception(RuntimeError("Attendance writer has been stopped"))
+            return future
+
+        # Keep the time the student was recognized, not the time of the write
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._queue.put((student_id, session_id, timestamp, future))
+        return future
+
+    def flush(self, timeout=None):
+        """
+        Block until every mark queued so far is committed and checkpointed
+
+        Returns:
+            bool: True if the flush completed within the timeout
+        """
+        if not self.is_alive():
+            return False
+        done = threading.Event()
+        self._queue.put((self._FLUSH, done))
+        return done.wait(timeout)
+
+    def stop(self, timeout=None):
+        """Write everything still queued, then end the thread"""
+        self._stopped = True
+        if self.is_alive():
+            self._queue.put((self._STOP, None))
+            self.join(timeout)
+
+    def run(self):
+        running = True
+        while running:
+            batch = [self._queue.get()]
+
+            # Collect whatever arrives within the batch window into the same transaction
+            while len(batch) < self.max_batch and batch[-1][0] not in (self._FLUSH, self._STOP):
+                try:
+                    batch.append(self._queue.get(timeout=self.batch_window))
+                except queue.Empty:
+                    break
+
+            marks = [item for item in batch if item[0] not in (self._FLUSH, self._STOP)]
+            self._write(marks)
+
+            control = batch[-1]
+            if control[0] is self._FLUSH or control[0] is self._STOP:
+                # Make the batch durable before telling anyone it is done
+                self.db_service.checkpoint()
+                if control[0] is self._FLUSH:
+                    control[1].set()
+                else:
+                    running = False
+
+        # Anything that slipped in after the stop request is refused rather than left hanging
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item[0] is self._FLUSH:
+                item[1].set()
+            elif item[0] is not self._STOP:
+                item[3].set_exception(RuntimeError("Attendance writer has been stopped"))
+
+    def _write(self, marks):
+        """Write one batch and resolve its futures"""
+        if not marks:
+            return
+
+        results = self.db_service.mark_attendance_batch(
+            [(student_id, session_id, timestamp) for student_id, session_id, timestamp, _ in marks]
+        )
+        for index, (student_id, _, _, future) in enumerate(marks):
+            if results is None:
+                future.set_exception(RuntimeError(f"Could not save attendance for {student_id}"))
+            else:
+                future.set_result(results[index])
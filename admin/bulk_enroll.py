@@ -0,0 +1,530 @@
+"""
+Headless bulk enrollment of students from an image folder or CSV manifest
+
+Detection, quality checks, augmentation and encoding run in a process pool
+(augmented encodings are shared with registration through FaceAugmenter's cache);
+students are written in batched transactions and their encodings appended
+to the shared encoding store one batch at a time. Every image that cannot
+be enrolled is listed, with the reason, in a rejects CSV.
+
+Usage:
+    python -m admin.bulk_enroll --manifest intake.csv
+    python -m admin.bulk_enroll --folder intake_photos/ --semester 1.1
+    python -m admin.bulk_enroll --manifest intake.csv --dry-run
+
+Manifest columns: student_id, fname, lname, image, and optionally course,
+year_of_study, semester, email, phone. Image paths are relative to the
+manifest (or --images). In folder mode, images are named after the
+student ID with "/" replaced by "_", followed by the name:
+S11_12519_23_Jane_Doe.jpg
+"""
+
+import argparse
+import csv
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import cv2
+import face_recognition
+import imagehash
+from PIL import Image, ImageOps
+
+from admin.db_service import DatabaseService
+from admin.encoding_store import EncodingStore
+from admin.face_augmentation import FaceAugmenter
+from admin.face_quality import FaceQualityScorer
+from admin.hash_index import HashIndex, hash_to_int, duplicate_threshold
+from config.db_connection import get_connection, open_connection
+from config.utils_constants import DATABASE_PATH, ENCODING_DIR, IMAGE_DIR
+
+STUDENT_ID_PATTERN = re.compile(r"^(S\d{2})/\d{5}/(\d{2})$")
+FOLDER_NAME_PATTERN = re.compile(r"^(S\d{2})_(\d{5})_(\d{2})(?:_(.+))?$")
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+REJECT_FIELDS = ["student_id", "image", "reason", "detail"]
+
+
+def suggest_year(student_id, today=None):
+    """Year of study from the registration year in a student ID (academic year starts in September)"""
+    match = STUDENT_ID_PATTERN.match(student_id)
+    if not match:
+        return 1
+    today = today or datetime.now()
+    academic_year = today.year % 100 - int(match.group(2)) + (1 if today.month >= 9 else 0)
+    return min(max(academic_year, 1), 6)
+
+
+def current_semester(year, today=None):
+    """Semester label such as "2.1" for the current point of the academic year"""
+    month = (today or datetime.now()).month
+    return f"{year}.{2 if 1 <= month <= 4 else 1}"
+
+
+def face_hash(face_image):
+    """Perceptual hash of a face crop, computed the same way as at registration"""
+    image = Image.fromarray(face_image).convert("L").resize((128, 128))
+    return str(imagehash.phash(ImageOps.autocontrast(image)))
+
+
+def process_image(job):
+    """
+    Detect, check and encode one student's photo
+
+    Runs in a worker process, so it only takes and returns plain data.
+    Accepted photos are copied, together with a padded face crop, into the
+    staging directory; they are moved into the student image folder only
+    once the student is committed. Nothing is copied without a staging
+    directory (dry runs).
+
+    Args:
+        job (tuple): (manifest row, FaceQualityScorer, image directory,
+                     staging directory or None)
+
+    Returns:
+        dict: The row plus either 'reason'/'detail', or 'encodings',
+              'image_hash', 'image_path' and 'face_path' (final paths) and
+              'staged' ((staged path, final path) pairs)
+    """
+    row, scorer, image_dir, staging_dir = job
+    result = {'row': row}
+    try:
+        augmenter = FaceAugmenter()
+        with open(row['image'], 'rb') as f:
+            key = augmenter.cache_key(f.read())
+        # Photos seen by an earlier run (or registration) skip detection and encoding
+        augmented = augmenter.lookup(key)
+
+        image = face_recognition.load_image_file(row['image'])
+        if augmented is not None:
+            face_locations = augmented['face_locations']
+        else:
+            face_locations = face_recognition.face_locations(image)
+        if not face_locations:
+            return dict(result, reason="no_face", detail="No face detected")
+        if len(face_locations) > 1:
+            return dict(result, reason="multiple_faces", detail=f"{len(face_locations)} faces detected")
+
+        face_location = face_locations[0]
+        if scorer is not None:
+            measurements = scorer.measure(image, face_location)
+            reason = scorer.reject_reason(measurements)
+            if reason is not None:
+                detail = ", ".join(f"{key} {value:.1f}" for key, value in measurements.items())
+                return dict(result, reason=reason, detail=detail)
+
+        if augmented is None:
+            augmented = augmenter.encode(image, face_location, key=key)
+        encodings = augmented['encodings']
+        if len(encodings) == 0:
+            return dict(result, reason="no_encoding", detail="Face could not be encoded")
+
+        # Face crop with 20% padding, used for hashing and stored next to the photo
+        top, right, bottom, left = face_location
+        pad_y, pad_x = int(0.2 * (bottom - top)), int(0.2 * (right - left))
+        face_image = image[max(0, top - pad_y):min(image.shape[0], bottom + pad_y),
+                           max(0, left - pad_x):min(image.shape[1], right + pad_x)]
+
+        sanitized_id = row['student_id'].replace('/', '_')
+        extension = os.path.splitext(row['image'])[1].lower() or ".jpg"
+        image_name, face_name = f"{sanitized_id}{extension}", f"{sanitized_id}_face.jpg"
+        staged = []
+        if staging_dir is not None:
+            staged = [(os.path.join(staging_dir, image_name), os.path.join(image_dir, image_name)),
+                      (os.path.join(staging_dir, face_name), os.path.join(image_dir, face_name))]
+            shutil.copy2(row['image'], staged[0][0])
+            cv2.imwrite(staged[1][0], cv2.cvtColor(face_image, cv2.COLOR_RGB2BGR))
+
+        return dict(result,
+                    encodings=encodings,
+                    image_hash=face_hash(face_image),
+                    image_path=os.path.join(image_dir, image_name),
+                    face_path=os.path.join(image_dir, face_name),
+                    staged=staged)
+    except Exception as e:
+        return dict(result, reason="error", detail=str(e))
+
+
+class BulkEnroller:
+    """
+    Enrolls many students at once.
+
+    Rows are validated up front (ID format, names, known course, IDs that
+    already exist), then photos are processed in a worker pool. Results
+    are checked for duplicates against existing students and earlier rows
+    of the same intake, by face distance and by image hash, and written in
+    batches: one transaction per batch for the students, enrollments and
+    activity log, then one append to the encoding store.
+    """
+
+    def __init__(self, db_path=DATABASE_PATH, encoding_dir=ENCODING_DIR, image_dir=IMAGE_DIR,
+                 workers=None, batch_size=200, face_tolerance=0.55, hash_threshold=None,
+                 check_duplicates=True, quality_gate=True, dry_run=False):
+        """
+        Initialize the enroller
+
+        Args:
+            db_path (str): Path to the SQLite database
+            encoding_dir (str): Encoding store directory
+            image_dir (str): Directory accepted photos are copied to
+            workers (int): Worker processes (default: one per core)
+            batch_size (int): Students written per transaction
+            face_tolerance (float): Face distance that counts as a duplicate
+            hash_threshold (int): Image hash bit difference that counts as a
+                                  duplicate; derived from existing hashes if None
+            check_duplicates (bool): Reject duplicates of enrolled students
+            quality_gate (bool): Reject photos that fail the face quality checks
+            dry_run (bool): Process everything but write nothing
+        """
+        self.db_path = db_path
+        self.encoding_store = EncodingStore(encoding_dir)
+        self.image_dir = image_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.face_tolerance = face_tolerance
+        self.hash_threshold = hash_threshold
+        self.check_duplicates = check_duplicates
+        # Registration photos are posed, so the live thresholds apply with a stricter minimum size
+        self.scorer = FaceQualityScorer(min_face_size=80) if quality_gate else None
+        self.dry_run = dry_run
+        self.rejects = []
+
+    def reject(self, row, reason, detail=""):
+        self.rejects.append({
+            'student_id': row.get('student_id', ""),
+            'image': row.get('image', ""),
+            'reason': reason,
+            'detail': detail
+        })
+
+    @staticmethod
+    def read_manifest(csv_path, image_root=None):
+        """
+        Rows from a CSV manifest
+
+        Args:
+            csv_path (str): Manifest path
+            image_root (str): Directory image paths are relative to (default: the manifest's)
+
+        Returns:
+            list: Row dicts
+        """
+        image_root = image_root or os.path.dirname(os.path.abspath(csv_path))
+        rows = []
+        with open(csv_path, newline='', encoding='utf-8-sig') as f:
+            for record in csv.DictReader(f):
+                row = {key.strip(): (value or "").strip() for key, value in record.items() if key}
+                if row.get('image'):
+                    row['image'] = os.path.join(image_root, row['image'])
+                rows.append(row)
+        return rows
+
+    @staticmethod
+    def scan_folder(folder):
+        """
+        Rows from a folder of photos named after the student
+
+        Returns:
+            list: Row dicts; names are empty when the file name has none
+        """
+        rows = []
+        for filename in sorted(os.listdir(folder)):
+            stem, extension = os.path.splitext(filename)
+            if extension.lower() not in IMAGE_EXTENSIONS:
+                continue
+            row = {'student_id': "", 'fname': "", 'lname': "", 'image': os.path.join(folder, filename)}
+            match = FOLDER_NAME_PATTERN.match(stem)
+            if match:
+                course, serial, year, name = match.groups()
+                row['student_id'] = f"{course}/{serial}/{year}"
+                parts = (name or "").replace("-", " ").replace("_", " ").split()
+                if parts:
+                    row['fname'], row['lname'] = parts[0], " ".join(parts[1:])
+            rows.append(row)
+        return rows
+
+    def validate(self, rows, semester=None):
+        """
+        Fill defaults and drop rows that cannot be enrolled
+
+        Args:
+            rows (list): Row dicts from a manifest or folder
+            semester (str): Semester for rows without one (default: the current one)
+
+        Returns:
+            list: Rows ready for processing
+        """
+        conn = get_connection(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT course_code FROM courses")
+            courses = {row[0] for row in cursor.fetchall()}
+            cursor.execute("SELECT student_id FROM students")
+            existing = {row[0] for row in cursor.fetchall()}
+        finally:
+            conn.close()
+
+        valid, seen = [], set()
+        for row in rows:
+            student_id = row.get('student_id', "")
+            match = STUDENT_ID_PATTERN.match(student_id)
+            if not match:
+                self.reject(row, "invalid_id", "Student ID must be in the format S00/00000/YY")
+                continue
+            if not row.get('fname') or not row.get('lname'):
+                self.reject(row, "missing_name", "First and last name are required")
+                continue
+            if not row.get('image') or not os.path.isfile(row['image']):
+                self.reject(row, "missing_image", "Image file not found")
+                continue
+            if student_id in existing:
+                self.reject(row, "duplicate_id", "A student with this ID already exists")
+                continue
+            if student_id in seen:
+                self.reject(row, "duplicate_id", "Student ID appears more than once in the intake")
+                continue
+
+            row['course'] = row.get('course') or match.group(1)
+            if row['course'] not in courses:
+                self.reject(row, "unknown_course", f"Course code '{row['course']}' is not recognized")
+                continue
+            try:
+                row['year_of_study'] = int(row.get('year_of_study') or suggest_year(student_id))
+            except ValueError:
+                self.reject(row, "invalid_year", f"Year of study '{row['year_of_study']}' is not a number")
+                continue
+            row['semester'] = row.get('semester') or semester or current_semester(row['year_of_study'])
+            row.setdefault('email', "")
+            row.setdefault('phone', "")
+
+            seen.add(student_id)
+            valid.append(row)
+        return valid
+
+    def _load_duplicate_indexes(self):
+        """Gallery and hash index of the students enrolled so far"""
+        gallery = self.encoding_store.load_gallery()
+        conn = get_connection(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT student_id, image_hash FROM students WHERE image_hash IS NOT NULL")
+            hash_index = HashIndex.from_items(cursor.fetchall())
+        finally:
+            conn.close()
+
+        if self.hash_threshold is None:
+            # Same rule as the registration window
+            distances = hash_index.sample_distances(pairs=100) if len(hash_index) >= 10 else []
+            self.hash_threshold = duplicate_threshold(distances)
+        return gallery, hash_index
+
+    def _find_duplicate(self, result, gallery, hash_index):
+        """Reason and detail if a processed photo duplicates an enrolled student, else None"""
+        if len(gallery):
+            student_id, distance = gallery.best_matches(result['encodings'][:1], self.face_tolerance)[0]
+            if student_id is not None:
+                return "duplicate_face", f"Matches {student_id} (face distance: {distance:.2f})"
+
+        match = hash_index.nearest(hash_to_int(result['image_hash']), self.hash_threshold)
+        if match is not None:
+            return "duplicate_image", f"Matches {match[0]} ({match[1]}/{hash_index.bits} bits)"
+        return None
+
+    @staticmethod
+    def _discard_files(result):
+        """Delete a result's staged copies; the image folder is never touched"""
+        for staged_path, _ in result.get('staged', []):
+            if os.path.exists(staged_path):
+                os.remove(staged_path)
+
+    @staticmethod
+    def _publish_files(batch):
+        """Move a committed batch's staged photos into the image folder"""
+        for result in batch:
+            for staged_path, final_path in result.get('staged', []):
+                try:
+                    os.replace(staged_path, final_path)
+                except OSError as e:
+                    print(f"⚠️ Could not move {staged_path} to {final_path}: {e}")
+
+    @staticmethod
+    def _forget(batch, gallery, hash_index):
+        """Drop the students of a failed batch from the duplicate indexes"""
+        for result in batch:
+            student_id = result['row']['student_id']
+            gallery.remove(student_id)
+            hash_index.remove(student_id)
+
+    def _write_batch(self, batch):
+        """Insert one batch of students in a single transaction, then store their encodings"""
+        if self.dry_run or not batch:
+            return len(batch)
+
+        students, enrollments, activities = [], [], []
+        for result in batch:
+            row = result['row']
+            students.append((row['fname'], row['lname'], row['student_id'], result['image_path'],
+                             result['image_hash'], None, result['face_path'], row['course'],
+                             row['year_of_study'], row['email'], row['phone'], row['semester'], None))
+            enrollments.append((row['student_id'], row['course'], row['semester']))
+            activities.append(("admin", f"Student registered: {row['student_id']} (bulk import)"))
+
+        conn = open_connection(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            cursor.executemany("""
+                INSERT INTO students (fname, lname, student_id, image_path, image_hash, face_encoding,
+                                      face_only_path, course, year_of_study, email, phone,
+                                      current_semester, face_encoding_path)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, students)
+            cursor.executemany("""
+                INSERT INTO student_courses (student_id, course_code, semester, enrollment_date)
+                VALUES (?, ?, ?, date('now'))
+            """, enrollments)
+            cursor.executemany("""
+                INSERT INTO activity_log (user_id, activity_type, timestamp)
+                VALUES (?, ?, datetime('now', 'localtime'))
+            """, activities)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"❌ Batch of {len(batch)} students failed: {e}")
+            for result in batch:
+                self.reject(result['row'], "database_error", str(e))
+                self._discard_files(result)
+            return 0
+        finally:
+            conn.close()
+
+        # Photos and encodings are only stored once the student records exist
+        self._publish_files(batch)
+        self.encoding_store.append_many((result['row']['student_id'], result['encodings']) for result in batch)
+        DatabaseService.invalidate_student_cache()
+        return len(batch)
+
+    def run(self, rows):
+        """
+        Process and enroll validated rows
+
+        Returns:
+            dict: 'submitted', 'enrolled' and 'rejected' counts and 'seconds' taken
+        """
+        started = datetime.now()
+        os.makedirs(self.image_dir, exist_ok=True)
+        gallery, hash_index = self._load_duplicate_indexes() if self.check_duplicates else (None, None)
+        rejected_before = len(self.rejects)
+
+        def flush(batch):
+            written = self._write_batch(batch)
+            if batch and not written and self.check_duplicates:
+                # Rolled back: these students must not count as duplicates of later photos
+                self._forget(batch, gallery, hash_index)
+            return written
+
+        # Copies are staged next to the image folder (same filesystem, so moving them in
+        # is a rename) and left behind only for students that were committed
+        staging_dir = None if self.dry_run else tempfile.mkdtemp(prefix=".bulk_enroll_", dir=self.image_dir)
+        enrolled, batch = 0, []
+        jobs = ((row, self.scorer, self.image_dir, staging_dir) for row in rows)
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                for done, result in enumerate(executor.map(process_image, jobs, chunksize=4), 1):
+                    if 'reason' in result:
+                        self.reject(result['row'], result['reason'], result['detail'])
+                    else:
+                        duplicate = self._find_duplicate(result, gallery, hash_index) if self.check_duplicates else None
+                        if duplicate is not None:
+                            self.reject(result['row'], *duplicate)
+                            self._discard_files(result)
+                        else:
+                            if self.check_duplicates:
+                                # Later photos in the intake are checked against this one too
+                                gallery.add(result['row']['student_id'], result['encodings'])
+                                hash_index.add(result['row']['student_id'], hash_to_int(result['image_hash']))
+                            batch.append(result)
+
+                    if len(batch) >= self.batch_size:
+                        enrolled += flush(batch)
+                        batch = []
+                    if done % 100 == 0:
+                        print(f"⏳ Processed {done}/{len(rows)} photos, {enrolled} enrolled")
+
+            enrolled += flush(batch)
+        finally:
+            if staging_dir is not None:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+        return {
+            'submitted': len(rows),
+            'enrolled': enrolled,
+            'rejected': len(self.rejects) - rejected_before,
+            'seconds': (datetime.now() - started).total_seconds()
+        }
+
+    def write_rejects(self, path):
+        """Write the rejects report; returns the number of rows written"""
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=REJECT_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.rejects)
+        return len(self.rejects)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk enroll students from photos")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--manifest", help="CSV manifest of students and their photos")
+    source.add_argument("--folder", help="Folder of photos named <student id>_<first>_<last>")
+    parser.add_argument("--images", help="Directory manifest image paths are relative to")
+    parser.add_argument("--db", default=DATABASE_PATH, help="Path to the SQLite database")
+    parser.add_argument("--semester", help="Semester for students without one, e.g. 1.1")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: one per core)")
+    parser.add_argument("--batch-size", type=int, default=200, help="Students written per transaction")
+    parser.add_argument("--face-tolerance", type=float, default=0.55,
+                        help="Face distance below which a photo duplicates an enrolled student")
+    parser.add_argument("--hash-threshold", type=int,
+                        help="Image hash bit difference for duplicates (default: derived from the data)")
+    parser.add_argument("--skip-duplicate-check", action="store_true",
+                        help="Do not check photos against enrolled students")
+    parser.add_argument("--no-quality-gate", action="store_true",
+                        help="Accept photos that fail the face quality checks")
+    parser.add_argument("--rejects", help="Rejects report path (default: bulk_enroll_rejects_<time>.csv)")
+    parser.add_argument("--dry-run", action="store_true", help="Process photos but write nothing")
+    args = parser.parse_args(argv)
+
+    enroller = BulkEnroller(
+        db_path=args.db,
+        workers=args.workers or None,
+        batch_size=args.batch_size,
+        face_tolerance=args.face_tolerance,
+        hash_threshold=args.hash_threshold,
+        check_duplicates=not args.skip_duplicate_check,
+        quality_gate=not args.no_quality_gate,
+        dry_run=args.dry_run
+    )
+
+    if args.manifest:
+        rows = enroller.read_manifest(args.manifest, args.images)
+    else:
+        rows = enroller.scan_folder(args.folder)
+    rows = enroller.validate(rows, args.semester)
+    print(f"📋 {len(rows)} students to process, {len(enroller.rejects)} rejected during validation")
+
+    stats = enroller.run(rows)
+    print(f"✅ Enrolled {stats['enrolled']} of {stats['submitted']} students in {stats['seconds']:.0f}s"
+          + (" (dry run, nothing written)" if args.dry_run else ""))
+
+    if enroller.rejects:
+        rejects_path = args.rejects or f"bulk_enroll_rejects_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        count = enroller.write_rejects(rejects_path)
+        print(f"⚠️ {count} rejected, see {rejects_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
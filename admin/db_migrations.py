@@ -0,0 +1,729 @@
+"""
+Versioned schema migrations for the attendance database
+
+Each migration runs once, in order, inside its own transaction, and is
+recorded in the schema_migrations table. Migrations only touch tables and
+columns that exist, so they are safe on partial or older databases.
+
+Usage:
+    python -m admin.db_migrations                 # apply pending migrations
+    python -m admin.db_migrations --status        # list applied migrations
+    python -m admin.db_migrations --check-plans   # EXPLAIN QUERY PLAN regression check
+    python -m admin.db_migrations --rebuild-summary   # recompute attendance_summary
+    python -m admin.db_migrations --dedupe-attendance # remove duplicate attendance marks
+"""
+
+import argparse
+import sqlite3
+import sys
+import threading
+
+from config.db_connection import open_connection
+from config.utils_constants import DATABASE_PATH
+
+MIGRATIONS = []
+
+UNIQUE_ATTENDANCE_INDEX = "ux_attendance_student_session"
+
+_migrated_paths = set()
+_migrate_lock = threading.Lock()
+
+
+class MigrationError(sqlite3.Error):
+    """A migration failed and was rolled back; later migrations were not run"""
+
+
+def migration(version, description):
+    """Register a migration function under a schema version"""
+    def register(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return func
+    return register
+
+
+def table_exists(cursor, table):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return cursor.fetchone() is not None
+
+
+def table_columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+
+def create_index(cursor, name, table, columns, unique=False):
+    """
+    Create an index if its table and all of its columns exist
+
+    Returns:
+        bool: True if the index exists afterwards
+    """
+    if not table_exists(cursor, table) or not set(columns) <= table_columns(cursor, table):
+        print(f"⚠️ Skipping index {name}: {table}({', '.join(columns)}) not found")
+        return False
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    cursor.execute(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+    return True
+
+
+# -------------------- Migrations --------------------
+
+def count_duplicate_attendance(cursor):
+    """Number of attendance rows that repeat an earlier mark for the same student and session"""
+    cursor.execute("""
+        SELECT COALESCE(SUM(marks - 1), 0) FROM (
+            SELECT COUNT(*) AS marks FROM attendance
+            WHERE student_id IS NOT NULL AND session_id IS NOT NULL
+            GROUP BY student_id, session_id
+            HAVING marks > 1
+        )
+    """)
+    return cursor.fetchone()[0]
+
+
+def dedupe_attendance(cursor):
+    """
+    Remove duplicate attendance marks and add the unique (student, session) index
+
+    One mark per student/session pair is kept: the earliest 'Present' one if
+    there is any, otherwise the earliest mark. Removed rows are copied to
+    attendance_duplicates_backup first.
+
+    Returns:
+        int: Number of rows moved to the backup table
+    """
+    cursor.execute("""
+        CREATE TEMP TABLE attendance_duplicate_rows AS
+        SELECT row_id FROM (
+            SELECT rowid AS row_id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY student_id, session_id
+                       ORDER BY status = 'Present' DESC, rowid
+                   ) AS position
+            FROM attendance
+            WHERE student_id IS NOT NULL AND session_id IS NOT NULL
+        )
+        WHERE position > 1
+    """)
+    try:
+        cursor.execute("SELECT COUNT(*) FROM attendance_duplicate_rows")
+        duplicates = cursor.fetchone()[0]
+        if duplicates:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS attendance_duplicates_backup AS
+                SELECT * FROM attendance WHERE 0
+            """)
+            cursor.execute("""
+                INSERT INTO attendance_duplicates_backup
+                SELECT * FROM attendance
+                WHERE rowid IN (SELECT row_id FROM attendance_duplicate_rows)
+            """)
+            cursor.execute("""
+                DELETE FROM attendance
+                WHERE rowid IN (SELECT row_id FROM attendance_duplicate_rows)
+            """)
+        print(f"🧹 Moved {duplicates} duplicate attendance rows to attendance_duplicates_backup")
+    finally:
+        cursor.execute("DROP TABLE temp.attendance_duplicate_rows")
+
+    create_index(cursor, UNIQUE_ATTENDANCE_INDEX, "attendance",
+                 ["student_id", "session_id"], unique=True)
+    if duplicates and table_exists(cursor, 'attendance_summary'):
+        # Repeated marks were counted as extra sessions, which deleting them does not undo
+        rebuild_attendance_summary(cursor)
+    return duplicates
+
+
+@migration(1, "One attendance row per student and session")
+def _unique_attendance(cursor):
+    if not table_exists(cursor, 'attendance'):
+        return
+
+    # Deleting marks is left to an explicit step, never done on connect
+    duplicates = count_duplicate_attendance(cursor)
+    if duplicates:
+        print(f"⚠️ {duplicates} duplicate attendance rows found; the unique attendance index "
+              f"is not created until they are removed with "
+              f"'python -m admin.db_migrations --dedupe-attendance'")
+        return
+
+    create_index(cursor, UNIQUE_ATTENDANCE_INDEX, "attendance",
+                 ["student_id", "session_id"], unique=True)
+
+
+@migration(2, "Covering indexes for attendance reports and the student portal")
+def _report_indexes(cursor):
+    # Sessions -> attendance joins (reports, trends, session summaries)
+    create_index(cursor, "idx_attendance_session_student", "attendance",
+                 ["session_id", "student_id", "status", "timestamp"])
+    # A student's own history (portal)
+    create_index(cursor, "idx_attendance_student_cover", "attendance",
+                 ["student_id", "session_id", "status", "timestamp"])
+    # Date-range filters
+    create_index(cursor, "idx_class_sessions_date", "class_sessions",
+                 ["date", "class_id", "start_time", "session_id"])
+    create_index(cursor, "idx_class_sessions_class_date", "class_sessions",
+                 ["class_id", "date", "start_time"])
+    # Enrollment lookups by student and by course
+    create_index(cursor, "idx_student_courses_student", "student_courses",
+                 ["student_id", "status", "course_code", "semester"])
+    create_index(cursor, "idx_student_courses_course", "student_courses",
+                 ["course_code", "status", "student_id"])
+    create_index(cursor, "idx_class_courses_course", "class_courses",
+                 ["course_code", "class_id"])
+    create_index(cursor, "idx_class_courses_class", "class_courses",
+                 ["class_id", "course_code"])
+    create_index(cursor, "idx_classes_course", "classes",
+                 ["course_code", "class_id"])
+    create_index(cursor, "idx_class_instructors_class", "class_instructors",
+                 ["class_id", "instructor_id"])
+
+
+@migration(3, "Enrollment versions for cached class galleries")
+def _enrollment_versions(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS enrollment_versions (
+            course_code TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    bump_course = """
+        INSERT INTO enrollment_versions (course_code, version) VALUES ({row}.course_code, 1)
+        ON CONFLICT(course_code) DO UPDATE SET version = version + 1;
+    """
+    bump_all = """
+        INSERT INTO enrollment_versions (course_code, version) VALUES ('*', 1)
+        ON CONFLICT(course_code) DO UPDATE SET version = version + 1;
+    """
+    triggers = {
+        "trg_enrollment_insert": ("student_courses", "AFTER INSERT ON student_courses",
+                                  bump_course.format(row="NEW")),
+        "trg_enrollment_delete": ("student_courses", "AFTER DELETE ON student_courses",
+                                  bump_course.format(row="OLD")),
+        "trg_enrollment_update": ("student_courses", "AFTER UPDATE ON student_courses",
+                                  bump_course.format(row="OLD") + bump_course.format(row="NEW")),
+        # Year and semester decide which classes a student is expected in
+        "trg_enrollment_student_update": ("students",
+                                          "AFTER UPDATE OF year_of_study, current_semester ON students",
+                                          bump_all),
+        "trg_enrollment_student_delete": ("students", "AFTER DELETE ON students", bump_all),
+    }
+    for name, (table, event, body) in triggers.items():
+        if table_exists(cursor, table):
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+
+# Cells of attendance_summary are recomputed from the base tables by this one
+# statement, so triggers, the migration and rebuilds all agree. {filter} is an
+# SQL condition over e.student_id, e.class_id and cs.date.
+SUMMARY_REFRESH_SQL = """
+    INSERT INTO attendance_summary (student_id, class_id, month, scheduled, present)
+    SELECT e.student_id, e.class_id, strftime('%Y-%m', cs.date) AS month,
+           COUNT(*) AS scheduled,
+           SUM(CASE WHEN a.status = 'Present' THEN 1 ELSE 0 END) AS present
+    FROM class_enrollment e
+    JOIN class_sessions cs ON cs.class_id = e.class_id
+    LEFT JOIN attendance a ON a.session_id = cs.session_id AND a.student_id = e.student_id
+    WHERE {filter}
+    GROUP BY e.student_id, e.class_id, month;
+"""
+
+
+def _month_filter(date_expr):
+    """Condition selecting the sessions in the same month as date_expr (index friendly)"""
+    return (f"cs.date >= strftime('%Y-%m-01', {date_expr}) "
+            f"AND cs.date < date({date_expr}, 'start of month', '+1 month')")
+
+
+def _refresh_cells(delete_where, insert_filter):
+    """Trigger body that drops summary cells and recomputes them"""
+    return (f"DELETE FROM attendance_summary WHERE {delete_where};"
+            + SUMMARY_REFRESH_SQL.format(filter=insert_filter))
+
+
+@migration(4, "Per-student attendance summary for the student portal")
+def _attendance_summary(cursor):
+    required = ['attendance', 'class_sessions', 'classes', 'class_courses', 'student_courses']
+    if not all(table_exists(cursor, table) for table in required):
+        print("⚠️ Skipping attendance summary: attendance tables not found")
+        return
+
+    # Which classes each student is expected in (same rule the portal queries use)
+    cursor.execute("""
+        CREATE VIEW IF NOT EXISTS class_enrollment AS
+        SELECT DISTINCT sc.student_id, cl.class_id
+        FROM student_courses sc
+        JOIN class_courses cc ON cc.course_code = sc.course_code
+        JOIN classes cl ON cl.class_id = cc.class_id AND cl.semester = sc.semester
+        WHERE sc.status = 'Active'
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS attendance_summary (
+            student_id TEXT NOT NULL,
+            class_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            scheduled INTEGER NOT NULL DEFAULT 0,
+            present INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (student_id, class_id, month)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_attendance_summary_class "
+                   "ON attendance_summary (class_id, month)")
+
+    def session_cells(row):
+        # Every enrolled student's cell for the session's class and month
+        return _refresh_cells(
+            f"class_id = {row}.class_id AND month = strftime('%Y-%m', {row}.date)",
+            f"e.class_id = {row}.class_id AND {_month_filter(f'{row}.date')}"
+        )
+
+    def attendance_cell(row):
+        # One student's cell for the month and class of the marked session
+        session = f"(SELECT {{column}} FROM class_sessions WHERE session_id = {row}.session_id)"
+        class_id, date = session.format(column="class_id"), session.format(column="date")
+        return _refresh_cells(
+            f"student_id = {row}.student_id AND class_id = {class_id} "
+            f"AND month = strftime('%Y-%m', {date})",
+            f"e.student_id = {row}.student_id AND e.class_id = {class_id} AND {_month_filter(date)}"
+        )
+
+    def student_cells(row):
+        return _refresh_cells(f"student_id = {row}.student_id", f"e.student_id = {row}.student_id")
+
+    def class_cells(row):
+        return _refresh_cells(f"class_id = {row}.class_id", f"e.class_id = {row}.class_id")
+
+    triggers = {
+        "trg_summary_session_insert": ("AFTER INSERT ON class_sessions", session_cells("NEW")),
+        "trg_summary_session_delete": ("AFTER DELETE ON class_sessions", session_cells("OLD")),
+        "trg_summary_session_update": ("AFTER UPDATE OF class_id, date ON class_sessions",
+                                       session_cells("OLD") + session_cells("NEW")),
+        "trg_summary_attendance_insert": ("AFTER INSERT ON attendance", attendance_cell("NEW")),
+        "trg_summary_attendance_delete": ("AFTER DELETE ON attendance", attendance_cell("OLD")),
+        "trg_summary_attendance_update": ("AFTER UPDATE OF status, student_id, session_id ON attendance",
+                                          attendance_cell("OLD") + attendance_cell("NEW")),
+        # Enrollment changes move a student in or out of classes
+        "trg_summary_enrollment_insert": ("AFTER INSERT ON student_courses", student_cells("NEW")),
+        "trg_summary_enrollment_delete": ("AFTER DELETE ON student_courses", student_cells("OLD")),
+        "trg_summary_enrollment_update": ("AFTER UPDATE ON student_courses",
+                                          student_cells("OLD") + student_cells("NEW")),
+        "trg_summary_class_course_insert": ("AFTER INSERT ON class_courses", class_cells("NEW")),
+        "trg_summary_class_course_delete": ("AFTER DELETE ON class_courses", class_cells("OLD")),
+        "trg_summary_class_update": ("AFTER UPDATE OF semester ON classes", class_cells("NEW")),
+    }
+    for name, (event, body) in triggers.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+    rebuild_attendance_summary(cursor)
+
+
+def rebuild_attendance_summary(cursor):
+    """
+    Recompute the whole attendance summary from the base tables
+
+    Returns:
+        int: Number of summary rows
+    """
+    cursor.execute("DELETE FROM attendance_summary")
+    cursor.execute(SUMMARY_REFRESH_SQL.format(filter="1 = 1"))
+    cursor.execute("SELECT COUNT(*) FROM attendance_summary")
+    count = cursor.fetchone()[0]
+    print(f"✅ Attendance summary rebuilt: {count} rows")
+    return count
+
+
+# Scope of data_versions rows that change for every student
+GLOBAL_DATA_SCOPE = '*'
+
+
+def _bump_version(scope):
+    """Trigger statement that increments a data version counter"""
+    return (f"INSERT INTO data_versions (scope, version) VALUES ({scope}, 1) "
+            f"ON CONFLICT (scope) DO UPDATE SET version = version + 1;")
+
+
+@migration(5, "Data version counters for the student portal cache")
+def _data_versions(cursor):
+    # One counter per student plus a global one; cached portal pages are keyed on both
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS data_versions (
+            scope TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    everyone = _bump_version(f"'{GLOBAL_DATA_SCOPE}'")
+    triggers = {
+        # Marking attendance (DatabaseService.mark_attendance and any other writer)
+        "trg_version_attendance_insert": ("attendance", "AFTER INSERT", _bump_version("NEW.student_id")),
+        "trg_version_attendance_delete": ("attendance", "AFTER DELETE", _bump_version("OLD.student_id")),
+        "trg_version_attendance_update": ("attendance", "AFTER UPDATE",
+                                          _bump_version("OLD.student_id") + _bump_version("NEW.student_id")),
+        "trg_version_enrollment_insert": ("student_courses", "AFTER INSERT", _bump_version("NEW.student_id")),
+        "trg_version_enrollment_delete": ("student_courses", "AFTER DELETE", _bump_version("OLD.student_id")),
+        "trg_version_enrollment_update": ("student_courses", "AFTER UPDATE",
+                                          _bump_version("OLD.student_id") + _bump_version("NEW.student_id")),
+        "trg_version_student_update": ("students", "AFTER UPDATE", _bump_version("NEW.student_id")),
+        # Sessions starting or ending, and class or course changes, affect every student
+        "trg_version_session_insert": ("class_sessions", "AFTER INSERT", everyone),
+        "trg_version_session_delete": ("class_sessions", "AFTER DELETE", everyone),
+        "trg_version_session_update": ("class_sessions", "AFTER UPDATE", everyone),
+        "trg_version_class_change": ("classes", "AFTER UPDATE", everyone),
+        "trg_version_class_course_insert": ("class_courses", "AFTER INSERT", everyone),
+        "trg_version_class_course_delete": ("class_courses", "AFTER DELETE", everyone),
+        "trg_version_course_change": ("courses", "AFTER UPDATE", everyone),
+    }
+    for name, (table, event, body) in triggers.items():
+        if table_exists(cursor, table):
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} ON {table} BEGIN {body} END")
+
+
+def _present_delta(row, delta):
+    """Trigger statement that moves one student's present counter for the cell of a mark"""
+    session = f"FROM class_sessions WHERE session_id = {row}.session_id"
+    return (f"UPDATE attendance_summary SET present = present + {delta} "
+            f"WHERE {row}.status = 'Present' AND student_id = {row}.student_id "
+            f"AND class_id = (SELECT class_id {session}) "
+            f"AND month = (SELECT strftime('%Y-%m', date) {session});")
+
+
+@migration(6, "Count attendance marks into the summary without recomputing cells")
+def _incremental_attendance_summary(cursor):
+    if not table_exists(cursor, 'attendance_summary'):
+        return
+
+    # A mark only changes the present counter of its own cell; cells themselves
+    # (scheduled sessions, enrollment) are still maintained by the triggers of
+    # migration 4. Exact as long as a student has one mark per session, which
+    # the unique attendance index guarantees.
+    triggers = {
+        "trg_summary_attendance_insert": ("AFTER INSERT ON attendance", _present_delta("NEW", 1)),
+        "trg_summary_attendance_delete": ("AFTER DELETE ON attendance", _present_delta("OLD", -1)),
+        "trg_summary_attendance_update": ("AFTER UPDATE OF status, student_id, session_id ON attendance",
+                                          _present_delta("OLD", -1) + _present_delta("NEW", 1)),
+    }
+    for name, (event, body) in triggers.items():
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"CREATE TRIGGER {name} {event} BEGIN {body} END")
+
+
+def data_version(cursor, student_id):
+    """
+    Current data version of a student's portal pages
+
+    Returns:
+        tuple: (student counter, global counter); 0 for counters never bumped
+    """
+    cursor.execute("SELECT scope, version FROM data_versions WHERE scope IN (?, ?)",
+                   (student_id, GLOBAL_DATA_SCOPE))
+    versions = dict(cursor.fetchall())
+    return versions.get(student_id, 0), versions.get(GLOBAL_DATA_SCOPE, 0)
+
+
+# -------------------- Runner --------------------
+
+def _ensure_version_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT DEFAULT (datetime('now', 'localtime'))
+        )
+    """)
+
+
+def applied_versions(db_path=DATABASE_PATH):
+    """Versions already applied to a database"""
+    # A dedicated connection: BEGIN/COMMIT here must never touch a transaction
+    # the calling thread has open on its shared connection
+    conn = open_connection(db_path)
+    try:
+        cursor = conn.cursor()
+        _ensure_version_table(cursor)
+        cursor.execute("SELECT version FROM schema_migrations")
+        return {row[0] for row in cursor.fetchall()}
+    finally:
+        conn.close()
+
+
+def run_migrations(db_path=DATABASE_PATH):
+    """
+    Apply every pending migration
+
+    Args:
+        db_path (str): Path to the SQLite database
+
+    Returns:
+        list: Versions applied by this call
+
+    Raises:
+        MigrationError: A migration failed; it was rolled back and later ones were not run
+    """
+    applied = []
+    # A dedicated connection: BEGIN/COMMIT here must never touch a transaction
+    # the calling thread has open on its shared connection
+    conn = open_connection(db_path)
+    try:
+        cursor = conn.cursor()
+        _ensure_version_table(cursor)
+        cursor.execute("SELECT version FROM schema_migrations")
+        done = {row[0] for row in cursor.fetchall()}
+
+        for version, description, func in MIGRATIONS:
+            if version in done:
+                continue
+            try:
+                cursor.execute("BEGIN")
+                func(cursor)
+                cursor.execute("INSERT INTO schema_migrations (version, description) VALUES (?, ?)",
+                               (version, description))
+                conn.commit()
+                applied.append(version)
+                print(f"✅ Applied migration {version}: {description}")
+            except sqlite3.Error as e:
+                conn.rollback()
+                print(f"❌ Migration {version} failed and was rolled back: {e}")
+                raise MigrationError(f"Migration {version} ({description}) failed: {e}") from e
+    finally:
+        conn.close()
+    return applied
+
+
+def ensure_migrated(db_path=DATABASE_PATH):
+    """
+    Run pending migrations once per database per process
+
+    A database whose migrations failed is not remembered, so the next
+    caller tries again.
+
+    Returns:
+        bool: True if the database is fully migrated
+    """
+    with _migrate_lock:
+        if db_path in _migrated_paths:
+            return True
+        try:
+            run_migrations(db_path)
+        except sqlite3.Error as e:
+            print(f"❌ Could not migrate {db_path}, will retry on next open: {e}")
+            return False
+        _migrated_paths.add(db_path)
+        return True
+
+
+# -------------------- Query plan regression check --------------------
+
+# Hot queries with the table aliases that must never be read by a full table scan
+HOT_QUERIES = {
+    'mark_attendance_lookup': {
+        'sql': "SELECT 1 FROM attendance a WHERE a.student_id = ? AND a.session_id = ?",
+        'params': ('S/1', 1),
+        'no_scan': ['a'],
+    },
+    'attendance_report': {
+        'sql': """
+            SELECT a.id, a.student_id, s.fname, s.lname, cs.session_id, cs.date, cs.start_time,
+                   c.class_name, co.course_code, a.timestamp, a.status
+            FROM attendance a
+            JOIN students s ON a.student_id = s.student_id
+            JOIN class_sessions cs ON a.session_id = cs.session_id
+            JOIN classes c ON cs.class_id = c.class_id
+            JOIN courses co ON c.course_code = co.course_code
+            LEFT JOIN class_instructors ci ON c.class_id = ci.class_id
+            WHERE cs.date BETWEEN ? AND ?
+            ORDER BY cs.date, cs.start_time, s.lname, s.fname
+        """,
+        'params': ('2025-01-01', '2025-01-31'),
+        'no_scan': ['a', 'cs', 'ci'],
+    },
+    'attendance_trends': {
+        'sql': """
+            SELECT c.course_code, cs.date, COUNT(DISTINCT a.student_id)
+            FROM class_sessions cs
+            JOIN classes c ON cs.class_id = c.class_id
+            LEFT JOIN attendance a ON cs.session_id = a.session_id
+            WHERE cs.date >= ?
+            GROUP BY c.course_code, cs.date
+            ORDER BY cs.date
+        """,
+        'params': ('2025-01-01',),
+        'no_scan': ['a', 'cs'],
+    },
+    'portal_attendance_history': {
+        'sql': """
+            SELECT a.session_id, a.timestamp, a.status, cs.date, cs.start_time, cl.class_name, c.course_code
+            FROM attendance a
+            JOIN class_sessions cs ON a.session_id = cs.session_id
+            JOIN classes cl ON cs.class_id = cl.class_id
+            LEFT JOIN courses c ON cl.course_code = c.course_code
+            WHERE a.student_id = ? AND cs.date BETWEEN ? AND ?
+            AND EXISTS (
+                SELECT 1 FROM student_courses sc JOIN class_courses cc ON cc.course_code = sc.course_code
+                WHERE sc.student_id = a.student_id AND sc.status = 'Active'
+                AND sc.semester = cl.semester AND cc.class_id = cl.class_id
+            )
+            AND cs.date <= ? AND (cs.date, COALESCE(cs.start_time, ''), a.session_id) < (?, ?, ?)
+            ORDER BY cs.date DESC, COALESCE(cs.start_time, '') DESC, a.session_id DESC
+            LIMIT ?
+        """,
+        'params': ('S/1', '2025-01-01', '2025-01-31', '2025-01-15', '2025-01-15', '09:00', 1, 11),
+        'no_scan': ['a', 'cs', 'cc', 'sc'],
+    },
+    'portal_enrolled_classes': {
+        'sql': """
+            SELECT DISTINCT cl.class_id, cl.class_name, c.course_code, c.course_name
+            FROM student_courses sc
+            JOIN courses c ON sc.course_code = c.course_code
+            JOIN class_courses cc ON c.course_code = cc.course_code
+            JOIN classes cl ON cc.class_id = cl.class_id
+            WHERE sc.student_id = ? AND sc.status = 'Active' AND cl.semester = sc.semester
+        """,
+        'params': ('S/1',),
+        'no_scan': ['sc', 'cc'],
+    },
+    'portal_attendance_summary': {
+        'sql': """
+            SELECT s.class_id, SUM(s.scheduled), SUM(s.present)
+            FROM attendance_summary s
+            WHERE s.student_id = ? AND s.month < ?
+            GROUP BY s.class_id
+        """,
+        'params': ('S/1', '2025-01'),
+        'no_scan': ['s'],
+    },
+    'portal_data_version': {
+        'sql': "SELECT v.scope, v.version FROM data_versions v WHERE v.scope IN (?, ?)",
+        'params': ('S/1', '*'),
+        'no_scan': ['v'],
+    },
+    'class_students': {
+        'sql': """
+            SELECT s.student_id, s.fname, s.lname
+            FROM students s
+            JOIN student_courses sc ON s.student_id = sc.student_id
+            WHERE sc.course_code = ? AND sc.status = 'Active'
+        """,
+        'params': ('CS101',),
+        'no_scan': ['sc'],
+    },
+}
+
+
+def explain(cursor, sql, params):
+    """Plan detail lines of EXPLAIN QUERY PLAN for a query"""
+    cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+    return [row[-1] for row in cursor.fetchall()]
+
+
+def check_query_plans(db_path=DATABASE_PATH, queries=None):
+    """
+    Check that hot queries are served by indexes
+
+    A query fails when one of its 'no_scan' tables is read with a full
+    table scan (a "SCAN <alias>" step that uses no index).
+
+    Returns:
+        dict: query name -> {'ok', 'plan', 'full_scans', 'error'}
+    """
+    queries = queries or HOT_QUERIES
+    report = {}
+    # A fresh connection: EXPLAIN never reads the schema cookie, so a long-lived
+    # one can keep planning against the schema it saw before a migration
+    conn = open_connection(db_path)
+    try:
+        cursor = conn.cursor()
+        for name, query in queries.items():
+            result = {'ok': True, 'plan': [], 'full_scans': [], 'error': None}
+            try:
+                result['plan'] = explain(cursor, query['sql'], query['params'])
+            except sqlite3.Error as e:
+                # Missing tables on a partial database are reported, not fatal
+                result.update(ok=False, error=str(e))
+                report[name] = result
+                continue
+
+            for detail in result['plan']:
+                words = detail.split()
+                if len(words) >= 2 and words[0] == "SCAN" and "INDEX" not in detail \
+                        and words[1] in query['no_scan']:
+                    result['full_scans'].append(detail)
+            result['ok'] = not result['full_scans']
+            report[name] = result
+    finally:
+        conn.close()
+    return report
+
+
+def print_plan_report(report):
+    for name, result in report.items():
+        status = "✅" if result['ok'] else "❌"
+        print(f"{status} {name}")
+        if result['error']:
+            print(f"    error: {result['error']}")
+        for detail in result['plan']:
+            marker = "!!" if detail in result['full_scans'] else "  "
+            print(f"  {marker} {detail}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Attendance database migrations")
+    parser.add_argument("--db", default=DATABASE_PATH, help="Path to the SQLite database")
+    parser.add_argument("--status", action="store_true", help="List applied migrations and exit")
+    parser.add_argument("--check-plans", action="store_true",
+                        help="Run the EXPLAIN QUERY PLAN regression check after migrating")
+    parser.add_argument("--rebuild-summary", action="store_true",
+                        help="Recompute the attendance summary from scratch after migrating")
+    parser.add_argument("--dedupe-attendance", action="store_true",
+                        help="Move duplicate attendance marks to a backup table and add the unique index")
+    args = parser.parse_args(argv)
+
+    if args.status:
+        done = applied_versions(args.db)
+        for version, description, _ in MIGRATIONS:
+            print(f"{'✅' if version in done else '⏳'} {version}: {description}")
+        return 0
+
+    try:
+        run_migrations(args.db)
+    except MigrationError:
+        return 1
+
+    if args.dedupe_attendance:
+        conn = open_connection(args.db)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            dedupe_attendance(cursor)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"❌ Could not remove duplicate attendance rows: {e}")
+            return 1
+        finally:
+            conn.close()
+
+    if args.rebuild_summary:
+        conn = open_connection(args.db)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            rebuild_attendance_summary(cursor)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"❌ Could not rebuild the attendance summary: {e}")
+            return 1
+        finally:
+            conn.close()
+
+    if args.check_plans:
+        report = check_query_plans(args.db)
+        print_plan_report(report)
+        return 0 if all(result['ok'] for result in report.values()) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,26 @@
-import sqlite3
+import threading
+from collections import OrderedDict
 from datetime import datetime
 
+from config.db_connection import get_connection
+from admin.db_migrations import ensure_migrated
+
 class DatabaseService:
+    # Student name/metadata cache shared by every DatabaseService instance,
+    # so the live recognition path never has to hit the database
+    STUDENT_CACHE_SIZE = 4096
+    STUDENT_QUERY_CHUNK = 500
+    _student_cache = OrderedDict()
+    _student_cache_lock = threading.Lock()
+    
     def __init__(self, db_path="attendance.db"):
         self.db_path = db_path
+        # Indexes, the attendance summary and the portal's version counters come from the migrations
+        ensure_migrated(self.db_path)
     
     def get_connection(self):
-        """Create and return a database connection"""
-        return sqlite3.connect(self.db_path)
+        """Return a handle to this thread's shared database connection"""
+        return get_connection(self.db_path)
         
     def load_settings(self):
         """Load application settings from database"""
@@ -225,58 +238,181 @@ class DatabaseService:
     
     def mark_attendance(self, student_id, session_id):
         """Mark student attendance for a session"""
+        results = self.mark_attendance_batch([(student_id, session_id)])
+        return bool(results and results[0])
+    
+    def mark_attendance_batch(self, marks):
+        """
+        Mark attendance for several students in a single transaction
+        
+        Args:
+            marks: Sequence of (student_id, session_id) or
+                   (student_id, session_id, timestamp) tuples
+            
+        Returns:
+            list: True for each newly marked student, False if already marked;
+                  None if the transaction failed and nothing was written
+        """
+        if not marks:
+            return []
+        
+        conn = None
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            # Check if attendance already marked for this student in this session
-            cursor.execute("""
-                SELECT id FROM attendance 
-                WHERE student_id = ? AND session_id = ?
-            """, (student_id, session_id))
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
-            if not cursor.fetchone():
-                # Insert new attendance record
+            results = []
+            log_entries = []
+            for mark in marks:
+                student_id, session_id = mark[0], mark[1]
+                timestamp = mark[2] if len(mark) > 2 else now
+                
+                # A repeat mark is a no-op: the existence check covers databases
+                # still waiting for the unique (student_id, session_id) index,
+                # OR IGNORE covers a concurrent writer when the index is there
                 cursor.execute("""
-                    INSERT INTO attendance 
+                    INSERT OR IGNORE INTO attendance 
                     (student_id, session_id, timestamp, status) 
-                    VALUES (?, ?, ?, 'Present')
-                """, (student_id, session_id, timestamp))
+                    SELECT ?, ?, ?, 'Present'
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM attendance WHERE student_id = ? AND session_id = ?
+                    )
+                """, (student_id, session_id, timestamp, student_id, session_id))
                 
-                # Log activity
-                cursor.execute("""
-                    INSERT INTO activity_log
-                    (user_id, activity_type, timestamp)
-                    VALUES (?, ?, datetime('now'))
-                """, (
+                if cursor.rowcount == 0:
+                    # Already marked
+                    results.append(False)
+                    continue
+                
+                results.append(True)
+                log_entries.append((
                     "admin",
                     f"Marked attendance for student {student_id} in session {session_id}"
                 ))
-                
-                conn.commit()
-                conn.close()
-                return True
-            else:
-                # Already marked
-                conn.close()
-                return False
+            
+            # Log activity
+            cursor.executemany("""
+                INSERT INTO activity_log
+                (user_id, activity_type, timestamp)
+                VALUES (?, ?, datetime('now'))
+            """, log_entries)
+            
+            conn.commit()
+            conn.close()
+            return results
         except Exception as e:
             print(f"Error marking attendance: {e}")
-            return False    
+            if conn:
+                conn.rollback()
+                conn.close()
+            return None
+    
+    def checkpoint(self):
+        """Flush the write-ahead log into the database file and sync it to disk"""
+        try:
+            conn = self.get_connection()
+            conn.execute("PRAGMA wal_checkpoint(FULL)")
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error checkpointing database: {e}")
+            return False
         
     def get_student_name(self, student_id):
-        """Get student name from database"""
+        """Get student name, served from the student cache when possible"""
+        info = self.get_student_info(student_id)
+        return info['name'] if info else "Unknown"
+    
+    def get_student_info(self, student_id):
+        """
+        Get cached name and metadata for a student
+        
+        Args:
+            student_id (str): Student ID in database format
+            
+        Returns:
+            dict: Student details, or None if the student does not exist
+        """
+        key = (self.db_path, student_id)
+        with self._student_cache_lock:
+            info = self._student_cache.get(key)
+            if info is not None:
+                self._student_cache.move_to_end(key)
+                return info
+        
+        loaded = self._fetch_students([student_id])
+        return loaded.get(student_id)
+    
+    def preload_student_names(self, student_ids):
+        """
+        Load names for many students in a few bulk queries, e.g. a session's
+        expected students before recognition starts
+        
+        Args:
+            student_ids: Student IDs to load
+            
+        Returns:
+            int: Number of students found
+        """
+        with self._student_cache_lock:
+            missing = [sid for sid in dict.fromkeys(student_ids)
+                       if (self.db_path, sid) not in self._student_cache]
+        if not missing:
+            return 0
+        return len(self._fetch_students(missing))
+    
+    def _fetch_students(self, student_ids):
+        """Query students in chunks and add them to the cache"""
+        found = {}
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
-            cursor.execute("SELECT fname, lname FROM students WHERE student_id = ?", (student_id,))
-            result = cursor.fetchone()
+            for i in range(0, len(student_ids), self.STUDENT_QUERY_CHUNK):
+                chunk = student_ids[i:i + self.STUDENT_QUERY_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                cursor.execute(f"""
+                    SELECT student_id, fname, lname, course, year_of_study, current_semester
+                    FROM students WHERE student_id IN ({placeholders})
+                """, chunk)
+                for row in cursor.fetchall():
+                    found[row[0]] = {
+                        'student_id': row[0],
+                        'name': f"{row[1]} {row[2]}",
+                        'fname': row[1],
+                        'lname': row[2],
+                        'course': row[3],
+                        'year_of_study': row[4],
+                        'current_semester': row[5]
+                    }
             conn.close()
-            return f"{result[0]} {result[1]}" if result else "Unknown"
         except Exception as e:
-            print(f"Error getting student name: {e}")
-            return "Unknown"
+            print(f"Error getting student details: {e}")
+            return found
+        
+        with self._student_cache_lock:
+            for student_id, info in found.items():
+                self._student_cache[(self.db_path, student_id)] = info
+                self._student_cache.move_to_end((self.db_path, student_id))
+            # Evict least recently used entries
+            while len(self._student_cache) > self.STUDENT_CACHE_SIZE:
+                self._student_cache.popitem(last=False)
+        return found
+    
+    @classmethod
+    def invalidate_student_cache(cls, student_id=None):
+        """
+        Forget cached details after a student is added, edited or removed
+        
+        Args:
+            student_id (str): Student to forget; None clears the whole cache
+        """
+        with cls._student_cache_lock:
+            if student_id is None:
+                cls._student_cache.clear()
+                return
+            for key in [key for key in cls._student_cache if key[1] == student_id]:
+                del cls._student_cache[key]
         
     def get_session_students(self, session_id):
         """Get all students who should attend a specific session"""
@@ -284,20 +420,31 @@ class DatabaseService:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            # First get the class info for this session
-            cursor.execute("""
-                SELECT cs.class_id, c.course_code, c.year, c.semester
-                FROM class_sessions cs
-                JOIN classes c ON cs.class_id = c.class_id
-                WHERE cs.session_id = ?
-            """, (session_id,))
-            
+            # First get the class for this session
+            cursor.execute("SELECT class_id FROM class_sessions WHERE session_id = ?", (session_id,))
             session_info = cursor.fetchone()
+            conn.close()
             if not session_info:
+                return []
+            
+            return self.get_class_students(session_info[0])
+        except Exception as e:
+            print(f"Error getting session students: {e}")
+            return []
+    
+    def get_class_students(self, class_id):
+        """Get all students enrolled in a class's course for its year and semester"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT course_code, year, semester FROM classes WHERE class_id = ?", (class_id,))
+            class_info = cursor.fetchone()
+            if not class_info:
                 conn.close()
                 return []
                 
-            class_id, course_code, year, semester = session_info
+            course_code, year, semester = class_info
             
             # Now get all students enrolled in this course for the specific year and semester
             cursor.execute("""
@@ -321,7 +468,7 @@ class DatabaseService:
             conn.close()
             return students
         except Exception as e:
-            print(f"Error getting session students: {e}")
+            print(f"Error getting class students: {e}")
             return []
             
     def get_session_attendance(self, session_id):
@@ -0,0 +1,301 @@
+import os
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from admin.face_gallery import FaceGallery
+from config.utils_constants import ENCODING_DIR
+
+
+class EncodingStore:
+    """
+    Append-only binary store for student face encodings.
+
+    All encodings live in a single raw float32 file (`gallery.f32`, 128
+    values per row) that is opened with one np.memmap call, next to a small
+    text index (`gallery_index.tsv`) with one `student_id<TAB>start<TAB>count`
+    line per write. Registering a student appends rows and one index line;
+    nothing is ever rewritten. When a student appears more than once in the
+    index the last line wins, and a count of 0 removes the student.
+    Superseded rows are reclaimed by compact().
+
+    Writers hold an OS lock on `gallery.lock`, so registration windows in
+    separate processes never interleave their rows or index lines.
+    """
+    ENCODING_SIZE = FaceGallery.ENCODING_SIZE
+    ROW_BYTES = ENCODING_SIZE * 4
+    DATA_FILE = "gallery.f32"
+    INDEX_FILE = "gallery_index.tsv"
+    LOCK_FILE = "gallery.lock"
+
+    _write_lock = threading.Lock()
+
+    def __init__(self, directory=ENCODING_DIR):
+        """
+        Initialize the store
+
+        Args:
+            directory (str): Directory holding the store files
+        """
+        self.directory = directory
+        self.data_path = os.path.join(directory, self.DATA_FILE)
+        self.index_path = os.path.join(directory, self.INDEX_FILE)
+        self.lock_path = os.path.join(directory, self.LOCK_FILE)
+
+    def exists(self):
+        """Whether the store has been created"""
+        return os.path.exists(self.index_path) and os.path.exists(self.data_path)
+
+    def row_count(self):
+        """Number of rows in the data file, including superseded ones"""
+        if not os.path.exists(self.data_path):
+            return 0
+        return os.path.getsize(self.data_path) // self.ROW_BYTES
+
+    def read_index(self):
+        """
+        Read the index file
+
+        Returns:
+            dict: student_id -> (start_row, count) for every live student,
+                  in the order students were first written
+        """
+        entries = {}
+        if not os.path.exists(self.index_path):
+            return entries
+
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.rstrip('\n')
+                if not line:
+                    continue
+                try:
+                    student_id, start, count = line.split('\t')
+                    start, count = int(start), int(count)
+                except ValueError:
+                    print(f"⚠️ Skipping malformed encoding index line {line_number}")
+                    continue
+
+                if count == 0:
+                    entries.pop(student_id, None)
+                else:
+                    entries[student_id] = (start, count)
+        return entries
+
+    def index_state(self):
+        """
+        Identity and size of the index file, used for change tracking
+
+        Returns:
+            tuple: (inode, size) or None if there is no index yet
+        """
+        try:
+            stat = os.stat(self.index_path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_size
+
+    def read_changes(self, offset):
+        """
+        Index entries written after a byte offset
+
+        Args:
+            offset (int): Size of the index file when it was last read
+
+        Returns:
+            tuple: (dict of student_id -> (start, count), new offset); a count
+                   of 0 means the student was removed
+        """
+        changes = {}
+        if not os.path.exists(self.index_path):
+            return changes, 0
+
+        with open(self.index_path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+
+        # Only consume complete lines; a line being written is picked up next time
+        complete = data.rfind(b'\n') + 1
+        for line in data[:complete].decode('utf-8').splitlines():
+            try:
+                student_id, start, count = line.split('\t')
+                changes[student_id] = (int(start), int(count))
+            except ValueError:
+                continue
+        return changes, offset + complete
+
+    def open_matrix(self):
+        """
+        Memory-map the data file
+
+        Returns:
+            np.ndarray: Read-only (rows, 128) float32 view of every stored row
+        """
+        rows = self.row_count()
+        if rows == 0:
+            return np.empty((0, self.ENCODING_SIZE), dtype=np.float32)
+        return np.memmap(self.data_path, dtype=np.float32, mode='r',
+                         shape=(rows, self.ENCODING_SIZE))
+
+    def get(self, student_id):
+        """
+        Encodings stored for one student
+
+        Returns:
+            np.ndarray: (count, 128) array, empty if the student is not stored
+        """
+        entry = self.read_index().get(student_id)
+        if entry is None:
+            return np.empty((0, self.ENCODING_SIZE), dtype=np.float32)
+        start, count = entry
+        return np.array(self.open_matrix()[start:start + count])
+
+    def load_gallery(self):
+        """
+        Build a FaceGallery from the store with a single mmap and one gather
+
+        Returns:
+            FaceGallery: Gallery with every live student's encodings
+        """
+        entries = self.read_index()
+        matrix = self.open_matrix()
+
+        # Ignore entries pointing past the end of the data file (interrupted write)
+        valid = {sid: (start, count) for sid, (start, count) in entries.items()
+                 if start + count <= len(matrix)}
+        if len(valid) != len(entries):
+            print(f"⚠️ Ignoring {len(entries) - len(valid)} incomplete encoding entries")
+
+        student_ids = list(valid)
+        starts = np.array([valid[sid][0] for sid in student_ids], dtype=np.int64)
+        counts = np.array([valid[sid][1] for sid in student_ids], dtype=np.int64)
+        return FaceGallery.from_blocks(matrix, student_ids, starts, counts)
+
+    def append(self, student_id, encodings):
+        """
+        Store encodings for a student, replacing any previous ones
+
+        Args:
+            student_id (str): Student ID in database format
+            encodings: Sequence of 128-d encodings
+
+        Returns:
+            int: Number of rows written
+        """
+        block = np.ascontiguousarray(encodings, dtype=np.float32).reshape(-1, self.ENCODING_SIZE)
+        if len(block) == 0:
+            return 0
+
+        with self._locked():
+            start = self._write_rows(block)
+
+            # The index line is written last, so readers never see rows that are not on disk
+            self._append_index_lines([(student_id, start, len(block))])
+        return len(block)
+
+    def append_many(self, items):
+        """
+        Store encodings for several students with one data write
+
+        Args:
+            items: Iterable of (student_id, encodings) pairs
+
+        Returns:
+            int: Number of rows written
+        """
+        blocks, ids = [], []
+        for student_id, encodings in items:
+            block = np.asarray(encodings, dtype=np.float32).reshape(-1, self.ENCODING_SIZE)
+            if len(block):
+                blocks.append(block)
+                ids.append(student_id)
+        if not blocks:
+            return 0
+
+        with self._locked():
+            start = self._write_rows(np.concatenate(blocks))
+
+            lines = []
+            for student_id, block in zip(ids, blocks):
+                lines.append((student_id, start, len(block)))
+                start += len(block)
+            self._append_index_lines(lines)
+        return sum(len(block) for block in blocks)
+
+    def remove(self, student_id):
+        """Mark a student's encodings as deleted"""
+        with self._locked():
+            self._append_index_lines([(student_id, 0, 0)])
+
+    @contextmanager
+    def _locked(self):
+        """Hold the write lock for this process's threads and for other processes"""
+        with self._write_lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.lock_path, 'a+b') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                    else:
+                        lock_file.seek(0)
+                        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _write_rows(self, block):
+        """Append rows to the data file and return the index of the first one"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.data_path, 'ab') as f:
+            # Drop any partial row left behind by an interrupted write
+            start = f.tell() // self.ROW_BYTES
+            f.truncate(start * self.ROW_BYTES)
+            f.write(block.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        return start
+
+    def _append_index_lines(self, lines):
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            for student_id, start, count in lines:
+                f.write(f"{student_id}\t{start}\t{count}\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def compact(self):
+        """
+        Rewrite the store without superseded or removed rows
+
+        Returns:
+            int: Number of rows reclaimed
+        """
+        with self._locked():
+            entries = self.read_index()
+            matrix = self.open_matrix()
+            total_rows = len(matrix)
+
+            tmp_data = self.data_path + ".tmp"
+            tmp_index = self.index_path + ".tmp"
+            position = 0
+            with open(tmp_data, 'wb') as data_file, open(tmp_index, 'w', encoding='utf-8') as index_file:
+                for student_id, (start, count) in entries.items():
+                    if start + count > total_rows:
+                        continue
+                    data_file.write(np.asarray(matrix[start:start + count]).tobytes())
+                    index_file.write(f"{student_id}\t{position}\t{count}\n")
+                    position += count
+            del matrix
+
+            os.replace(tmp_data, self.data_path)
+            os.replace(tmp_index, self.index_path)
+            return total_rows - position
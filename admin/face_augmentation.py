@@ -0,0 +1,213 @@
+import os
+import hashlib
+import threading
+
+import cv2
+import dlib
+import numpy as np
+import face_recognition
+from face_recognition import api as face_api
+
+from config.utils_constants import ENCODING_DIR
+
+
+def content_hash(data):
+    """SHA-1 of raw bytes, used as the cache key for an image"""
+    return hashlib.sha1(data).hexdigest()
+
+
+def image_hash(image):
+    """SHA-1 of a decoded image's pixels and shape"""
+    digest = hashlib.sha1(str(image.shape).encode())
+    digest.update(np.ascontiguousarray(image).tobytes())
+    return digest.hexdigest()
+
+
+class FaceAugmenter:
+    """
+    Augmented face encodings for enrollment, computed once per image.
+
+    A face is detected once on the original image. Its landmarks are
+    predicted once too, and carried over to every variant: unchanged for
+    brightness and contrast variants, moved with the same affine transform
+    as the pixels for rotated ones. All variants then go through the encoder
+    in one batch. Results are cached on disk by image content, so running
+    registration, migration or bulk import again on the same photo does no
+    detection or encoding at all.
+    """
+    # Bump when the variants or the way they are encoded change, so stale cache entries are ignored
+    CACHE_VERSION = 1
+    VARIANTS = ("original", "darker", "brighter", "autocontrast", "rotate_-5", "rotate_5")
+
+    def __init__(self, cache_dir=os.path.join(ENCODING_DIR, "augmentation_cache"), model="hog"):
+        """
+        Initialize the augmenter
+
+        Args:
+            cache_dir (str): Directory for cached results; None disables caching
+            model (str): Face detection model, "hog" or "cnn"
+        """
+        self.cache_dir = cache_dir
+        self.model = model
+        self._lock = threading.Lock()
+        self._salt = f"v{self.CACHE_VERSION}:{','.join(self.VARIANTS)}:".encode()
+
+    def cache_key(self, data):
+        """Cache key for raw image bytes"""
+        return content_hash(self._salt + data)
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.npz")
+
+    def lookup(self, key):
+        """Cached result for a key, or None"""
+        if not self.cache_dir or key is None:
+            return None
+        path = self._cache_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return {
+                    'face_locations': [tuple(int(v) for v in box) for box in data['face_locations']],
+                    'encodings': data['encodings'].astype(np.float32).reshape(-1, 128),
+                    'cached': True
+                }
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Ignoring unreadable augmentation cache entry {key}: {e}")
+            return None
+
+    def _store_cached(self, key, result):
+        if not self.cache_dir or key is None:
+            return
+        path = self._cache_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            np.savez(tmp_path,
+                     face_locations=np.array(result['face_locations'], dtype=np.int32).reshape(-1, 4),
+                     encodings=result['encodings'])
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not cache augmented encodings: {e}")
+
+    def encode_file(self, image_path):
+        """
+        Augmented encodings for an image file, from the cache when possible
+
+        Returns:
+            dict: 'face_locations' found, 'encodings' as an (N, 128) array
+                  (empty unless exactly one face was found) and 'cached'
+        """
+        with open(image_path, 'rb') as f:
+            key = self.cache_key(f.read())
+        cached = self.lookup(key)
+        if cached is not None:
+            return cached
+        return self.encode(face_recognition.load_image_file(image_path), key=key)
+
+    def encode(self, image, face_location=None, key=None):
+        """
+        Augmented encodings for a decoded RGB image
+
+        Args:
+            image: RGB image array
+            face_location: Known (top, right, bottom, left) box; detected if not given
+            key (str): Cache key; defaults to a hash of the pixels
+
+        Returns:
+            dict: 'face_locations' found, 'encodings' as an (N, 128) array
+                  (empty unless exactly one face was found) and 'cached'
+        """
+        if key is None:
+            key = content_hash(self._salt + image_hash(image).encode()
+                               + str(face_location).encode())
+        cached = self.lookup(key)
+        if cached is not None:
+            return cached
+
+        if face_location is None:
+            face_locations = face_recognition.face_locations(image, model=self.model)
+        else:
+            face_locations = [tuple(face_location)]
+
+        encodings = np.empty((0, 128), dtype=np.float32)
+        if len(face_locations) == 1:
+            encodings = self._encode_variants(image, face_locations[0])
+
+        result = {'face_locations': face_locations, 'encodings': encodings, 'cached': False}
+        self._store_cached(key, result)
+        return result
+
+    def _variants(self, image, shape):
+        """
+        Augmented copies of an image with matching landmarks
+
+        Returns:
+            list: (image, full_object_detection) pairs, one per VARIANTS entry
+        """
+        height, width = image.shape[:2]
+        variants = []
+        for name in self.VARIANTS:
+            if name == "original":
+                variants.append((image, shape))
+            elif name == "darker":
+                variants.append((np.clip(image * 0.9, 0, 255).astype(np.uint8), shape))
+            elif name == "brighter":
+                variants.append((np.clip(image * 1.1, 0, 255).astype(np.uint8), shape))
+            elif name == "autocontrast":
+                low, high = np.percentile(image, (0.5, 99.5), axis=(0, 1))
+                scale = 255.0 / np.maximum(high - low, 1)
+                stretched = np.clip((image - low) * scale, 0, 255).astype(np.uint8)
+                variants.append((stretched, shape))
+            elif name.startswith("rotate_"):
+                angle = float(name.split("_", 1)[1])
+                matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+                rotated = cv2.warpAffine(image, matrix, (width, height), borderMode=cv2.BORDER_REPLICATE)
+                variants.append((rotated, self._transform_shape(shape, matrix, width, height)))
+        return variants
+
+    @staticmethod
+    def _transform_shape(shape, matrix, width, height):
+        """Move landmarks and their box with an affine transform"""
+        points = np.array([[p.x, p.y, 1.0] for p in shape.parts()]) @ matrix.T
+        rect = shape.rect
+        center = np.array([(rect.left() + rect.right()) / 2, (rect.top() + rect.bottom()) / 2, 1.0]) @ matrix.T
+        half_w, half_h = rect.width() / 2, rect.height() / 2
+        moved_rect = dlib.rectangle(
+            int(max(0, center[0] - half_w)), int(max(0, center[1] - half_h)),
+            int(min(width - 1, center[0] + half_w)), int(min(height - 1, center[1] + half_h))
+        )
+        parts = dlib.points()
+        for x, y in points:
+            parts.append(dlib.point(int(round(x)), int(round(y))))
+        return dlib.full_object_detection(moved_rect, parts)
+
+    def _encode_variants(self, image, face_location):
+        """Encode every variant of one face in a single encoder batch"""
+        top, right, bottom, left = face_location
+        rect = dlib.rectangle(max(0, left), max(0, top), min(image.shape[1] - 1, right),
+                              min(image.shape[0] - 1, bottom))
+        # Same 5-point landmarks face_recognition.face_encodings uses by default
+        shape = face_api.pose_predictor_5_point(image, rect)
+        variants = self._variants(image, shape)
+
+        try:
+            batch_shapes = []
+            for _, variant_shape in variants:
+                detections = dlib.full_object_detections()
+                detections.append(variant_shape)
+                batch_shapes.append(detections)
+            with self._lock:
+                descriptors = face_api.face_encoder.compute_face_descriptor(
+                    [np.ascontiguousarray(variant) for variant, _ in variants], batch_shapes, 1
+                )
+            encodings = [np.array(faces[0]) for faces in descriptors]
+        except (TypeError, RuntimeError) as e:
+            # Older dlib builds have no batch API; encode the variants one by one
+            print(f"⚠️ Batch encoding unavailable ({e}), encoding variants separately")
+            encodings = []
+            for variant, variant_shape in variants:
+                encodings.append(np.array(face_api.face_encoder.compute_face_descriptor(variant, variant_shape, 1)))
+
+        return np.asarray(encodings, dtype=np.float32).reshape(-1, 128)
@@ -0,0 +1,453 @@
+import numpy as np
+
+
+class FaceGallery:
+    """
+    Contiguous in-memory store of known face encodings.
+
+    All encodings live in one preallocated (N, 128) float32 matrix with a
+    parallel int32 array mapping every row to a student index, so a whole
+    batch of probe faces can be compared against the gallery with a single
+    matrix product instead of one face_distance call per face.
+    """
+    ENCODING_SIZE = 128
+    REDUCTIONS = ("min", "mean", "trimmed_mean")
+    TRIM_FRACTION = 0.2
+
+    def __init__(self, capacity=0):
+        """
+        Initialize an empty gallery
+
+        Args:
+            capacity (int): Number of encoding rows to preallocate
+        """
+        capacity = max(int(capacity), 0)
+        self._matrix = np.empty((capacity, self.ENCODING_SIZE), dtype=np.float32)
+        self._sq_norms = np.empty(capacity, dtype=np.float32)
+        self._row_students = np.empty(capacity, dtype=np.int32)
+        self._size = 0
+
+        # Student index -> student ID (database format) and reverse lookup
+        self.student_ids = []
+        self._student_lookup = {}
+
+        # Cached (S, K) row layout used by per-student reductions
+        self._student_rows = None
+
+    @classmethod
+    def from_encodings(cls, encodings, student_ids):
+        """
+        Build a gallery from parallel lists of encodings and student IDs
+
+        Args:
+            encodings: Sequence of 128-d face encodings
+            student_ids: Student ID for each encoding
+
+        Returns:
+            FaceGallery: Gallery holding all the encodings
+        """
+        gallery = cls(capacity=len(encodings))
+        for encoding, student_id in zip(encodings, student_ids):
+            gallery.add(student_id, [encoding])
+        return gallery
+
+    @classmethod
+    def from_arrays(cls, encodings, row_students, student_ids):
+        """
+        Rebuild a gallery from its saved arrays
+
+        Args:
+            encodings: (N, 128) encoding matrix
+            row_students: Student index of every row
+            student_ids: Student ID of every student index
+
+        Returns:
+            FaceGallery: Gallery holding the given rows
+        """
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, cls.ENCODING_SIZE)
+        gallery = cls(capacity=len(encodings))
+        gallery._matrix[:len(encodings)] = encodings
+        gallery._sq_norms[:len(encodings)] = np.einsum('ij,ij->i', encodings, encodings)
+        gallery._row_students[:len(encodings)] = np.asarray(row_students, dtype=np.int32)
+        gallery._size = len(encodings)
+        gallery.student_ids = list(student_ids)
+        gallery._student_lookup = {sid: i for i, sid in enumerate(gallery.student_ids)}
+        return gallery
+
+    @classmethod
+    def from_blocks(cls, matrix, student_ids, starts, counts):
+        """
+        Build a gallery from contiguous per-student blocks of a larger matrix
+
+        Args:
+            matrix: (R, 128) array, e.g. a memory-mapped encoding store
+            student_ids: Student ID of each block
+            starts: First row of each block
+            counts: Number of rows in each block
+
+        Returns:
+            FaceGallery: Gallery holding the selected rows
+        """
+        counts = np.asarray(counts, dtype=np.int64)
+        total = int(counts.sum()) if len(counts) else 0
+        gallery = cls(capacity=total)
+        if total == 0:
+            return gallery
+
+        # Row numbers of every block laid end to end, gathered in one go
+        starts = np.asarray(starts, dtype=np.int64)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        rows = np.repeat(starts, counts) + offsets
+
+        block = gallery._matrix[:total]
+        block[:] = matrix[rows]
+        gallery._sq_norms[:total] = np.einsum('ij,ij->i', block, block)
+        gallery._row_students[:total] = np.repeat(np.arange(len(counts), dtype=np.int32), counts)
+        gallery._size = total
+
+        gallery.student_ids = list(student_ids)
+        gallery._student_lookup = {sid: i for i, sid in enumerate(gallery.student_ids)}
+        return gallery
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def encodings(self):
+        """View of the used rows of the encoding matrix"""
+        return self._matrix[:self._size]
+
+    @property
+    def row_student_indices(self):
+        """Student index of every encoding row, in row order"""
+        return self._row_students[:self._size]
+
+    @property
+    def row_student_ids(self):
+        """Student ID of every encoding row, in row order"""
+        return [self.student_ids[i] for i in self._row_students[:self._size]]
+
+    @property
+    def student_count(self):
+        return len(self.student_ids)
+
+    def _reserve(self, rows):
+        """Grow the preallocated buffers so that `rows` more rows fit"""
+        required = self._size + rows
+        capacity = self._matrix.shape[0]
+        if required <= capacity:
+            return
+
+        new_capacity = max(required, capacity * 2, 64)
+        matrix = np.empty((new_capacity, self.ENCODING_SIZE), dtype=np.float32)
+        sq_norms = np.empty(new_capacity, dtype=np.float32)
+        row_students = np.empty(new_capacity, dtype=np.int32)
+
+        matrix[:self._size] = self._matrix[:self._size]
+        sq_norms[:self._size] = self._sq_norms[:self._size]
+        row_students[:self._size] = self._row_students[:self._size]
+
+        self._matrix, self._sq_norms, self._row_students = matrix, sq_norms, row_students
+
+    def add(self, student_id, encodings):
+        """
+        Append encodings for a student
+
+        Args:
+            student_id (str): Student ID in database format
+            encodings: Sequence of 128-d encodings (or an (n, 128) array)
+
+        Returns:
+            int: Number of rows added
+        """
+        block = np.asarray(encodings, dtype=np.float32).reshape(-1, self.ENCODING_SIZE)
+        if len(block) == 0:
+            return 0
+
+        student_index = self._student_lookup.get(student_id)
+        if student_index is None:
+            student_index = len(self.student_ids)
+            self.student_ids.append(student_id)
+            self._student_lookup[student_id] = student_index
+
+        self._reserve(len(block))
+        start, end = self._size, self._size + len(block)
+        self._matrix[start:end] = block
+        self._sq_norms[start:end] = np.einsum('ij,ij->i', block, block)
+        self._row_students[start:end] = student_index
+        self._size = end
+        self._student_rows = None
+        return len(block)
+
+    def __contains__(self, student_id):
+        return student_id in self._student_lookup
+
+    def copy(self):
+        """
+        Independent copy of the gallery
+
+        Used for copy-on-write updates: modify the copy, then swap it in so
+        readers holding the old gallery are never affected mid-match.
+        """
+        gallery = FaceGallery(capacity=self._matrix.shape[0])
+        gallery._matrix[:self._size] = self._matrix[:self._size]
+        gallery._sq_norms[:self._size] = self._sq_norms[:self._size]
+        gallery._row_students[:self._size] = self._row_students[:self._size]
+        gallery._size = self._size
+        gallery.student_ids = list(self.student_ids)
+        gallery._student_lookup = dict(self._student_lookup)
+        return gallery
+
+    def remove(self, student_id):
+        """
+        Remove every encoding of a student
+
+        Args:
+            student_id (str): Student ID in database format
+
+        Returns:
+            int: Number of rows removed
+        """
+        student_index = self._student_lookup.pop(student_id, None)
+        if student_index is None:
+            return 0
+
+        row_students = self._row_students[:self._size]
+        keep = row_students != student_index
+        kept = int(keep.sum())
+
+        self._matrix[:kept] = self._matrix[:self._size][keep]
+        self._sq_norms[:kept] = self._sq_norms[:self._size][keep]
+        remaining = row_students[keep]
+        # Students after the removed one move down by one index
+        remaining[remaining > student_index] -= 1
+        self._row_students[:kept] = remaining
+
+        removed = self._size - kept
+        self._size = kept
+        del self.student_ids[student_index]
+        self._student_lookup = {sid: i for i, sid in enumerate(self.student_ids)}
+        self._student_rows = None
+        return removed
+
+    def replace(self, student_id, encodings):
+        """
+        Replace a student's encodings, adding the student if not present
+
+        Returns:
+            int: Number of rows now stored for the student
+        """
+        self.remove(student_id)
+        return self.add(student_id, encodings)
+
+    def subset(self, student_ids):
+        """
+        Build a new gallery restricted to the given students
+
+        Args:
+            student_ids: Iterable of student IDs to keep
+
+        Returns:
+            FaceGallery: Gallery containing only rows of those students
+        """
+        keep = [self._student_lookup[sid] for sid in set(student_ids) if sid in self._student_lookup]
+        mask = np.isin(self._row_students[:self._size], np.asarray(keep, dtype=np.int32))
+
+        rows = self._row_students[:self._size][mask]
+        gallery = FaceGallery(capacity=len(rows))
+        if len(rows) == 0:
+            return gallery
+
+        # Re-number the kept students densely, preserving their original order
+        kept_students, new_index = np.unique(rows, return_inverse=True)
+        gallery.student_ids = [self.student_ids[i] for i in kept_students]
+        gallery._student_lookup = {sid: i for i, sid in enumerate(gallery.student_ids)}
+
+        gallery._matrix[:len(rows)] = self._matrix[:self._size][mask]
+        gallery._sq_norms[:len(rows)] = self._sq_norms[:self._size][mask]
+        gallery._row_students[:len(rows)] = new_index
+        gallery._size = len(rows)
+        return gallery
+
+    def distances(self, probes):
+        """
+        Euclidean distances between probe encodings and every gallery row
+
+        Args:
+            probes: One 128-d encoding or a (P, 128) batch
+
+        Returns:
+            np.ndarray: (P, N) float32 distance matrix
+        """
+        probes = np.asarray(probes, dtype=np.float32).reshape(-1, self.ENCODING_SIZE)
+        if self._size == 0 or len(probes) == 0:
+            return np.empty((len(probes), self._size), dtype=np.float32)
+
+        # ||p - g||^2 = ||p||^2 + ||g||^2 - 2 p.g, computed as one matrix product
+        probe_sq = np.einsum('ij,ij->i', probes, probes)
+        sq = probe_sq[:, None] + self._sq_norms[None, :self._size]
+        sq -= 2.0 * (probes @ self._matrix[:self._size].T)
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq, out=sq)
+
+    def top_k(self, probes, k=1):
+        """
+        Find the k closest gallery rows for each probe
+
+        Args:
+            probes: One 128-d encoding or a (P, 128) batch
+            k (int): Number of neighbours to return
+
+        Returns:
+            tuple: ((P, k) row indices, (P, k) distances), closest first
+        """
+        dists = self.distances(probes)
+        k = min(k, self._size)
+        if k == 0:
+            empty = np.empty((len(dists), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        if k < self._size:
+            idx = np.argpartition(dists, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.broadcast_to(np.arange(self._size), dists.shape).copy()
+        part = np.take_along_axis(dists, idx, axis=1)
+        order = np.argsort(part, axis=1)
+        return np.take_along_axis(idx, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+    def within_tolerance(self, probes, tolerance):
+        """
+        Boolean (P, N) mask of gallery rows within tolerance of each probe,
+        equivalent to face_recognition.compare_faces for a batch
+        """
+        return self.distances(probes) <= tolerance
+
+    def best_matches(self, probes, tolerance):
+        """
+        Best matching student for each probe
+
+        Args:
+            probes: One 128-d encoding or a (P, 128) batch
+            tolerance (float): Maximum distance for a match
+
+        Returns:
+            list: (student_id or None, distance) per probe
+        """
+        idx, dists = self.top_k(probes, k=1)
+        matches = []
+        for row in range(len(idx)):
+            if idx.shape[1] == 0:
+                matches.append((None, 1.0))
+                continue
+
+            distance = float(dists[row, 0])
+            if distance <= tolerance:
+                student_index = self._row_students[idx[row, 0]]
+                matches.append((self.student_ids[student_index], distance))
+            else:
+                matches.append((None, distance))
+        return matches
+
+    def _get_student_rows(self):
+        """
+        Row indices of every student's encodings as an (S, K) matrix padded
+        with -1, where K is the largest number of encodings per student
+        """
+        if self._student_rows is None:
+            row_students = self._row_students[:self._size]
+            counts = np.bincount(row_students, minlength=self.student_count)
+            order = np.argsort(row_students, kind='stable')
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+            width = int(counts.max()) if len(counts) else 0
+            rows = np.full((self.student_count, width), -1, dtype=np.int64)
+            positions = np.arange(self._size) - np.repeat(starts, counts)
+            rows[row_students[order], positions] = order
+            self._student_rows = rows
+        return self._student_rows
+
+    def student_scores(self, probes, reduction="min", trim=None):
+        """
+        Reduce probe distances over each student's encodings
+
+        Args:
+            probes: One 128-d encoding or a (P, 128) batch
+            reduction (str): "min", "mean" or "trimmed_mean"
+            trim (float): Fraction trimmed from each end for "trimmed_mean",
+                          at least 0 and below 0.5
+
+        Returns:
+            np.ndarray: (P, S) score matrix, lower is a better match
+        """
+        if reduction not in self.REDUCTIONS:
+            raise ValueError(f"Unknown reduction '{reduction}', expected one of {self.REDUCTIONS}")
+        trim = self.TRIM_FRACTION if trim is None else trim
+        if reduction == "trimmed_mean" and not 0 <= trim < 0.5:
+            # Trimming half or more from each end would leave no distances to average
+            raise ValueError(f"Trim fraction must be at least 0 and below 0.5, got {trim}")
+
+        dists = self.distances(probes)
+        rows = self._get_student_rows()
+        if rows.size == 0:
+            return np.empty((len(dists), self.student_count), dtype=np.float32)
+
+        valid = rows >= 0
+        counts = valid.sum(axis=1)
+        # (P, S, K) distances of every probe to every student's encodings
+        per_student = np.where(valid[None], dists[:, np.where(valid, rows, 0)], np.inf)
+
+        if reduction == "min":
+            return per_student.min(axis=2)
+
+        if reduction == "mean":
+            per_student[~np.broadcast_to(valid[None], per_student.shape)] = 0.0
+            return per_student.sum(axis=2) / counts[None, :]
+
+        # Trimmed mean: sort each student's distances and drop both tails
+        per_student.sort(axis=2)
+        cut = np.floor(counts * trim).astype(np.int64)
+        positions = np.arange(rows.shape[1])
+        keep = (positions[None, :] >= cut[:, None]) & (positions[None, :] < (counts - cut)[:, None])
+        kept = np.where(keep[None], per_student, 0.0)
+        return kept.sum(axis=2) / (counts - cut * 2)[None, :]
+
+    def rank_students(self, probes, reduction="min", top_n=5, trim=None):
+        """
+        Rank students for each probe by aggregated score
+
+        Args:
+            probes: One 128-d encoding or a (P, 128) batch
+            reduction (str): "min", "mean" or "trimmed_mean"
+            top_n (int): Number of ranked students to return per probe
+            trim (float): Fraction trimmed from each end for "trimmed_mean"
+
+        Returns:
+            list: One dict per probe with 'student_ids', 'scores' (best first)
+                  and 'margin' between the best and second-best scores
+        """
+        scores = self.student_scores(probes, reduction, trim)
+        top_n = min(top_n, scores.shape[1])
+
+        if top_n < scores.shape[1]:
+            idx = np.argpartition(scores, top_n - 1, axis=1)[:, :top_n]
+        else:
+            idx = np.broadcast_to(np.arange(scores.shape[1]), scores.shape).copy()
+        part = np.take_along_axis(scores, idx, axis=1)
+        order = np.argsort(part, axis=1)
+        idx = np.take_along_axis(idx, order, axis=1)
+        part = np.take_along_axis(part, order, axis=1)
+
+        rankings = []
+        for row in range(len(scores)):
+            ranked_scores = [float(v) for v in part[row]]
+            if len(ranked_scores) > 1:
+                margin = ranked_scores[1] - ranked_scores[0]
+            else:
+                # A single candidate has no competitor to be confused with
+                margin = float('inf') if ranked_scores else 0.0
+            rankings.append({
+                'student_ids': [self.student_ids[i] for i in idx[row]],
+                'scores': ranked_scores,
+                'margin': margin
+            })
+        return rankings
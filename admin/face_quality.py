@@ -0,0 +1,160 @@
+from collections import Counter
+
+import cv2
+import numpy as np
+
+
+class FaceQualityScorer:
+    """
+    Cheap per-face quality checks run on the crop before encoding.
+
+    Computing a 128-d encoding is the most expensive step per face, and
+    crops that are tiny, blurred, badly exposed, flat or turned sideways
+    rarely produce a usable match. Each crop is scored on size, sharpness
+    (variance of the Laplacian), brightness, contrast and a pose proxy
+    (left/right symmetry), and only crops that pass every check are encoded.
+
+    Plain attributes only, so a scorer can be handed to worker processes.
+    """
+    REASONS = ("too_small", "blurry", "too_dark", "too_bright", "low_contrast", "off_angle")
+    REASON_LABELS = {
+        "too_small": "Too small",
+        "blurry": "Blurry",
+        "too_dark": "Too dark",
+        "too_bright": "Too bright",
+        "low_contrast": "Low contrast",
+        "off_angle": "Turned away",
+    }
+    # Crops are resized to this size before measuring, so thresholds do not depend on distance
+    SAMPLE_SIZE = 96
+
+    def __init__(self, min_face_size=50, min_sharpness=50.0, brightness_min=40, brightness_max=215,
+                 contrast_min=20, max_asymmetry=0.7):
+        """
+        Initialize the scorer
+
+        Args:
+            min_face_size (int): Smallest face box side in pixels
+            min_sharpness (float): Lowest Laplacian variance of the resized crop
+            brightness_min (float): Lowest mean gray level
+            brightness_max (float): Highest mean gray level
+            contrast_min (float): Lowest gray level standard deviation
+            max_asymmetry (float): Highest 1 - correlation between the left half
+                                   and the mirrored right half of the face
+        """
+        self.min_face_size = min_face_size
+        self.min_sharpness = min_sharpness
+        self.brightness_min = brightness_min
+        self.brightness_max = brightness_max
+        self.contrast_min = contrast_min
+        self.max_asymmetry = max_asymmetry
+
+    def measure(self, rgb_frame, face_location):
+        """
+        Quality measurements for one face
+
+        Args:
+            rgb_frame: RGB frame the face was found in
+            face_location: (top, right, bottom, left) box
+
+        Returns:
+            dict: 'size', 'sharpness', 'brightness', 'contrast' and 'asymmetry'
+        """
+        top, right, bottom, left = face_location
+        size = min(bottom - top, right - left)
+        crop = rgb_frame[max(0, top):max(0, bottom), max(0, left):max(0, right)]
+        if crop.size == 0:
+            return {'size': 0, 'sharpness': 0.0, 'brightness': 0.0, 'contrast': 0.0, 'asymmetry': 1.0}
+
+        gray = cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY)
+        sample = cv2.resize(gray, (self.SAMPLE_SIZE, self.SAMPLE_SIZE), interpolation=cv2.INTER_AREA)
+        sample = sample.astype(np.float32)
+
+        half = self.SAMPLE_SIZE // 2
+        left_half = sample[:, :half].ravel()
+        mirrored_right = sample[:, :half - 1:-1].ravel()
+        if left_half.std() > 0 and mirrored_right.std() > 0:
+            asymmetry = 1.0 - float(np.corrcoef(left_half, mirrored_right)[0, 1])
+        else:
+            asymmetry = 1.0
+
+        return {
+            'size': int(size),
+            'sharpness': float(cv2.Laplacian(sample, cv2.CV_32F).var()),
+            'brightness': float(sample.mean()),
+            'contrast': float(sample.std()),
+            'asymmetry': asymmetry
+        }
+
+    def reject_reason(self, measurements):
+        """
+        First failed check for a set of measurements
+
+        Returns:
+            str: One of REASONS, or None if the face is good enough to encode
+        """
+        if measurements['size'] < self.min_face_size:
+            return "too_small"
+        if measurements['brightness'] < self.brightness_min:
+            return "too_dark"
+        if measurements['brightness'] > self.brightness_max:
+            return "too_bright"
+        if measurements['contrast'] < self.contrast_min:
+            return "low_contrast"
+        if measurements['sharpness'] < self.min_sharpness:
+            return "blurry"
+        if measurements['asymmetry'] > self.max_asymmetry:
+            return "off_angle"
+        return None
+
+    def check(self, rgb_frame, face_location):
+        """
+        Whether a face is worth encoding
+
+        Returns:
+            str: Reject reason, or None if the face passes
+        """
+        # Size needs no pixels, so tiny faces are rejected before any image work
+        top, right, bottom, left = face_location
+        if min(bottom - top, right - left) < self.min_face_size:
+            return "too_small"
+        return self.reject_reason(self.measure(rgb_frame, face_location))
+
+    def filter(self, rgb_frame, face_locations):
+        """
+        Split faces into those worth encoding and rejected ones
+
+        Args:
+            rgb_frame: RGB frame the faces were found in
+            face_locations: (top, right, bottom, left) boxes
+
+        Returns:
+            tuple: (accepted boxes, list of (box, reason) for rejected boxes)
+        """
+        accepted, rejected = [], []
+        for face_location in face_locations:
+            reason = self.check(rgb_frame, face_location)
+            if reason is None:
+                accepted.append(face_location)
+            else:
+                rejected.append((face_location, reason))
+        return accepted, rejected
+
+
+class QualityStats:
+    """Running totals of faces checked and rejected, by reason"""
+
+    def __init__(self):
+        self.checked = 0
+        self.rejects = Counter()
+
+    def add(self, checked, reasons):
+        self.checked += checked
+        self.rejects.update(reasons)
+
+    @property
+    def rejected(self):
+        return sum(self.rejects.values())
+
+    def as_dict(self):
+        return {'checked': self.checked, 'rejected': self.rejected, 'reasons': dict(self.rejects)}
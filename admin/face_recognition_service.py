@@ -4,19 +4,321 @@ import numpy as np
 import face_recognition
 import pickle
 import uuid
+import hashlib
 import time
+import threading
 from PIL import Image
-import imagehash
 from datetime import datetime
+from admin.face_gallery import FaceGallery
+from admin.face_quality import FaceQualityScorer
+from admin.encoding_store import EncodingStore
+from admin.unknown_face_index import UnknownFaceIndex
+from admin.unknown_face_clusters import UnknownFaceClusters
+from config.utils_constants import ENCODING_DIR
+
+
+def parse_detection_scale(value, default=100.0):
+    """
+    Detection scale setting as a percentage
+    
+    Unreadable or non-positive values fall back to the default (full
+    resolution) and values above 100 are clamped, so a bad setting never
+    stops the live loop.
+    
+    Args:
+        value: Setting value, e.g. "50"
+        
+    Returns:
+        float: Percentage in (0, 100]
+    """
+    try:
+        percent = float(value)
+    except (TypeError, ValueError):
+        return default
+    if not 0 < percent < float('inf'):
+        return default
+    return min(percent, 100.0)
+
+
+def detection_scale_for(frame_shape, scale, min_size=240):
+    """
+    Effective detection scale for a frame
+    
+    The configured scale is raised when needed so the shorter side of the
+    resized frame never drops below min_size pixels, which would make HOG
+    miss faces at the back of the room.
+    
+    Args:
+        frame_shape: Shape of the full-resolution frame
+        scale (float): Configured detection scale (0-1]
+        min_size (int): Smallest allowed short side after resizing
+        
+    Returns:
+        float: Scale to resize by, 1.0 meaning no resizing
+    """
+    short_side = min(frame_shape[0], frame_shape[1])
+    if short_side <= 0:
+        return 1.0
+    scale = max(scale, min_size / short_side)
+    return min(scale, 1.0)
+
+
+def scale_face_locations(face_locations, scale, frame_shape):
+    """
+    Map face boxes found on a resized frame back to full resolution
+    
+    Args:
+        face_locations: (top, right, bottom, left) boxes on the resized frame
+        scale (float): Scale the frame was resized by
+        frame_shape: Shape of the full-resolution frame
+        
+    Returns:
+        list: Boxes in full-resolution coordinates, clamped to the frame
+    """
+    height, width = frame_shape[:2]
+    scaled = []
+    for top, right, bottom, left in face_locations:
+        scaled.append((
+            max(0, int(round(top / scale))),
+            min(width, int(round(right / scale))),
+            min(height, int(round(bottom / scale))),
+            max(0, int(round(left / scale)))
+        ))
+    return scaled
+
+
+def locate_faces(rgb_frame, options=None):
+    """
+    Run face detection on an RGB frame, optionally on a downscaled copy
+    
+    Args:
+        rgb_frame: RGB frame
+        options (dict): Detection options from FaceRecognitionService.detection_options
+        
+    Returns:
+        list: Face boxes in full-resolution coordinates
+    """
+    options = options or {}
+    model = options.get('model', "hog")
+    scale = detection_scale_for(rgb_frame.shape,
+                                options.get('detection_scale', 1.0),
+                                options.get('min_detection_size', 240))
+    if scale >= 1.0:
+        return face_recognition.face_locations(rgb_frame, model=model)
+    
+    small_frame = cv2.resize(rgb_frame, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    face_locations = face_recognition.face_locations(small_frame, model=model)
+    return scale_face_locations(face_locations, scale, rgb_frame.shape)
+
+
+def measure_detection_speedup(frame, options, repeats=2):
+    """
+    Time detection on a frame at full resolution and at the configured scale
+    
+    Args:
+        frame: BGR frame from the camera
+        options (dict): Detection options from FaceRecognitionService.detection_options
+        repeats (int): Number of timed runs per resolution
+        
+    Returns:
+        dict: 'scale' used, 'full_fps', 'scaled_fps' and 'speedup'
+    """
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    full_options = dict(options, detection_scale=1.0)
+    
+    def timed(run_options):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            locate_faces(rgb_frame, run_options)
+        return max(time.perf_counter() - start, 1e-6) / repeats
+    
+    full_time = timed(full_options)
+    scaled_time = timed(options)
+    return {
+        'scale': detection_scale_for(frame.shape,
+                                     options.get('detection_scale', 1.0),
+                                     options.get('min_detection_size', 240)),
+        'full_fps': 1.0 / full_time,
+        'scaled_fps': 1.0 / scaled_time,
+        'speedup': full_time / scaled_time
+    }
+
+
+def prepare_detection(frame, options=None):
+    """
+    Brightness check, RGB conversion and downscaling of a BGR camera frame
+    
+    Args:
+        frame: BGR frame from the camera
+        options (dict): Detection options from FaceRecognitionService.detection_options
+        
+    Returns:
+        tuple: (rgb_frame, detection frame, scale), or None if the frame is too dark;
+               the detection frame is rgb_frame itself when no downscaling applies
+    """
+    options = options or {}
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if gray.mean() < options.get('min_frame_brightness', 20):
+        return None
+    
+    # Convert to RGB for face_recognition library
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    scale = detection_scale_for(rgb_frame.shape,
+                                options.get('detection_scale', 1.0),
+                                options.get('min_detection_size', 240))
+    if scale >= 1.0:
+        return rgb_frame, rgb_frame, 1.0
+    small_frame = cv2.resize(rgb_frame, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return rgb_frame, small_frame, scale
+
+
+def locate_faces_scaled(detection_frame, scale, frame_shape, model="hog"):
+    """
+    Detect faces on a frame prepared by prepare_detection
+    
+    Kept at module level so the live pipeline can run it in worker
+    processes: only the (downscaled) detection frame is sent to the
+    worker and only face boxes come back.
+    
+    Returns:
+        list: Face boxes in full-resolution coordinates
+    """
+    face_locations = face_recognition.face_locations(detection_frame, model=model)
+    if scale >= 1.0:
+        return face_locations
+    return scale_face_locations(face_locations, scale, frame_shape)
+
+
+def face_crops(rgb_frame, face_locations, padding=0.5):
+    """
+    Padded crops around faces, for encoding in another process
+    
+    The padding covers everything the landmark and encoding models look at,
+    so encoding a crop gives the encoding of the face in the whole frame.
+    
+    Returns:
+        list: (crop, face box inside the crop) pairs
+    """
+    height, width = rgb_frame.shape[:2]
+    crops = []
+    for top, right, bottom, left in face_locations:
+        pad_y, pad_x = int((bottom - top) * padding), int((right - left) * padding)
+        y0, x0 = max(0, top - pad_y), max(0, left - pad_x)
+        y1, x1 = min(height, bottom + pad_y), min(width, right + pad_x)
+        crops.append((np.ascontiguousarray(rgb_frame[y0:y1, x0:x1]),
+                      (top - y0, right - x0, bottom - y0, left - x0)))
+    return crops
+
+
+def encode_face_crops(crops):
+    """
+    Encode faces from face_crops (runs in a worker process)
+    
+    Returns:
+        list: One 128-d encoding per crop
+    """
+    return [face_recognition.face_encodings(crop, [box])[0] for crop, box in crops]
+
+
+def detect_faces(frame, options=None):
+    """
+    Detect faces in a BGR camera frame without encoding them
+    
+    Args:
+        frame: BGR frame from the camera
+        options (dict): Detection options from FaceRecognitionService.detection_options
+        
+    Returns:
+        dict: 'low_light' flag, 'face_locations' and the 'rgb_frame' used
+    """
+    options = options or {}
+    analysis = {
+        'low_light': False,
+        'face_locations': [],
+        'rgb_frame': None
+    }
+    
+    prepared = prepare_detection(frame, options)
+    if prepared is None:
+        analysis['low_light'] = True
+        return analysis
+    
+    analysis['rgb_frame'], detection_frame, scale = prepared
+    analysis['face_locations'] = locate_faces_scaled(detection_frame, scale, analysis['rgb_frame'].shape,
+                                                     options.get('model', "hog"))
+    return analysis
+
+
+def detect_and_encode(frame, options=None):
+    """
+    Detect and encode every face in a BGR camera frame
+    
+    Detection may run on a downscaled copy of the frame (see
+    detection_scale), but encodings are always computed on the
+    full-resolution frame so match quality is unaffected.
+    
+    Kept at module level (and free of service state) so the live attendance
+    pipeline can run it in worker processes.
+    
+    When the options carry a FaceQualityScorer, faces that fail its checks
+    are reported in 'rejected_faces' instead of being encoded.
+    
+    Args:
+        frame: BGR frame from the camera
+        options (dict): Detection options from FaceRecognitionService.detection_options
+        
+    Returns:
+        dict: 'low_light' flag, 'face_locations' and matching 'face_encodings',
+              plus 'rejected_faces' as (face_location, reason) pairs
+    """
+    options = options or {}
+    detection = detect_faces(frame, options)
+    analysis = {
+        'low_light': detection['low_light'],
+        'face_locations': detection['face_locations'],
+        'face_encodings': [],
+        'rejected_faces': []
+    }
+    
+    scorer = options.get('quality')
+    if scorer is not None and detection['face_locations']:
+        analysis['face_locations'], analysis['rejected_faces'] = scorer.filter(
+            detection['rgb_frame'], detection['face_locations']
+        )
+    
+    if analysis['face_locations']:
+        analysis['face_encodings'] = face_recognition.face_encodings(
+            detection['rgb_frame'], analysis['face_locations']
+        )
+    
+    return analysis
+
 
 class FaceRecognitionService:
+    # Process-wide instance for windows that only need to query the gallery
+    _shared_instance = None
+    _shared_lock = threading.Lock()
+    
     def __init__(self, settings, db_service):
         self.settings = settings
         self.db_service = db_service
         self.known_faces = []
         self.student_ids = []
+        self.original_ids = []
+        self.gallery = FaceGallery()
+        self.gallery_generation = 0
+        self.last_refresh_changes = []
         self.last_unknown_save_time = 0
         
+        # Change tracking for incremental refreshes
+        self._refresh_lock = threading.Lock()
+        self._store_state = None
+        self._store_offset = 0
+        self._store_students = set()
+        self._legacy_mtimes = {}
+        # Where each loaded student's encodings came from: store (start, count) or legacy file mtime
+        self._student_sources = {}
+        
         # Constants
         self.UNKNOWN_DIR = "unknown_faces"
         self.MIN_FACE_SIZE = 50
@@ -29,63 +331,362 @@ class FaceRecognitionService:
         # Create directory for unknown faces if it doesn't exist
         if not os.path.exists(self.UNKNOWN_DIR):
             os.makedirs(self.UNKNOWN_DIR)
+        self.unknown_index = UnknownFaceIndex(self.UNKNOWN_DIR)
+        self.unknown_clusters = UnknownFaceClusters(self.UNKNOWN_DIR, index=self.unknown_index)
         
         # Load face encodings on initialization
         self.load_known_faces()
     
+    @classmethod
+    def shared(cls, db_service=None):
+        """
+        Shared service whose gallery is loaded once per process
+        
+        Registration and the unknown face review use this instead of reading
+        every student's encodings on each check. The gallery is refreshed
+        incrementally on every call, which is cheap when nothing changed.
+        
+        Args:
+            db_service (DatabaseService): Used when the instance is first created
+            
+        Returns:
+            FaceRecognitionService: The shared instance
+        """
+        with cls._shared_lock:
+            if cls._shared_instance is None:
+                if db_service is None:
+                    from admin.db_service import DatabaseService
+                    db_service = DatabaseService()
+                cls._shared_instance = cls(db_service.load_settings(), db_service)
+                return cls._shared_instance
+        
+        cls._shared_instance.refresh_known_faces()
+        return cls._shared_instance
+    
     def load_known_faces(self):
-        """Load all known face encodings from storage"""
-        self.known_faces = []
-        self.student_ids = []
-        self.original_ids = []  # For keeping track of the original ID format
+        """
+        Load all known face encodings into the face gallery
+        
+        Encodings come from the binary encoding store (one mmap); students that
+        only have a legacy per-student pickle file are loaded from it as well.
+        A pickle file left next to a stored student is merged in when it holds
+        encodings the store does not have.
+        """
+        with self._refresh_lock:
+            return self._load_all_faces()
+    
+    def _load_all_faces(self):
+        """Full reload; callers hold _refresh_lock"""
+        gallery = FaceGallery()
+        self._store_state = None
+        self._store_offset = 0
+        self._store_students = set()
+        self._legacy_mtimes = {}
+        self._student_sources = {}
 
         # Ensure encoding directory exists
-        encoding_dir = "student_encodings"
+        encoding_dir = ENCODING_DIR
         if not os.path.exists(encoding_dir):
             print("❌ Student encodings directory not found.")
-            return [], []
+            self._set_gallery(gallery)
+            return self.known_faces, self.student_ids
 
         try:
-            # Find all encoding files
-            encoding_files = [f for f in os.listdir(encoding_dir) if f.endswith('_encodings.pkl')]
+            store = EncodingStore(encoding_dir)
+            entries, matrix = {}, None
+            if store.exists():
+                # Remember where the index ended so refreshes only read new entries
+                self._store_state = store.index_state()
+                self._store_offset = self._store_state[1]
+                gallery = store.load_gallery()
+                self._store_students = set(gallery.student_ids)
+                entries = store.read_index()
+                matrix = store.open_matrix()
+                self._student_sources = {sid: entries[sid] for sid in gallery.student_ids if sid in entries}
+                print(f"✅ Loaded {len(gallery)} encodings for "
+                      f"{gallery.student_count} students from the encoding store")
             
-            for encoding_file in encoding_files:
+            # Legacy encoding files: students not yet in the store, or leftovers to merge
+            legacy_files = 0
+            for encoding_file, mtime in self._scan_legacy_files(encoding_dir).items():
                 try:
-                    file_path = os.path.join(encoding_dir, encoding_file)
-                    
-                    # Extract student ID from filename - with more flexible handling
-                    student_id = encoding_file.replace('student_', '').replace('_encodings.pkl', '')
+                    self._legacy_mtimes[encoding_file] = mtime
                     
-                    # Store both formats of the ID for more flexible matching
-                    # Original format with underscores
-                    original_id = student_id
-                    # Format with slashes
-                    slash_id = student_id.replace('_', '/')
+                    # Format with slashes (database format)
+                    slash_id = self._legacy_student_id(encoding_file)
+                    if slash_id in gallery:
+                        start, count = entries[slash_id]
+                        merged = self._merge_legacy(slash_id, matrix[start:start + count],
+                                                    encoding_dir, encoding_file)
+                        if merged is not None:
+                            gallery.replace(slash_id, merged)
+                            self._student_sources[slash_id] = (entries[slash_id], ('legacy', mtime))
+                        continue
                     
-                    # Load encodings from pickle file
-                    with open(file_path, 'rb') as f:
-                        encodings = pickle.load(f)
+                    # Add all encodings to the gallery under the database format ID (with slashes)
+                    added = gallery.add(slash_id, self._read_legacy_file(encoding_dir, encoding_file))
+                    self._student_sources[slash_id] = ('legacy', mtime)
+                    legacy_files += 1
                     
-                    # Add each encoding with the database format ID (with slashes)
-                    for encoding in encodings:
-                        self.known_faces.append(encoding)
-                        self.student_ids.append(slash_id)  # Use database format
-                        self.original_ids.append(original_id)  # Keep original for file operations
-                    
-                    print(f"✅ Loaded {len(encodings)} encodings for student {slash_id} (file: {original_id})")
+                    print(f"✅ Loaded {added} encodings for student {slash_id} (file: {encoding_file})")
                 
                 except Exception as e:
                     print(f"❌ Error loading encoding file {encoding_file}: {e}")
+            
+            if legacy_files:
+                print(f"⚠️ {legacy_files} students still use pickle encoding files; "
+                      "run the encoding migration to move them into the store")
 
-            print(f"✅ Total loaded faces: {len(self.known_faces)}")
+            self._set_gallery(gallery)
+            print(f"✅ Total loaded faces: {len(self.gallery)}")
             return self.known_faces, self.student_ids
 
         except Exception as e:
             print(f"❌ Error in loading known faces: {e}")
-            return [], []        
-    def refresh_known_faces(self):
-        """Reload all face encodings"""
-        return self.load_known_faces()
+            self._set_gallery(gallery)
+            return self.known_faces, self.student_ids
+
+    def _set_gallery(self, gallery):
+        """Swap in a new gallery and the parallel lists derived from it"""
+        self.gallery = gallery
+        self.gallery_generation += 1
+        
+        # Expose the gallery matrix and row IDs for callers that expect parallel lists
+        self.known_faces = gallery.encodings
+        self.student_ids = gallery.row_student_ids
+        # Original ID format (underscores) kept for file operations
+        self.original_ids = [student_id.replace('/', '_') for student_id in self.student_ids]
+
+    @staticmethod
+    def _scan_legacy_files(encoding_dir):
+        """Modification time of every legacy student_<id>_encodings.pkl file"""
+        mtimes = {}
+        for entry in os.scandir(encoding_dir):
+            if entry.name.endswith('_encodings.pkl'):
+                mtimes[entry.name] = entry.stat().st_mtime
+        return mtimes
+
+    @staticmethod
+    def _legacy_student_id(encoding_file):
+        """Database format student ID from a legacy encoding filename"""
+        student_id = encoding_file.replace('student_', '').replace('_encodings.pkl', '')
+        return student_id.replace('_', '/')
+
+    @staticmethod
+    def _read_legacy_file(encoding_dir, encoding_file):
+        with open(os.path.join(encoding_dir, encoding_file), 'rb') as f:
+            return pickle.load(f)
+
+    def _merge_legacy(self, student_id, stored, encoding_dir, encoding_file):
+        """
+        Combine a stored student's encodings with a leftover legacy file
+        
+        Files that were copied into the store unchanged add nothing. Anything
+        else was written outside the store (e.g. a migration run without the
+        store) and is kept next to the stored encodings instead of being lost.
+        
+        Args:
+            student_id (str): Student ID in database format
+            stored: The student's encodings from the store
+            encoding_dir (str): Directory holding the legacy file
+            encoding_file (str): Legacy student_<id>_encodings.pkl filename
+            
+        Returns:
+            np.ndarray: Merged encodings, or None if the file adds nothing
+        """
+        stored = np.asarray(stored, dtype=np.float32).reshape(-1, FaceGallery.ENCODING_SIZE)
+        try:
+            legacy = self._read_legacy_file(encoding_dir, encoding_file)
+            legacy = np.asarray(legacy, dtype=np.float32).reshape(-1, FaceGallery.ENCODING_SIZE)
+        except Exception as e:
+            print(f"❌ Error loading encoding file {encoding_file}: {e}")
+            return None
+        
+        known_rows = {row.tobytes() for row in stored}
+        extra = [row for row in legacy if row.tobytes() not in known_rows]
+        if not extra:
+            return None
+        
+        print(f"⚠️ {encoding_file} has {len(extra)} encodings for {student_id} that are not "
+              "in the encoding store; using both")
+        return np.vstack([stored, np.array(extra)])
+
+    def encoding_signature(self, student_ids=None):
+        """
+        Fingerprint of the encoding sources the current gallery was loaded from
+        
+        Stable across restarts as long as no encodings change, so it can key
+        caches that are persisted to disk.
+        
+        Args:
+            student_ids: Only fingerprint these students' encodings, so that
+                         registering someone else leaves the result unchanged;
+                         None covers the whole gallery
+        """
+        sources = self._student_sources
+        if student_ids is not None:
+            sources = {sid: sources.get(sid) for sid in student_ids}
+        source = repr(sorted(sources.items(), key=lambda item: item[0]))
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+    def refresh_known_faces(self, full=False):
+        """
+        Bring the gallery up to date with newly registered or changed students
+        
+        Only students whose encodings changed since the last load are added,
+        replaced or removed. Changes are applied to a copy of the gallery that
+        is then swapped in, so this is safe to call during a running session.
+        
+        Args:
+            full (bool): Force a complete reload
+            
+        Returns:
+            tuple: (known_faces, student_ids) of the refreshed gallery
+        """
+        with self._refresh_lock:
+            self.last_refresh_changes = []
+            if full:
+                return self._load_all_faces()
+            
+            try:
+                changes = self._collect_changes()
+            except Exception as e:
+                print(f"⚠️ Incremental refresh failed ({e}), reloading all encodings")
+                return self._load_all_faces()
+            
+            if changes is None:
+                # The store was compacted or replaced; offsets are no longer valid
+                return self._load_all_faces()
+            if not changes:
+                return self.known_faces, self.student_ids
+            
+            gallery = self.gallery.copy()
+            for student_id, encodings in changes.items():
+                # Re-registered or removed students may have new details
+                self.db_service.invalidate_student_cache(student_id)
+                if encodings is None:
+                    gallery.remove(student_id)
+                else:
+                    gallery.replace(student_id, encodings)
+            self._set_gallery(gallery)
+            
+            self.last_refresh_changes = sorted(changes)
+            print(f"✅ Refreshed encodings for {len(changes)} students "
+                  f"({len(self.gallery)} faces loaded)")
+            return self.known_faces, self.student_ids
+
+    def _collect_changes(self):
+        """
+        Encodings that changed since the last load or refresh
+        
+        Returns:
+            dict: student_id -> new encodings, or None for removed students;
+                  None instead of a dict when a full reload is required
+        """
+        encoding_dir = ENCODING_DIR
+        if not os.path.exists(encoding_dir):
+            return {}
+        
+        changes = {}
+        store = EncodingStore(encoding_dir)
+        current = self._scan_legacy_files(encoding_dir)
+        legacy_files = {self._legacy_student_id(encoding_file): encoding_file for encoding_file in current}
+        state = store.index_state()
+        if state is not None:
+            known_store = self._store_state
+            if known_store is not None and (state[0] != known_store[0] or state[1] < self._store_offset):
+                return None
+            
+            if known_store is None or state[1] > self._store_offset:
+                entries, self._store_offset = store.read_changes(self._store_offset)
+                self._store_state = (state[0], self._store_offset)
+                matrix = store.open_matrix() if entries else None
+                for student_id, (start, count) in entries.items():
+                    encoding_file = legacy_files.get(student_id)
+                    if count == 0 or start + count > len(matrix):
+                        self._store_students.discard(student_id)
+                        if encoding_file is not None:
+                            # Falls back to the legacy file, as a full reload would
+                            self._legacy_mtimes.pop(encoding_file, None)
+                            continue
+                        changes[student_id] = None
+                        self._student_sources.pop(student_id, None)
+                    else:
+                        changes[student_id] = np.array(matrix[start:start + count])
+                        self._store_students.add(student_id)
+                        self._student_sources[student_id] = (start, count)
+                        if encoding_file is not None:
+                            merged = self._merge_legacy(student_id, changes[student_id],
+                                                        encoding_dir, encoding_file)
+                            if merged is not None:
+                                changes[student_id] = merged
+                                self._student_sources[student_id] = ((start, count), ('legacy', current[encoding_file]))
+                            self._legacy_mtimes[encoding_file] = current[encoding_file]
+        
+        # Legacy pickle files: compare modification times
+        for encoding_file, mtime in current.items():
+            if self._legacy_mtimes.get(encoding_file) == mtime:
+                continue
+            self._legacy_mtimes[encoding_file] = mtime
+            student_id = self._legacy_student_id(encoding_file)
+            if student_id in self._store_students:
+                # A leftover file changed next to a stored student: merge it again
+                entry = store.read_index().get(student_id)
+                stored = store.get(student_id)
+                merged = self._merge_legacy(student_id, stored, encoding_dir, encoding_file)
+                changes[student_id] = stored if merged is None else merged
+                self._student_sources[student_id] = entry if merged is None else (entry, ('legacy', mtime))
+                continue
+            try:
+                changes[student_id] = self._read_legacy_file(encoding_dir, encoding_file)
+                self._student_sources[student_id] = ('legacy', mtime)
+            except Exception as e:
+                print(f"❌ Error loading encoding file {encoding_file}: {e}")
+        
+        for encoding_file in set(self._legacy_mtimes) - set(current):
+            del self._legacy_mtimes[encoding_file]
+            student_id = self._legacy_student_id(encoding_file)
+            if student_id in changes:
+                continue
+            if student_id in self._store_students:
+                # Drop whatever had been merged in from the file
+                changes[student_id] = store.get(student_id)
+                self._student_sources[student_id] = store.read_index().get(student_id)
+            else:
+                changes[student_id] = None
+                self._student_sources.pop(student_id, None)
+        
+        return changes
+    
+    def quality_scorer(self):
+        """
+        Per-face quality gate for live frames
+        
+        Returns:
+            FaceQualityScorer: Scorer built from the settings, or None if the gate is off
+        """
+        # Opt-in: the thresholds are generic and may need tuning for a camera
+        if self.settings.get("quality_gate", "0") != "1":
+            return None
+        return FaceQualityScorer(
+            min_face_size=self.MIN_FACE_SIZE,
+            min_sharpness=float(self.settings.get("min_face_sharpness", "50")),
+            brightness_min=self.BRIGHTNESS_MIN,
+            brightness_max=self.BRIGHTNESS_MAX,
+            contrast_min=self.CONTRAST_THRESHOLD,
+            max_asymmetry=float(self.settings.get("max_face_asymmetry", "70")) / 100
+        )
+    
+    def detection_options(self):
+        """Options passed to detect_and_encode for live frames"""
+        return {
+            'model': "hog",
+            'min_frame_brightness': 20,
+            # Full resolution unless the installation opts in to downscaled detection
+            'detection_scale': parse_detection_scale(self.settings.get("detection_scale", "100")) / 100,
+            'min_detection_size': 240,
+            'quality': self.quality_scorer()
+        }
     
     def process_frame(self, frame):
         """Process a video frame to detect and recognize faces"""
@@ -96,68 +697,55 @@ class FaceRecognitionService:
             'unknown_faces': []
         }
         
-        # Check if frame brightness is too low
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        avg_brightness = gray.mean()
+        analysis = detect_and_encode(frame, self.detection_options())
         
-        if avg_brightness < 20:
+        if analysis['low_light']:
             cv2.putText(result['processed_frame'], "Low light detected", (10, 30), 
                         cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
             return result
         
-        # Convert to RGB for face_recognition library
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        face_locations = face_recognition.face_locations(rgb_frame, model="hog")
-        
+        # Faces that failed the quality gate are shown but not recognized
+        for (top, right, bottom, left), reason in analysis['rejected_faces']:
+            cv2.rectangle(result['processed_frame'], (left, top), (right, bottom), (0, 165, 255), 1)
+            cv2.putText(result['processed_frame'], FaceQualityScorer.REASON_LABELS[reason], (left, top - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 165, 255), 1)
+
+        face_locations = analysis['face_locations']
         if not face_locations:
-            cv2.putText(result['processed_frame'], "No face detected", (10, 30), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+            if not analysis['rejected_faces']:
+                cv2.putText(result['processed_frame'], "No face detected", (10, 30),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
             return result
         
-        # Get face encodings for all detected faces
-        face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+        face_encodings = analysis['face_encodings']
+        
+        # Match every detected face against the gallery in one batch
+        tolerance = float(self.settings.get("face_recognition_sensitivity", "50")) / 100
+        matches = self.gallery.best_matches(face_encodings, tolerance)
         
         # Process each detected face
-        for face_encoding, face_location in zip(face_encodings, face_locations):
-            # Get recognition sensitivity from settings
-            tolerance = float(self.settings.get("face_recognition_sensitivity", "50")) / 100
+        for face_encoding, face_location, (student_id, distance) in zip(face_encodings, face_locations, matches):
+            student_info = {
+                'student_id': "Unknown",
+                'name': "Unknown",
+                'confidence': 0.0,
+                'face_location': face_location
+            }
             
-            # Compare with known faces
-            if len(self.known_faces) > 0:
-                matches = face_recognition.compare_faces(self.known_faces, face_encoding, tolerance=tolerance)
-                face_distances = face_recognition.face_distance(self.known_faces, face_encoding)
+            if student_id is not None:
+                student_info['student_id'] = student_id
+                student_info['name'] = self.db_service.get_student_name(student_id)
+                student_info['confidence'] = 1.0 - distance
                 
-                student_info = {
-                    'student_id': "Unknown",
-                    'name': "Unknown",
-                    'confidence': 0.0,
-                    'face_location': face_location
+                # Add to recognized students
+                result['recognized_students'].append(student_info)
+            elif len(self.gallery) > 0:
+                # Unknown face
+                unknown_info = {
+                    'face_location': face_location,
+                    'encoding': face_encoding
                 }
-                
-                # Check if any matches found
-                if np.any(matches):
-                    best_match_index = int(np.argmin(face_distances))
-                    
-                    # Verify the index is valid
-                    if best_match_index < len(matches) and best_match_index < len(self.student_ids):
-                        if matches[best_match_index]:
-                            student_id = self.student_ids[best_match_index]
-                            student_info['student_id'] = student_id
-                            student_info['name'] = self.db_service.get_student_name(student_id)
-                            
-                            # Calculate confidence
-                            confidence = 1.0 - face_distances[best_match_index]
-                            student_info['confidence'] = confidence
-                            
-                            # Add to recognized students
-                            result['recognized_students'].append(student_info)
-                else:
-                    # Unknown face
-                    unknown_info = {
-                        'face_location': face_location,
-                        'encoding': face_encoding
-                    }
-                    result['unknown_faces'].append(unknown_info)
+                result['unknown_faces'].append(unknown_info)
             
             # Draw rectangle and label on frame
             top, right, bottom, left = face_location
@@ -177,45 +765,86 @@ class FaceRecognitionService:
         
         return result
     
-    def recognize_face(self, face_encoding, known_faces, student_ids, tolerance=0.6):
+    def recognize_face(self, face_encoding, known_faces, student_ids=None, tolerance=0.6):
         """
         Recognize a face by comparing it to known faces
         
         Args:
             face_encoding: The encoding of the face to recognize
-            known_faces: List of known face encodings
-            student_ids: List of corresponding student IDs
+            known_faces: FaceGallery, or list of known face encodings
+            student_ids: List of corresponding student IDs (only with a list of encodings)
             tolerance: Recognition sensitivity (lower is stricter)
             
         Returns:
             tuple: (student_id, name, is_known)
         """
-        # Default values for unknown face
-        student_id = "Unknown"
-        name = "Unknown"
-        is_known = False
-        
-        # Check if we have any known faces to compare against
-        if len(known_faces) > 0:
-            # Compare face with known faces
-            matches = face_recognition.compare_faces(known_faces, face_encoding, tolerance=tolerance)
-            face_distances = face_recognition.face_distance(known_faces, face_encoding)
-            
-            # Check if any matches found
-            if np.any(matches):
-                best_match_index = int(np.argmin(face_distances))
-                
-                # Verify the index is valid
-                if best_match_index < len(matches) and best_match_index < len(student_ids):
-                    if matches[best_match_index]:
-                        student_id = student_ids[best_match_index]
-                        name = self.db_service.get_student_name(student_id)
-                        is_known = True
+        if not isinstance(known_faces, FaceGallery):
+            known_faces = FaceGallery.from_encodings(known_faces, student_ids or [])
         
+        student_id, name, is_known = self.recognize_faces([face_encoding], known_faces, tolerance)[0][:3]
         return student_id, name, is_known
     
-    def save_unknown_face(self, frame, face_location):
-        """Save detected unknown faces with robust duplicate detection"""
+    def recognize_faces(self, face_encodings, gallery, tolerance=0.6, reduction=None):
+        """
+        Recognize a batch of faces against a gallery with one distance computation
+        
+        Distances are reduced per student (min, mean or trimmed mean over that
+        student's augmented encodings) and students are ranked by the result.
+        
+        Args:
+            face_encodings: Encodings of the faces detected in a frame
+            gallery (FaceGallery): Known faces to compare against
+            tolerance: Recognition sensitivity (lower is stricter)
+            reduction (str): Per-student reduction, defaults to the "match_reduction" setting
+            
+        Returns:
+            list: (student_id, name, is_known, score, margin) for each face, where
+                  margin is the score gap between the best and second-best student
+                  (infinite when only one student is a candidate)
+        """
+        results = []
+        if len(face_encodings) == 0:
+            return results
+        
+        if reduction is None:
+            reduction = self.settings.get("match_reduction", "min")
+        if reduction not in FaceGallery.REDUCTIONS:
+            reduction = "min"
+        
+        for ranking in gallery.rank_students(face_encodings, reduction=reduction, top_n=2):
+            if not ranking['student_ids'] or ranking['scores'][0] > tolerance:
+                score = ranking['scores'][0] if ranking['scores'] else 1.0
+                results.append(("Unknown", "Unknown", False, score, 0.0))
+                continue
+            
+            # With a single candidate there is no runner-up to be confused with
+            margin = ranking['margin'] if len(ranking['student_ids']) > 1 else float('inf')
+            student_id = ranking['student_ids'][0]
+            results.append((
+                student_id,
+                self.db_service.get_student_name(student_id),
+                True,
+                ranking['scores'][0],
+                margin
+            ))
+        
+        return results
+    
+    def save_unknown_face(self, frame, face_location, face_encoding=None):
+        """
+        Save detected unknown faces with robust duplicate detection
+        
+        Duplicates are found through the unknown face index (stored hashes and
+        encodings), so no saved image is re-read or re-encoded.
+        
+        Args:
+            frame: BGR frame the face was found in
+            face_location: (top, right, bottom, left) of the face
+            face_encoding: Encoding of the face, if already computed
+            
+        Returns:
+            str: Path of the saved image, or None if it was not saved
+        """
         try:
             # Extract and pad face region
             top, right, bottom, left = face_location
@@ -229,102 +858,53 @@ class FaceRecognitionService:
                 print("⚠️ Face too small, skipping save.")
                 return None
 
-            # Convert image and generate hash values
-            pil_image = Image.fromarray(cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB))
-            standardized_image = pil_image.convert("L").resize((128, 128))
-            
-            # Generate multiple hash types for robust comparison
-            phash_value = imagehash.phash(standardized_image)
-            dhash_value = imagehash.dhash(standardized_image)
-            avg_hash_value = imagehash.average_hash(standardized_image)
-            
-            # Get face encoding
-            rgb_face = cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB)
-            face_encodings = face_recognition.face_encodings(rgb_face)
-            if not face_encodings:
-                print("⚠️ Could not generate face encoding, skipping save.")
-                return None
-            face_encoding = face_encodings[0]
-
-            # Store current timestamp for cooldown check
+            # Check cooldown period for saving unknown faces before doing any work
             current_time = time.time()
-            
-            # Check for duplicates
-            is_duplicate = False
-            closest_match = float('inf')
-            closest_file = None
-            
-            for file in os.listdir(self.UNKNOWN_DIR):
-                file_path = os.path.join(self.UNKNOWN_DIR, file)
-                
-                # Skip non-image files
-                if not file.lower().endswith(('.png', '.jpg', '.jpeg')):
-                    continue
-                    
-                try:
-                    # Multi-hash comparison
-                    existing_img = Image.open(file_path).convert("L").resize((128, 128))
-                    existing_phash = imagehash.phash(existing_img)
-                    existing_dhash = imagehash.dhash(existing_img)
-                    existing_avg_hash = imagehash.average_hash(existing_img)
-                    
-                    # Calculate combined hash difference
-                    phash_diff = abs(phash_value - existing_phash)
-                    dhash_diff = abs(dhash_value - existing_dhash)
-                    avg_hash_diff = abs(avg_hash_value - existing_avg_hash)
-                    
-                    combined_diff = (phash_diff * 0.5) + (dhash_diff * 0.3) + (avg_hash_diff * 0.2)
-                    
-                    if combined_diff < closest_match:
-                        closest_match = combined_diff
-                        closest_file = file
-                    
-                    if combined_diff < self.HASH_SIMILARITY_THRESHOLD:
-                        print(f"⚠️ Duplicate detected via hash (similarity: {combined_diff})")
-                        is_duplicate = True
-                        break
-                    
-                    # For borderline cases, verify with face recognition
-                    if self.HASH_SIMILARITY_THRESHOLD <= combined_diff <= self.HASH_SIMILARITY_THRESHOLD * 2:
-                        try:
-                            existing_face_img = cv2.imread(file_path)
-                            existing_rgb = cv2.cvtColor(existing_face_img, cv2.COLOR_BGR2RGB)
-                            existing_encodings = face_recognition.face_encodings(existing_rgb)
-                            
-                            if existing_encodings:
-                                # Compare face encodings
-                                face_distance = face_recognition.face_distance([existing_encodings[0]], face_encoding)[0]
-                                
-                                if face_distance < self.FACE_SIMILARITY_THRESHOLD:
-                                    print(f"⚠️ Duplicate detected via face recognition (distance: {face_distance})")
-                                    is_duplicate = True
-                                    break
-                        except Exception as e:
-                            print(f"Error comparing face encodings: {e}")
-                    
-                except Exception as e:
-                    print(f"Error processing existing image {file}: {e}")
-                    continue
-
-            # Check cooldown period for saving unknown faces
             cooldown_period = float(self.settings.get("unknown_face_cooldown", "5"))  # 5 seconds default
             
             if current_time - self.last_unknown_save_time < cooldown_period:
                 print(f"⚠️ Cooldown period active, skipping save. ({current_time - self.last_unknown_save_time:.1f}s < {cooldown_period}s)")
                 return None
 
-            # Save file if no duplicates found
-            if not is_duplicate:
-                file_path = os.path.join(self.UNKNOWN_DIR, f"unknown_{uuid.uuid4().hex[:8]}.jpg")
-                pil_image.save(file_path)
-                self.last_unknown_save_time = current_time
-                
-                print(f"✅ New unknown face saved: {file_path}")
-                return file_path
-            else:
-                print("⚠️ Duplicate face not saved.")
+            # Convert image and generate hash values
+            pil_image = Image.fromarray(cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB))
+            hashes = UnknownFaceIndex.compute_hashes(pil_image)
+            
+            # Get face encoding
+            if face_encoding is None:
+                face_encodings = face_recognition.face_encodings(np.array(pil_image))
+                if not face_encodings:
+                    print("⚠️ Could not generate face encoding, skipping save.")
+                    return None
+                face_encoding = face_encodings[0]
+
+            duplicate = self.unknown_index.find_duplicate(
+                hashes, face_encoding,
+                hash_threshold=self.HASH_SIMILARITY_THRESHOLD,
+                face_threshold=self.FACE_SIMILARITY_THRESHOLD
+            )
+            if duplicate is not None:
+                filename, reason, value = duplicate
+                print(f"⚠️ Duplicate of {filename} detected via {reason} ({value:.2f}), not saved.")
+                return None
+
+            # A visitor who already has enough crops on disk doesn't need more
+            max_crops = int(self.settings.get("unknown_cluster_max_crops", "5"))
+            cluster = self.unknown_clusters.matching_cluster(face_encoding)
+            if cluster is not None and cluster['size'] >= max_crops:
+                print(f"⚠️ Already {cluster['size']} images of this unknown person, not saved.")
                 return None
 
+            filename = f"unknown_{uuid.uuid4().hex[:8]}.jpg"
+            file_path = os.path.join(self.UNKNOWN_DIR, filename)
+            pil_image.save(file_path)
+            self.unknown_index.add(filename, hashes, face_encoding)
+            self.unknown_clusters.add(filename, face_encoding, hashes[0])
+            self.last_unknown_save_time = current_time
+            
+            print(f"✅ New unknown face saved: {file_path}")
+            return file_path
+
         except Exception as e:
             print(f"❌ Error saving unknown face: {e}")
             return None
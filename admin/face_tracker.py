@@ -0,0 +1,249 @@
+import cv2
+
+
+def box_iou(box_a, box_b):
+    """
+    Intersection over union of two (top, right, bottom, left) face boxes
+
+    Returns:
+        float: Overlap between 0 (disjoint) and 1 (identical)
+    """
+    top = max(box_a[0], box_b[0])
+    right = min(box_a[1], box_b[1])
+    bottom = min(box_a[2], box_b[2])
+    left = max(box_a[3], box_b[3])
+
+    intersection = max(0, right - left) * max(0, bottom - top)
+    if intersection == 0:
+        return 0.0
+
+    area_a = (box_a[1] - box_a[3]) * (box_a[2] - box_a[0])
+    area_b = (box_b[1] - box_b[3]) * (box_b[2] - box_b[0])
+    return intersection / float(area_a + area_b - intersection)
+
+
+def create_cv_tracker(tracker_type):
+    """
+    Create an OpenCV single-object tracker
+
+    Depending on the OpenCV build the trackers live either in cv2 or in
+    cv2.legacy, so both are tried.
+
+    Args:
+        tracker_type (str): "MOSSE", "KCF", "CSRT" or "IOU" for box-only tracking
+
+    Returns:
+        OpenCV tracker, or None if unavailable (tracks then keep their last box)
+    """
+    if tracker_type == "IOU":
+        return None
+
+    factory_name = f"Tracker{tracker_type}_create"
+    for module in (getattr(cv2, 'legacy', None), cv2):
+        factory = getattr(module, factory_name, None) if module is not None else None
+        if factory is not None:
+            try:
+                return factory()
+            except cv2.error as e:
+                print(f"⚠️ Could not create {tracker_type} tracker: {e}")
+                return None
+    return None
+
+
+class FaceTrack:
+    """A face followed across frames together with its identity votes"""
+
+    def __init__(self, track_id, box, frame, tracker_type):
+        self.track_id = track_id
+        self.box = box
+        self.lost = False
+        self.misses = 0
+
+        # Identity, filled in once the track's face has been encoded
+        self.student_id = None
+        self.name = None
+        self.is_known = False
+        self.score = 1.0
+        self.margin = 0.0
+        self.votes = {}
+        self.confirmed = False
+
+        self.tracker = None
+        self._init_tracker(frame, tracker_type)
+
+    def _init_tracker(self, frame, tracker_type):
+        """(Re)start the OpenCV tracker on the current box"""
+        self.tracker = create_cv_tracker(tracker_type)
+        if self.tracker is None:
+            return
+
+        top, right, bottom, left = self.box
+        try:
+            self.tracker.init(frame, (left, top, right - left, bottom - top))
+        except cv2.error as e:
+            print(f"⚠️ Tracker init failed for track {self.track_id}: {e}")
+            self.tracker = None
+
+    def update(self, frame):
+        """Move the box with the OpenCV tracker; returns False if the face was lost"""
+        if self.tracker is None:
+            return True
+
+        ok, (x, y, w, h) = self.tracker.update(frame)
+        if not ok:
+            self.lost = True
+            return False
+
+        height, width = frame.shape[:2]
+        self.box = (
+            max(0, int(y)),
+            min(width, int(x + w)),
+            min(height, int(y + h)),
+            max(0, int(x))
+        )
+        return True
+
+    def needs_encoding(self):
+        """Only faces without a confirmed identity are worth re-encoding"""
+        return not self.confirmed
+
+    def record_match(self, student_id, name, is_known, score, margin, required_votes):
+        """
+        Add one recognition vote to this track
+
+        Args:
+            student_id (str): Matched student, or "Unknown"
+            name (str): Student name
+            is_known (bool): Whether the face matched a class member
+            score (float): Match score (lower is better)
+            margin (float): Gap to the runner-up student
+            required_votes (int): Votes needed before the identity is confirmed
+        """
+        self.votes[student_id] = self.votes.get(student_id, 0) + 1
+
+        # The identity shown is the one with the most votes so far
+        leader = max(self.votes, key=self.votes.get)
+        if leader == student_id:
+            self.student_id = student_id
+            self.name = name
+            self.is_known = is_known
+            self.score = score
+            self.margin = margin
+
+        self.confirmed = self.is_known and self.votes[self.student_id] >= required_votes
+
+
+class FaceTracker:
+    """
+    Carries face identities between full detections.
+
+    Detection and encoding only run every `detect_interval` frames, or
+    sooner when a tracker loses its face. In between, OpenCV trackers move
+    each face box, and detections are associated with existing tracks by
+    IoU so identities and votes carry over from one detection to the next.
+    """
+
+    def __init__(self, detect_interval=10, tracker_type="KCF", iou_threshold=0.3,
+                 max_misses=2, required_votes=3):
+        """
+        Initialize the tracker
+
+        Args:
+            detect_interval (int): Frames between full detections
+            tracker_type (str): OpenCV tracker used between detections
+            iou_threshold (float): Minimum overlap to associate a detection with a track
+            max_misses (int): Detections a track may go unmatched before it is dropped
+            required_votes (int): Matching encodings needed to confirm an identity
+        """
+        self.detect_interval = max(1, int(detect_interval))
+        self.tracker_type = tracker_type
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.required_votes = required_votes
+
+        self.tracks = []
+        self._next_track_id = 0
+        self._frames_since_detection = None
+
+    def needs_detection(self):
+        """Whether the next frame should get a full detection pass"""
+        if self._frames_since_detection is None:
+            return True
+        if self._frames_since_detection >= self.detect_interval:
+            return True
+        return any(track.lost for track in self.tracks)
+
+    def update(self, frame):
+        """
+        Advance every track on a frame without running detection
+
+        Returns:
+            list: Tracks that are still being followed
+        """
+        self._frames_since_detection = (self._frames_since_detection or 0) + 1
+        for track in self.tracks:
+            if not track.lost:
+                track.update(frame)
+        return [track for track in self.tracks if not track.lost]
+
+    def associate(self, frame, face_locations):
+        """
+        Match fresh detections to existing tracks
+
+        Detections are paired greedily with the track they overlap most.
+        Unmatched detections start new tracks and unmatched tracks are
+        dropped after `max_misses` detections.
+
+        Args:
+            frame: BGR frame the detections came from
+            face_locations: Detected (top, right, bottom, left) boxes
+
+        Returns:
+            list: One track per detection, in the order of face_locations
+        """
+        self._frames_since_detection = 0
+
+        pairs = []
+        for det_index, location in enumerate(face_locations):
+            for track_index, track in enumerate(self.tracks):
+                overlap = box_iou(location, track.box)
+                if overlap >= self.iou_threshold:
+                    pairs.append((overlap, det_index, track_index))
+        pairs.sort(reverse=True)
+
+        assigned = [None] * len(face_locations)
+        used_tracks = set()
+        for _, det_index, track_index in pairs:
+            if assigned[det_index] is not None or track_index in used_tracks:
+                continue
+            track = self.tracks[track_index]
+            track.box = face_locations[det_index]
+            track.lost = False
+            track.misses = 0
+            track._init_tracker(frame, self.tracker_type)
+            assigned[det_index] = track
+            used_tracks.add(track_index)
+
+        kept = []
+        for track_index, track in enumerate(self.tracks):
+            if track_index in used_tracks:
+                kept.append(track)
+                continue
+            track.misses += 1
+            if track.misses <= self.max_misses and not track.lost:
+                kept.append(track)
+
+        for det_index, location in enumerate(face_locations):
+            if assigned[det_index] is None:
+                track = FaceTrack(self._next_track_id, location, frame, self.tracker_type)
+                self._next_track_id += 1
+                assigned[det_index] = track
+                kept.append(track)
+
+        self.tracks = kept
+        return assigned
+
+    def reset(self):
+        """Forget all tracks, e.g. when the class gallery changes"""
+        self.tracks = []
+        self._frames_since_detection = None
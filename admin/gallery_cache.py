@@ -0,0 +1,185 @@
+import os
+import json
+import hashlib
+import sqlite3
+import numpy as np
+
+from admin.db_migrations import ensure_migrated
+from admin.face_gallery import FaceGallery
+from config.utils_constants import ENCODING_DIR
+
+
+class ClassGalleryCache:
+    """
+    Per-class face gallery shards that survive across sessions.
+
+    Each shard holds a class's expected students and the gallery restricted
+    to them. It is keyed by the class and the enrollment version of the
+    class's course, and checked against the signature of those students'
+    own encodings, and kept both in memory and as an .npz file, so
+    back-to-back sessions (and the first session after a restart) start
+    without querying enrollments or rebuilding the sub-gallery. Enrollment
+    versions are bumped by triggers on student_courses and students, which
+    is what invalidates a shard's membership; registering a student outside
+    the class changes neither and leaves the shard alone.
+    """
+    SHARD_DIR = os.path.join(ENCODING_DIR, "class_shards")
+    ALL_COURSES = "*"
+
+    def __init__(self, db_service, face_service, shard_dir=SHARD_DIR):
+        """
+        Initialize the cache
+
+        Args:
+            db_service (DatabaseService): Used for enrollment lookups
+            face_service (FaceRecognitionService): Provides the full gallery
+            shard_dir (str): Directory for persisted shards
+        """
+        self.db_service = db_service
+        self.face_service = face_service
+        self.shard_dir = shard_dir
+        self._shards = {}
+
+        os.makedirs(self.shard_dir, exist_ok=True)
+        self.ensure_versioning()
+
+    def ensure_versioning(self):
+        """Make sure the enrollment version table and its triggers exist"""
+        ensure_migrated(self.db_service.db_path)
+
+    def enrollment_version(self, class_id):
+        """
+        Current enrollment version of a class
+
+        Returns:
+            tuple: (course_code, course version, all-courses version)
+        """
+        try:
+            conn = self.db_service.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT c.course_code,
+                       COALESCE(ev.version, 0),
+                       COALESCE((SELECT version FROM enrollment_versions WHERE course_code = ?), 0)
+                FROM classes c
+                LEFT JOIN enrollment_versions ev ON ev.course_code = c.course_code
+                WHERE c.class_id = ?
+            """, (self.ALL_COURSES, class_id))
+            row = cursor.fetchone()
+            conn.close()
+            return tuple(row) if row else (None, 0, 0)
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not read enrollment version: {e}")
+            return (None, 0, 0)
+
+    def _cache_key(self, class_id):
+        version = self.enrollment_version(class_id)
+        return f"{class_id}|{version[0]}|{version[1]}|{version[2]}"
+
+    def _signature(self, students):
+        return self.face_service.encoding_signature([s['student_id'] for s in students])
+
+    def _shard_path(self, class_id):
+        safe_id = hashlib.sha1(str(class_id).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.shard_dir, f"class_{safe_id}.npz")
+
+    def get(self, class_id):
+        """
+        Expected students and sub-gallery for a class, built only when stale
+
+        Args:
+            class_id: Class to look up
+
+        Returns:
+            tuple: (list of expected student dicts, FaceGallery)
+        """
+        key = self._cache_key(class_id)
+
+        shard = self._shards.get(class_id)
+        if shard is None or shard[0] != key:
+            shard = self._load_shard(class_id, key)
+
+        if shard is None:
+            students = self.db_service.get_class_students(class_id)
+            shard = self._build_shard(class_id, key, students)
+            print(f"✅ Built gallery shard for class {class_id}: "
+                  f"{shard[3].student_count} of {len(students)} students have faces")
+        elif shard[1] != self._signature(shard[2]):
+            # Same members, but some of their encodings changed
+            shard = self._build_shard(class_id, key, shard[2])
+            print(f"✅ Refreshed gallery shard for class {class_id}")
+
+        self._shards[class_id] = shard
+        return shard[2], shard[3]
+
+    def _build_shard(self, class_id, key, students):
+        gallery = self.face_service.gallery.subset([s['student_id'] for s in students])
+        shard = (key, self._signature(students), students, gallery)
+        self._save_shard(class_id, shard)
+        return shard
+
+    def get_gallery(self, class_id, student_ids):
+        """
+        Sub-gallery for a class's students, reusing the cached shard when the
+        cached membership matches exactly
+
+        Args:
+            class_id: Class the session belongs to
+            student_ids: Expected student IDs for the session
+
+        Returns:
+            FaceGallery: Gallery restricted to those students
+        """
+        students, gallery = self.get(class_id)
+        if {s['student_id'] for s in students} == set(student_ids):
+            return gallery
+        return self.face_service.gallery.subset(student_ids)
+
+    def warm(self, class_id):
+        """Make sure the shard for a class is ready before its session starts"""
+        if class_id is not None:
+            self.get(class_id)
+
+    def invalidate(self, class_id=None):
+        """Drop cached shards for one class, or for every class"""
+        class_ids = [class_id] if class_id is not None else list(self._shards)
+        for cid in class_ids:
+            self._shards.pop(cid, None)
+            path = self._shard_path(cid)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _load_shard(self, class_id, key):
+        path = self._shard_path(class_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data['key']) != key or 'signature' not in data:
+                    return None
+                students = json.loads(str(data['students']))
+                gallery = FaceGallery.from_arrays(data['encodings'], data['row_students'],
+                                                  [str(sid) for sid in data['student_ids']])
+                signature = str(data['signature'])
+            return key, signature, students, gallery
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Ignoring unreadable gallery shard {path}: {e}")
+            return None
+
+    def _save_shard(self, class_id, shard):
+        key, signature, students, gallery = shard
+        path = self._shard_path(class_id)
+        tmp_path = path + ".tmp.npz"
+        try:
+            np.savez(
+                tmp_path,
+                key=np.array(key),
+                signature=np.array(signature),
+                students=np.array(json.dumps(students)),
+                encodings=gallery.encodings,
+                row_students=gallery.row_student_indices,
+                student_ids=np.array(gallery.student_ids, dtype=str)
+            )
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not save gallery shard for class {class_id}: {e}")
@@ -0,0 +1,286 @@
+import random
+from itertools import combinations
+from math import comb
+
+import numpy as np
+
+# Set bits in every byte value, for Hamming distances on 64-bit hashes
+_POPCOUNT_TABLE = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+
+def expected_hex_char_distance(bits):
+    """
+    Expected number of differing characters between the 16-character hex
+    strings of two 64-bit hashes that differ in `bits` random bits
+    """
+    # A character differs unless none of its 4 bits are among the flipped ones
+    return 16 * (1 - comb(60, bits) / comb(64, bits))
+
+
+def hex_chars_to_bits(chars):
+    """Bit distance whose expected hex character distance is closest to `chars`"""
+    return min(range(65), key=lambda bits: abs(expected_hex_char_distance(bits) - chars))
+
+
+# The duplicate photo check used to count differing characters of the hex
+# hash string, with 10 characters by default and never less than 5. Its
+# thresholds are converted to bits so the sensitivity stays the same.
+DEFAULT_DUPLICATE_CHARS = 10
+MIN_DUPLICATE_CHARS = 5
+DEFAULT_DUPLICATE_BITS = hex_chars_to_bits(DEFAULT_DUPLICATE_CHARS)
+
+
+def hash_to_int(image_hash):
+    """
+    Convert a 64-bit perceptual hash to an integer
+
+    Args:
+        image_hash: imagehash.ImageHash or its hex string
+
+    Returns:
+        int: Hash value, or None if it cannot be parsed
+    """
+    try:
+        return int(str(image_hash), 16)
+    except (TypeError, ValueError):
+        return None
+
+
+def duplicate_threshold(distances):
+    """
+    Hash bit difference below which a photo duplicates an enrolled student
+
+    A third of the typical distance between enrolled students' hashes, since
+    genuine matches should be much closer than unrelated photos. Bits and hex
+    characters are not proportional, so the rule is applied in hex
+    characters, as it was tuned, and the result converted back to bits.
+
+    Args:
+        distances: Sampled bit distances between enrolled students' hashes
+
+    Returns:
+        int: Threshold in bits; DEFAULT_DUPLICATE_BITS without samples
+    """
+    if len(distances) == 0:
+        return DEFAULT_DUPLICATE_BITS
+    mean_chars = np.mean([expected_hex_char_distance(int(bits)) for bits in distances])
+    return hex_chars_to_bits(max(MIN_DUPLICATE_CHARS, int(mean_chars / 3)))
+
+
+def hamming_distances(hashes, value):
+    """
+    Bit differences between an array of 64-bit hashes and one hash
+
+    Args:
+        hashes (np.ndarray): uint64 array of any shape
+        value (int): Hash to compare against
+
+    Returns:
+        np.ndarray: Differing bit counts, same shape as hashes
+    """
+    xor = np.bitwise_xor(np.asarray(hashes, dtype=np.uint64), np.uint64(value))
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(xor).astype(np.int64)
+    bytes_view = xor.reshape(-1).view(np.uint8).reshape(-1, 8)
+    return _POPCOUNT_TABLE[bytes_view].sum(axis=1).reshape(xor.shape).astype(np.int64)
+
+
+class HashIndex:
+    """
+    Near-duplicate search over 64-bit perceptual hashes (multi-index hashing).
+
+    Each hash is split into `chunks` equal substrings and every substring is
+    indexed in its own table. By the pigeonhole principle, two hashes within
+    Hamming distance r agree to within r // chunks bits on at least one
+    substring, so a radius query only probes the buckets near the query's
+    substrings and verifies those candidates. When a radius is so large that
+    probing would touch more buckets than there are hashes, the query falls
+    back to one vectorized scan instead.
+    """
+
+    def __init__(self, bits=64, chunks=4):
+        """
+        Initialize an empty index
+
+        Args:
+            bits (int): Hash length in bits
+            chunks (int): Number of substrings (tables); must divide bits
+        """
+        if bits % chunks:
+            raise ValueError("bits must be a multiple of chunks")
+        self.bits = bits
+        self.chunks = chunks
+        self.chunk_bits = bits // chunks
+        self._chunk_mask = (1 << self.chunk_bits) - 1
+
+        self._keys = []
+        self._values = []
+        self._slots = {}
+        self._tables = [{} for _ in range(chunks)]
+        self._array = None
+        self._probe_masks = {}
+
+    @classmethod
+    def from_items(cls, items, bits=64, chunks=4):
+        """
+        Build an index from (key, hash) pairs; unparsable hashes are skipped
+
+        Args:
+            items: Iterable of (key, int or hex string) pairs
+        """
+        index = cls(bits, chunks)
+        for key, value in items:
+            if isinstance(value, str):
+                value = hash_to_int(value)
+            if value is not None:
+                index.add(key, value)
+        return index
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, key):
+        return key in self._slots
+
+    def _chunk_values(self, value):
+        return [(value >> (i * self.chunk_bits)) & self._chunk_mask for i in range(self.chunks)]
+
+    def add(self, key, value):
+        """Index a hash under a key, replacing the key's previous hash"""
+        value = int(value)
+        if key in self._slots:
+            self.remove(key)
+
+        slot = len(self._keys)
+        self._keys.append(key)
+        self._values.append(value)
+        self._slots[key] = slot
+        for table, chunk in zip(self._tables, self._chunk_values(value)):
+            table.setdefault(chunk, set()).add(slot)
+        self._array = None
+
+    def remove(self, key):
+        """Remove a key; does nothing if it is not indexed"""
+        slot = self._slots.pop(key, None)
+        if slot is None:
+            return
+        for table, chunk in zip(self._tables, self._chunk_values(self._values[slot])):
+            bucket = table.get(chunk)
+            if bucket is not None:
+                bucket.discard(slot)
+                if not bucket:
+                    del table[chunk]
+        self._keys[slot] = None
+        self._array = None
+
+        if len(self._keys) > 2 * len(self._slots) + 64:
+            self._rebuild()
+
+    def _rebuild(self):
+        """Drop the slots left behind by removed keys"""
+        items = [(key, self._values[slot]) for key, slot in self._slots.items()]
+        self._keys, self._values, self._slots = [], [], {}
+        self._tables = [{} for _ in range(self.chunks)]
+        for key, value in items:
+            self.add(key, value)
+
+    def get(self, key):
+        """Hash stored for a key, or None"""
+        slot = self._slots.get(key)
+        return None if slot is None else self._values[slot]
+
+    def _masks(self, radius):
+        """Every chunk-sized bit mask with at most `radius` bits set"""
+        masks = self._probe_masks.get(radius)
+        if masks is None:
+            masks = [0]
+            for flips in range(1, radius + 1):
+                for positions in combinations(range(self.chunk_bits), flips):
+                    masks.append(sum(1 << p for p in positions))
+            self._probe_masks[radius] = masks
+        return masks
+
+    def _probe_count(self, sub_radius):
+        """Number of bucket lookups a probe at this sub-radius would need"""
+        total, term = 1, 1
+        for k in range(1, sub_radius + 1):
+            term = term * (self.chunk_bits - k + 1) // k
+            total += term
+        return total * self.chunks
+
+    def _live_array(self):
+        if self._array is None:
+            self._array = np.array(self._values, dtype=np.uint64)
+        return self._array
+
+    def query(self, value, radius):
+        """
+        Every indexed hash within a Hamming radius
+
+        Args:
+            value (int): Query hash
+            radius (int): Largest bit difference to report
+
+        Returns:
+            list: (key, distance) pairs, closest first
+        """
+        if not self._slots or radius < 0:
+            return []
+        value = int(value)
+        sub_radius = radius // self.chunks
+
+        if self._probe_count(sub_radius) >= len(self._slots):
+            # Probing would touch more buckets than there are hashes
+            distances = hamming_distances(self._live_array(), value)
+            slots = [int(s) for s in np.flatnonzero(distances <= radius) if self._keys[s] is not None]
+            matches = [(self._keys[s], int(distances[s])) for s in slots]
+        else:
+            candidates = set()
+            masks = self._masks(sub_radius)
+            for table, chunk in zip(self._tables, self._chunk_values(value)):
+                for mask in masks:
+                    bucket = table.get(chunk ^ mask)
+                    if bucket:
+                        candidates.update(bucket)
+            matches = []
+            for slot in candidates:
+                distance = bin(self._values[slot] ^ value).count("1")
+                if distance <= radius:
+                    matches.append((self._keys[slot], distance))
+
+        matches.sort(key=lambda item: item[1])
+        return matches
+
+    def nearest(self, value, radius):
+        """
+        Closest indexed hash within a radius
+
+        Returns:
+            tuple: (key, distance) or None
+        """
+        matches = self.query(value, radius)
+        return matches[0] if matches else None
+
+    def sample_distances(self, pairs=100, seed=None):
+        """
+        Hamming distances between randomly chosen pairs of indexed hashes
+
+        Args:
+            pairs (int): Number of pairs to sample
+            seed: Random seed, for repeatable samples
+
+        Returns:
+            np.ndarray: Sampled distances (empty with fewer than two hashes)
+        """
+        slots = list(self._slots.values())
+        if len(slots) < 2:
+            return np.empty(0, dtype=np.int64)
+
+        rng = random.Random(seed)
+        if len(slots) * (len(slots) - 1) // 2 <= pairs:
+            chosen = list(combinations(slots, 2))
+        else:
+            chosen = [tuple(rng.sample(slots, 2)) for _ in range(pairs)]
+        return np.array([bin(self._values[a] ^ self._values[b]).count("1") for a, b in chosen],
+                        dtype=np.int64)
@@ -14,11 +14,12 @@ from PyQt5.QtCore import Qt, QTimer, QDateTime, pyqtSignal, QObject
 from admin.start_attendance_window import StartAttendanceWindow
 from admin.view_attendance import ViewAttendanceWindow
 from admin.register_student import RegisterStudentWindow
+from admin.unknown_face_clusters import UnknownFaceClusters
 import cv2
 
 
 class UnknownFacesCounter(QObject):
-    """Thread-safe counter for unknown faces with signal support"""
+    """Thread-safe counter for unknown people (clusters of saved faces) with signal support"""
     count_updated = pyqtSignal(int)
     
     def __init__(self, folder_path):
@@ -27,6 +28,7 @@ class UnknownFacesCounter(QObject):
         self._last_count = 0
         self._last_check_time = 0
         self._lock = threading.Lock()
+        self._clusters = None
     
     def count_images(self):
         """Count image files in the folder in a background thread"""
@@ -48,9 +50,10 @@ class UnknownFacesCounter(QObject):
         
         try:
             if os.path.exists(self._folder_path):
-                count = len([f for f in os.listdir(self._folder_path) 
-                           if os.path.isfile(os.path.join(self._folder_path, f)) 
-                           and f.lower().endswith(('.png', '.jpg', '.jpeg'))])
+                # Count people (clusters of saved crops), not individual files
+                if self._clusters is None:
+                    self._clusters = UnknownFaceClusters(self._folder_path)
+                count = len(self._clusters.update())
             else:
                 count = 0
                 
@@ -809,7 +812,7 @@ class HomeWindow(QWidget):
             self.notification_label.mousePressEvent = self.open_unknown_faces
             self.notification_layout.addWidget(self.notification_label)
         
-        self.notification_label.setText(f"🔔 {count} unknown {'face' if count == 1 else 'faces'} detected! Click here to review.")
+        self.notification_label.setText(f"🔔 {count} unknown {'person' if count == 1 else 'people'} detected! Click here to review.")
         self.notification_label.setVisible(True)
 
     def hide_unknown_notification(self):
@@ -13,6 +13,7 @@ from PyQt5.QtWidgets import (
 from PyQt5 import QtGui
 from PyQt5.QtGui import QPixmap
 from PyQt5.QtCore import Qt
+from admin.encoding_store import EncodingStore
 from config.utils import enhance_image
 from config.utils_constants import DATABASE_PATH, IMAGE_DIR
 
@@ -188,6 +189,9 @@ class MarkKnownWindow(QMainWindow):
             conn.commit()
             conn.close()
 
+            # ✅ Add the encoding to the store too, so recognition and the duplicate check see the student
+            EncodingStore().append(student_id, [face_encodings[0]])
+
             QMessageBox.information(self, "Success", "Student registered successfully.")
             self.close()
 
@@ -16,6 +16,11 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtGui import QPixmap
 from PyQt5.QtCore import Qt, QTimer
 from admin.webcam_window import WebcamWindow
+from admin.db_service import DatabaseService
+from admin.face_recognition_service import FaceRecognitionService
+from admin.encoding_store import EncodingStore
+from admin.face_augmentation import FaceAugmenter
+from admin.hash_index import HashIndex, hash_to_int, duplicate_threshold, DEFAULT_DUPLICATE_BITS
 from config.utils_constants import ENCODING_DIR
 from PIL import Image, ImageOps
 
@@ -55,6 +60,9 @@ class ValidatingTabWidget(QTabWidget):
 
 
 class RegisterStudentWindow(QMainWindow):
+    # (students signature, HashIndex of image hashes, dynamic threshold), shared across windows
+    _hash_index_state = None
+    
     def __init__(self, image_path=None, parent_window=None):
         super().__init__()
         
@@ -1096,61 +1104,91 @@ class RegisterStudentWindow(QMainWindow):
             print(f"Hash computation error: {e}")
             return None, False
 
-    def get_dynamic_threshold(self, conn):
-        """Calculate a dynamic threshold based on dataset variance"""
-        try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM students")
-            count = cursor.fetchone()[0]
+    def find_possible_duplicates(self, face_encoding, tolerance=0.55, top_n=5):
+        """
+        Rank the registered students closest to a face
+        
+        Uses the shared in-memory gallery: one batched distance computation
+        against every stored encoding, reduced to the closest encoding per
+        student.
+        
+        Args:
+            face_encoding: 128-d encoding of the new photo
+            tolerance (float): Largest face distance reported
+            top_n (int): Number of students to return at most
             
+        Returns:
+            list: (student_id, name, distance) tuples, closest first
+        """
+        db_service = DatabaseService()
+        gallery = FaceRecognitionService.shared(db_service).gallery
+        if gallery.student_count == 0:
+            return []
+        
+        ranking = gallery.rank_students(face_encoding, reduction="min", top_n=top_n)[0]
+        candidates = [(student_id, float(score))
+                      for student_id, score in zip(ranking['student_ids'], ranking['scores'])
+                      if score < tolerance]
+        db_service.preload_student_names([student_id for student_id, _ in candidates])
+        return [(student_id, db_service.get_student_name(student_id), distance)
+                for student_id, distance in candidates]
+
+    def get_student_hash_index(self, conn):
+        """
+        Near-duplicate index over every student's image hash
+        
+        Built once and shared by all registration windows; rebuilt only when
+        the students table has gained or lost rows since it was built.
+        
+        Returns:
+            tuple: (HashIndex, dynamic threshold in bits)
+        """
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*), MAX(rowid) FROM students")
+        signature = tuple(cursor.fetchone())
+        
+        state = RegisterStudentWindow._hash_index_state
+        if state is not None and state[0] == signature:
+            return state[1], state[2]
+        
+        cursor.execute("SELECT student_id, image_hash FROM students WHERE image_hash IS NOT NULL")
+        index = HashIndex.from_items(cursor.fetchall())
+        threshold = self.get_dynamic_threshold(index)
+        RegisterStudentWindow._hash_index_state = (signature, index, threshold)
+        print(f"✅ Indexed {len(index)} student image hashes")
+        return index, threshold
+
+    def remember_student_hash(self, conn, student_id, image_hash):
+        """Add a newly registered student's hash to the shared index"""
+        state = RegisterStudentWindow._hash_index_state
+        if state is None:
+            return
+        value = hash_to_int(image_hash)
+        if value is not None:
+            state[1].add(student_id, value)
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*), MAX(rowid) FROM students")
+        RegisterStudentWindow._hash_index_state = (tuple(cursor.fetchone()), state[1], state[2])
+
+    def get_dynamic_threshold(self, index):
+        """Calculate a dynamic threshold (in bits) based on dataset variance"""
+        try:
             # For small datasets, use a conservative threshold
-            if count < 10:
-                return 10  # Default threshold for small datasets
-                
-            # For larger datasets, calculate based on existing hash differences
-            cursor.execute("SELECT image_hash FROM students WHERE image_hash IS NOT NULL")
-            hashes = [row[0] for row in cursor.fetchall() if row[0]]
+            if len(index) < 10:
+                return DEFAULT_DUPLICATE_BITS
             
-            if len(hashes) < 2:
-                return 10  # Not enough data for analysis
-                
-            # Calculate differences between all pairs (limited to 100 random pairs for performance)
-            import random
-            if len(hashes) > 15:  # If we have many hashes
-                # Sample pairs to avoid O(n²) comparison
-                pairs = []
-                for _ in range(min(100, len(hashes) * 2)):
-                    i, j = random.sample(range(len(hashes)), 2)
-                    pairs.append((hashes[i], hashes[j]))
-            else:
-                # For small datasets, compare all pairs
-                pairs = [(hashes[i], hashes[j]) 
-                         for i in range(len(hashes)) 
-                         for j in range(i+1, len(hashes))]
-            
-            # Calculate Hamming distances
-            distances = []
-            for hash1, hash2 in pairs:
-                dist = sum(ch1 != ch2 for ch1, ch2 in zip(hash1, hash2))
-                distances.append(dist)
-                
-            if not distances:
-                return 10
-                
-            # Perform statistical analysis
-            mean_dist = sum(distances) / len(distances)
-            std_dev = (sum((d - mean_dist)**2 for d in distances) / len(distances))**0.5
-            
-            # Set threshold at 1/3 of the mean distance but not less than 5
-            # This assumes genuine matches should be significantly closer than random pairs
-            dynamic_threshold = max(5, int(mean_dist / 3))
+            # Bit differences between sampled pairs (at most 100, to avoid O(n²) comparison)
+            distances = index.sample_distances(pairs=100)
+            dynamic_threshold = duplicate_threshold(distances)
             
-            print(f"Dynamic threshold calculated: {dynamic_threshold} (from mean: {mean_dist:.2f}, std: {std_dev:.2f})")
+            if len(distances):
+                print(f"Dynamic threshold calculated: {dynamic_threshold} bits "
+                      f"(from mean: {distances.mean():.2f}, std: {distances.std():.2f})")
             return dynamic_threshold
             
         except Exception as e:
             print(f"Error calculating dynamic threshold: {e}")
-            return 10  # Fall back to default threshold
+            return DEFAULT_DUPLICATE_BITS  # Fall back to default threshold
         
     def reset_form(self):
         """Reset all form elements for registering another student"""
@@ -1183,12 +1221,8 @@ class RegisterStudentWindow(QMainWindow):
         if hasattr(self, 'skip_similarity_check') and self.skip_similarity_check:
             return False, None, None, None  # Skip similarity check completely
         try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT student_id, image_path, image_hash, face_encoding FROM students")
-            results = cursor.fetchall()
-            
-            # Calculate dynamic threshold based on existing data
-            phash_threshold = self.get_dynamic_threshold(conn)
+            # Hash index and dynamic threshold are cached across registrations
+            hash_index, phash_threshold = self.get_student_hash_index(conn)
             face_tolerance = 0.55  # Face recognition tolerance
             
             # Compute hash for new image, prioritizing face
@@ -1196,9 +1230,9 @@ class RegisterStudentWindow(QMainWindow):
             if not new_hash:
                 return False, None, "Failed to compute hash", "warning"
 
-            # Load face for new image
-            new_image = face_recognition.load_image_file(new_image_path)
-            new_encodings = face_recognition.face_encodings(new_image)
+            # Encode the new face; the first encoding is the unaugmented one, and the
+            # result is cached, so registration reuses it instead of encoding again
+            _, new_encodings = self.generate_augmented_encodings(new_image_path)
 
             has_face = len(new_encodings) > 0
             face_warning = None
@@ -1206,30 +1240,20 @@ class RegisterStudentWindow(QMainWindow):
             if not has_face:
                 face_warning = "⚠️ No face detected in image - using only image similarity"
             
-            # Check against all existing students
-            for student_id, existing_path, existing_hash, encoding_blob in results:
-                # Compare face encodings if available
-                if has_face and encoding_blob:
-                    try:
-                        # Deserialize the list of encodings
-                        existing_encodings = pickle.loads(encoding_blob)
-                        
-                        # Compare against each stored encoding
-                        for existing_encoding in existing_encodings:
-                            face_distance = face_recognition.face_distance([existing_encoding], new_encodings[0])[0]
-                            if face_distance < face_tolerance:
-                                return True, student_id, f"Face similarity: {face_distance:.2f}", None
-                    except Exception as e:
-                        print(f"Face comparison error: {e}")
-                
-                # Compare hashes
-                if existing_hash and new_hash:
-                    try:
-                        hash_diff = sum(ch1 != ch2 for ch1, ch2 in zip(new_hash, existing_hash))
-                        if hash_diff <= phash_threshold:
-                            return True, student_id, f"Image similarity: {hash_diff}/{len(new_hash)} (threshold: {phash_threshold})", None
-                    except Exception as e:
-                        print(f"Hash comparison error: {e}")
+            # Rank the closest existing students by face distance
+            if has_face:
+                candidates = self.find_possible_duplicates(new_encodings[0], face_tolerance)
+                if candidates:
+                    lines = [f"{rank}. {student_id} - {name} (face distance: {distance:.2f})"
+                             for rank, (student_id, name, distance) in enumerate(candidates, 1)]
+                    reason = "Possible duplicates, closest first:\n" + "\n".join(lines)
+                    return True, candidates[0][0], reason, None
+            
+            # Closest image hash within the threshold (bit differences)
+            match = hash_index.nearest(hash_to_int(new_hash), phash_threshold)
+            if match is not None:
+                student_id, hash_diff = match
+                return True, student_id, f"Image similarity: {hash_diff}/{hash_index.bits} bits (threshold: {phash_threshold})", None
 
             # Return with warning if necessary
             return False, None, None, face_warning
@@ -1241,54 +1265,26 @@ class RegisterStudentWindow(QMainWindow):
             print(f"Unexpected error: {e}")
             return False, None, f"Error: {e}", None
 
-    def generate_augmented_encodings(self, image):
-        """Generate multiple face encodings with slight augmentations for better recognition"""
+    def generate_augmented_encodings(self, image_path):
+        """
+        Generate multiple face encodings with slight augmentations for better recognition
+        
+        Detection, landmarks and encoding are shared across the variants and
+        cached by image content (see FaceAugmenter).
+        
+        Returns:
+            tuple: (face locations found, list of encodings; empty unless exactly one face)
+        """
         try:
-            # Original encoding
-            original_encodings = face_recognition.face_encodings(image)
-            if not original_encodings:
-                return []
-                
-            original_encoding = original_encodings[0]
-            augmented_encodings = [original_encoding]
-            
-            # Convert to PIL for augmentations
-            pil_image = Image.fromarray(image)
-            
-            # Slight brightness variations (+/- 10%)
-            for factor in [0.9, 1.1]:
-                try:
-                    # Apply brightness adjustment
-                    enhancer = ImageOps.autocontrast(pil_image)
-                    # Convert back to numpy array
-                    adjusted = np.array(enhancer)
-                    # Get encodings from the adjusted image
-                    adjusted_encodings = face_recognition.face_encodings(adjusted)
-                    if adjusted_encodings:
-                        augmented_encodings.append(adjusted_encodings[0])
-                except Exception as e:
-                    print(f"Error generating brightness augmentation: {e}")
-            
-            # Small rotations (+/- 5 degrees)
-            for angle in [-5, 5]:
-                try:
-                    # Apply rotation
-                    rotated = pil_image.rotate(angle)
-                    # Convert back to numpy array
-                    rotated_array = np.array(rotated)
-                    # Get encodings from the rotated image
-                    rotated_encodings = face_recognition.face_encodings(rotated_array)
-                    if rotated_encodings:
-                        augmented_encodings.append(rotated_encodings[0])
-                except Exception as e:
-                    print(f"Error generating rotation augmentation: {e}")
-            
-            print(f"Generated {len(augmented_encodings)} augmented face encodings")
-            return augmented_encodings
-            
+            result = FaceAugmenter().encode_file(image_path)
+            encodings = list(result['encodings'])
+            if encodings:
+                source = "cache" if result['cached'] else "image"
+                print(f"Generated {len(encodings)} augmented face encodings (from {source})")
+            return result['face_locations'], encodings
         except Exception as e:
             print(f"Error in augmentation: {e}")
-            return []
+            return [], []
         
     def register_student(self):
         """Register student with comprehensive duplicate checking"""
@@ -1364,9 +1360,8 @@ class RegisterStudentWindow(QMainWindow):
                 QMessageBox.critical(self, "Directory Error", f"Failed to create encoding directory: {e}")
                 return
         
-        # Define encoding path
-        encoding_path = os.path.join(ENCODING_DIR, f"student_{sanitized_id}_encodings.pkl")
-        print(f"Encoding path: {encoding_path}")
+        # Encodings go to the shared binary store rather than a per-student file
+        encoding_store = EncodingStore(ENCODING_DIR)
 
         try:
             # Initialize database connection
@@ -1390,7 +1385,7 @@ class RegisterStudentWindow(QMainWindow):
                 QMessageBox.warning(
                     self, 
                     "Duplicate Detected", 
-                    f"Similar image found for Student ID: {existing_student_id}\n{reason}"
+                    f"Similar image found for Student ID: {existing_student_id}\n\n{reason}"
                 )
                 return
                 
@@ -1411,11 +1406,10 @@ class RegisterStudentWindow(QMainWindow):
                 QMessageBox.warning(self, "Processing Error", "Failed to process the image")
                 return
 
-            # Face detection and encoding with augmentation
-            image = face_recognition.load_image_file(self.captured_image_path)
+            # Face detection and encoding with augmentation, in one pass
+            face_locations, augmented_encodings = self.generate_augmented_encodings(self.captured_image_path)
             
             # Check for multiple faces again - explicit rejection
-            face_locations = face_recognition.face_locations(image)
             if len(face_locations) > 1:
                 QMessageBox.warning(
                     self,
@@ -1424,27 +1418,11 @@ class RegisterStudentWindow(QMainWindow):
                     QMessageBox.Ok
                 )
                 return
-                
-            # Generate multiple augmented encodings for better recognition
-            augmented_encodings = self.generate_augmented_encodings(image)
 
             # Set encoding_blob based on whether we have encodings
             if augmented_encodings:
                 # Serialize the encodings to a blob for database storage
                 encoding_blob = pickle.dumps(augmented_encodings)
-                
-                # Save to file - make sure the directory exists
-                try:
-                    with open(encoding_path, 'wb') as f:
-                        pickle.dump(augmented_encodings, f)
-                    print(f"Successfully saved encodings to {encoding_path}")
-                except IOError as e:
-                    QMessageBox.warning(
-                        self,
-                        "File Save Error",
-                        f"Failed to save encodings to file: {e}\nContinuing with database only storage."
-                    )
-                    # We'll continue with just the database blob in this case
             else:
                 QMessageBox.warning(
                     self,
@@ -1468,7 +1446,6 @@ class RegisterStudentWindow(QMainWindow):
                 shutil.copy2(self.face_only_path, face_image_path)
             
             # Debug print for verification
-            print(f"Encoding path saved to DB: {encoding_path}")
             print(f"Encoding blob size: {len(encoding_blob) if encoding_blob else 0} bytes")
             
             # Insert student into database with all additional fields
@@ -1478,7 +1455,7 @@ class RegisterStudentWindow(QMainWindow):
                                 current_semester, face_encoding_path)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (first_name, last_name, student_id, final_image_path, image_hash, encoding_blob, 
-            face_image_path, course_code, year, email, phone, semester, encoding_path))
+            face_image_path, course_code, year, email, phone, semester, None))
                         
             # Insert student course enrollment
             cursor.execute(
@@ -1500,7 +1477,39 @@ class RegisterStudentWindow(QMainWindow):
                 ("admin", f"Student registered: {student_id}")
             )
             
-            conn.commit()
+            # Encodings go into the store before the commit: a student who cannot
+            # be recognized is not registered at all
+            store_error = None
+            for attempt in range(2):
+                try:
+                    encoding_store.append(student_id, augmented_encodings)
+                    store_error = None
+                    break
+                except (IOError, OSError) as e:
+                    store_error = e
+                    print(f"⚠️ Encoding store write failed (attempt {attempt + 1}): {e}")
+            
+            if store_error is not None:
+                conn.rollback()
+                self.discard_registration_images(final_image_path, face_image_path)
+                QMessageBox.critical(
+                    self,
+                    "File Save Error",
+                    f"Failed to save encodings to the encoding store: {store_error}\n"
+                    "The student was not registered. Please try again."
+                )
+                return
+            
+            try:
+                conn.commit()
+            except sqlite3.Error:
+                # The row never made it; don't leave its encodings behind
+                encoding_store.remove(student_id)
+                self.discard_registration_images(final_image_path, face_image_path)
+                raise
+            print(f"Successfully saved encodings to {encoding_store.data_path}")
+            DatabaseService.invalidate_student_cache(student_id)
+            self.remember_student_hash(conn, student_id, image_hash)
             
             # Show success message with details
             success_msg = "Student registered successfully"
@@ -1543,6 +1552,15 @@ class RegisterStudentWindow(QMainWindow):
             if conn:
                 conn.close()
                 
+    def discard_registration_images(self, *paths):
+        """Remove images copied for a registration that did not complete"""
+        for path in paths:
+            if path and path not in (self.captured_image_path, self.face_only_path) and os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"Error removing {path}: {e}")
+
     def cleanup_temp_files(self):
         """Clean up temporary files with improved safety checks"""
         for path in self.temp_files:
@@ -1,21 +1,23 @@
 import os
-import cv2
-import sqlite3
-import pickle
-import numpy as np
-import imagehash
 import face_recognition
-from PIL import Image
 from PyQt5.QtWidgets import (
-    QWidget, QVBoxLayout, QLabel, QPushButton, QMessageBox, QApplication, QHBoxLayout
+    QWidget, QVBoxLayout, QLabel, QPushButton, QMessageBox, QApplication, QHBoxLayout,
+    QListWidget, QListWidgetItem, QListView
 )
-from PyQt5.QtGui import QPixmap
-from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QPixmap, QIcon
+from PyQt5.QtCore import Qt, QSize
 from config.utils_constants import UNKNOWN_DIR, DATABASE_PATH
+from admin.db_service import DatabaseService
 from admin.mark_known_window import MarkKnownWindow
 from admin.register_student import RegisterStudentWindow
+from admin.unknown_face_loader import UnknownFaceLoader
 
 class ReviewUnknownFacesWindow(QWidget):
+    # Images whose phash differs by at most this many bits are shown once
+    DUPLICATE_HASH_RADIUS = 6
+    THUMBNAIL_SIZE = 64
+    SUGGESTION_TOLERANCE = 0.5  # Only consider strong matches
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("📷 Review Unknown Faces")
@@ -38,6 +40,24 @@ class ReviewUnknownFacesWindow(QWidget):
         self.suggestion_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(self.suggestion_label)
 
+        # ✅ How many saved crops belong to this person
+        self.cluster_label = QLabel("", self)
+        self.cluster_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.cluster_label)
+
+        # ✅ Thumbnails stream in while the folder is processed
+        self.thumbnail_list = QListWidget(self)
+        self.thumbnail_list.setViewMode(QListView.IconMode)
+        self.thumbnail_list.setFlow(QListView.LeftToRight)
+        self.thumbnail_list.setWrapping(False)
+        self.thumbnail_list.setIconSize(QSize(self.THUMBNAIL_SIZE, self.THUMBNAIL_SIZE))
+        self.thumbnail_list.setFixedHeight(self.THUMBNAIL_SIZE + 30)
+        layout.addWidget(self.thumbnail_list)
+
+        self.loading_label = QLabel("⏳ Loading unknown faces...", self)
+        self.loading_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.loading_label)
+
         # ✅ Navigation Buttons
         nav_layout = QHBoxLayout()
         self.prev_button = QPushButton("⏮ Previous")
@@ -56,62 +76,83 @@ class ReviewUnknownFacesWindow(QWidget):
 
         self.setLayout(layout)
 
-        # ✅ Load Images & Initialize UI
-        self.unknown_images = self.load_unknown_images()
-        self.current_index = 0
-
-        if self.unknown_images:
-            self.show_image(self.current_index)
-        else:
-            self.image_label.setText("No unknown faces found.")
-            self.disable_buttons()
-
         # ✅ Connect Buttons
         self.prev_button.clicked.connect(self.show_previous)
         self.next_button.clicked.connect(self.show_next)
         self.delete_button.clicked.connect(self.delete_current_image)
         self.mark_known_button.clicked.connect(self.mark_as_known)
+        self.thumbnail_list.currentRowChanged.connect(self.on_thumbnail_selected)
+
+        # ✅ Images are loaded in the background; the window opens right away
+        self.db_service = DatabaseService(DATABASE_PATH)
+        self.gallery = None
+        self.loader = None
+        self.unknown_images = []
+        self.image_info = {}
+        self.current_index = 0
+        self.known_cluster_members = []
+        self.disable_buttons()
+        self.image_label.setText("⏳ Loading unknown faces...")
+        self.load_unknown_images()
 
 
     def load_unknown_images(self):
-        """Load only unique and valid unknown images for review."""
+        """Start (or restart) loading unique, valid unknown images in the background."""
         if not os.path.exists(UNKNOWN_DIR):
             os.makedirs(UNKNOWN_DIR)  # ✅ Create the folder if it doesn't exist
 
-        images = [f for f in os.listdir(UNKNOWN_DIR) if f.endswith(('.jpg', '.png', '.jpeg'))]
-        valid_images = []
-        seen_hashes = set()
-
-        for img in images:
-            img_path = os.path.join(UNKNOWN_DIR, img)  # ✅ Ensure correct file path
-
-            try:
-                # ✅ Load image and check face presence
-                image = face_recognition.load_image_file(img_path)
-                face_locations = face_recognition.face_locations(image)
-
-                if not face_locations:
-                    print(f"⚠️ Skipped {img} (No face detected)")
-                    continue  # Skip images with no faces
-                
-                # ✅ Convert to hash for duplicate filtering
-                pil_image = Image.open(img_path)
-                face_hash = str(imagehash.phash(pil_image))
+        self.stop_loader()
+        self.unknown_images = []
+        self.image_info = {}
+        self.thumbnail_list.clear()
+
+        self.loader = UnknownFaceLoader(UNKNOWN_DIR, self.DUPLICATE_HASH_RADIUS, self.THUMBNAIL_SIZE, self)
+        self.loader.gallery_ready.connect(self.on_gallery_ready)
+        self.loader.image_loaded.connect(self.on_image_loaded)
+        self.loader.progress.connect(self.on_loading_progress)
+        self.loader.loading_finished.connect(self.on_loading_finished)
+        self.loader.start()
+
+    def stop_loader(self):
+        """Stop a running background loader and wait for it."""
+        if self.loader is not None:
+            self.loader.stop()
+            self.loader.wait()
+            self.loader = None
+
+    def on_gallery_ready(self, gallery):
+        """Keep the preloaded gallery and refresh the current suggestion."""
+        self.gallery = gallery
+        if self.unknown_images:
+            self.suggest_similar_face(self.unknown_images[self.current_index])
+
+    def on_image_loaded(self, filename, thumbnail, info):
+        """Add an image as soon as the loader has checked it."""
+        self.unknown_images.append(filename)
+        self.image_info[filename] = info
+        item = QListWidgetItem(QIcon(QPixmap.fromImage(thumbnail)), "")
+        item.setToolTip(filename)
+        self.thumbnail_list.addItem(item)
+
+        if len(self.unknown_images) == 1:
+            self.enable_buttons()
+            self.current_index = 0
+            self.show_image(self.current_index)
 
-                if face_hash in seen_hashes:
-                    print(f"⚠️ Duplicate detected in review list, skipping: {img}")
-                    continue  # Skip duplicate images
+    def on_loading_progress(self, done, total):
+        self.loading_label.setText(f"⏳ Checked {done} of {total} images...")
 
-                # ✅ Add to valid images & store hash
-                seen_hashes.add(face_hash)
-                valid_images.append(img)
+    def on_loading_finished(self, count):
+        self.loading_label.setText(f"✅ {count} unknown {'person' if count == 1 else 'people'} to review.")
+        if not self.unknown_images:
+            self.image_label.setText("No unknown faces found.")
+            self.disable_buttons()
 
-            except Exception as e:
-                print(f"❌ Error loading {img}: {e}")
+    def on_thumbnail_selected(self, row):
+        if 0 <= row < len(self.unknown_images) and row != self.current_index:
+            self.current_index = row
+            self.show_image(row)
 
-        print(f"✅ Loaded {len(valid_images)} unique unknown images.")
-        return valid_images
-    
     def show_image(self, index):
         """Display the selected unknown face while ensuring clarity and proper scaling."""
         if not self.unknown_images:
@@ -145,67 +186,49 @@ class ReviewUnknownFacesWindow(QWidget):
         )
         self.image_label.setPixmap(scaled_pixmap)
 
-        self.suggest_similar_face(img_path)
+        self.thumbnail_list.blockSignals(True)
+        self.thumbnail_list.setCurrentRow(index)
+        self.thumbnail_list.blockSignals(False)
+
+        size = self.image_info.get(img_filename, {}).get('size', 1)
+        self.cluster_label.setText(f"👥 Seen in {size} saved images" if size > 1 else "")
+
+        self.suggest_similar_face(img_filename)
         
-    def suggest_similar_face(self, unknown_face_path):
+    def suggest_similar_face(self, img_filename):
         """Suggest a similar registered face for the unknown face."""
+        if self.gallery is None:
+            self.suggestion_label.setText("⏳ Loading registered faces...")
+            return None
+
         try:
-            # Load the unknown face
-            unknown_image = face_recognition.load_image_file(unknown_face_path)
-            unknown_encoding = face_recognition.face_encodings(unknown_image)
-            
-            if not unknown_encoding:
-                self.status_label.setText("⚠️ No face found in the unknown image.")
-                return None
-                
-            unknown_encoding = unknown_encoding[0]  # Get the first face encoding
-            
-            # Get all registered faces
-            conn = sqlite3.connect("attendance.db")
-            cursor = conn.cursor()
-            cursor.execute("SELECT student_id, face_encoding FROM students")
-            registered_faces = cursor.fetchall()
-            conn.close()
-            
-            best_match = None
-            best_distance = 1.0  # Lower is better, 0 is perfect match
-            
-            for student_id, face_blob in registered_faces:
-                if face_blob:
-                    try:
-                        face_encodings = pickle.loads(face_blob)
-                        
-                        for encoding in face_encodings:
-                            # Calculate face distance
-                            distance = face_recognition.face_distance([encoding], unknown_encoding)
-                            
-                            # face_distance returns an array, so get the first (and only) element
-                            if len(distance) > 0:
-                                distance = distance[0]
-                                
-                                # Update best match if this distance is better
-                                if distance < best_distance and distance < 0.5:  # Only consider strong matches
-                                    best_distance = distance
-                                    best_match = student_id
-                    except Exception as e:
-                        print(f"Error comparing with student {student_id}: {e}")
-            
+            info = self.image_info.get(img_filename, {})
+            unknown_encoding = info.get('encoding')
+
+            if unknown_encoding is None:
+                # Not in the unknown face index yet: encode once and remember it
+                img_path = os.path.join(UNKNOWN_DIR, img_filename)
+                unknown_image = face_recognition.load_image_file(img_path)
+                encodings = face_recognition.face_encodings(unknown_image, info.get('face_locations'))
+                if not encodings:
+                    self.suggestion_label.setText("⚠️ No face found in the unknown image.")
+                    return None
+                unknown_encoding = info['encoding'] = encodings[0]
+
+            # One batched comparison against the preloaded gallery
+            best_match, best_distance = self.gallery.best_matches(
+                unknown_encoding, self.SUGGESTION_TOLERANCE
+            )[0]
+
             if best_match:
-                # Get student name
-                conn = sqlite3.connect("attendance.db")
-                cursor = conn.cursor()
-                cursor.execute("SELECT name FROM students WHERE student_id = ?", (best_match,))
-                result = cursor.fetchone()
-                conn.close()
-                
-                if result:
-                    similarity_percentage = (1 - best_distance) * 100
-                    self.suggestion_label.setText(f"✅ Similar to: {result[0]} ({best_match}) - {similarity_percentage:.1f}% match")
-                    return best_match
-            
+                name = self.db_service.get_student_name(best_match)
+                similarity_percentage = (1 - best_distance) * 100
+                self.suggestion_label.setText(f"✅ Similar to: {name} ({best_match}) - {similarity_percentage:.1f}% match")
+                return best_match
+
             self.suggestion_label.setText("❌ No similar registered faces found.")
             return None
-            
+
         except Exception as e:
             self.suggestion_label.setText(f"❌ Error suggesting similar face: {str(e)}")
             print(f"Error suggesting similar face: {e}")
@@ -229,23 +252,26 @@ class ReviewUnknownFacesWindow(QWidget):
         if not self.unknown_images:
             return
 
-        img_path = os.path.join(UNKNOWN_DIR, self.unknown_images[self.current_index])
+        filename = self.unknown_images[self.current_index]
+        members = self.image_info.get(filename, {}).get('members', [filename])
         reply = QMessageBox.question(self, "Confirm Deletion", 
-                                     f"Are you sure you want to delete this image?\n\n{img_path}",
+                                     f"Are you sure you want to delete all {len(members)} saved images of this person?"
+                                     if len(members) > 1 else
+                                     f"Are you sure you want to delete this image?\n\n{os.path.join(UNKNOWN_DIR, filename)}",
                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
-            os.remove(img_path)
-            print(f"🗑️ Deleted: {img_path}")
+            self.delete_files(members)
 
-            # Reload images after deletion
-            self.unknown_images = self.load_unknown_images()
+            # Drop it from the list; the rest of the queue is still valid
+            self.remove_current_image()
 
-            if not self.unknown_images:
-                self.image_label.setText("No unknown faces remaining.")
-                self.disable_buttons()
-            else:
-                self.current_index = self.current_index % len(self.unknown_images)
-                self.show_image(self.current_index)
+    def delete_files(self, filenames):
+        """Delete saved unknown face images that still exist."""
+        for member in filenames:
+            img_path = os.path.join(UNKNOWN_DIR, member)
+            if os.path.exists(img_path):
+                os.remove(img_path)
+                print(f"🗑️ Deleted: {img_path}")
 
     def mark_as_known(self):
         """Opens the MarkKnownWindow for marking an unknown face as a known student."""
@@ -259,20 +285,50 @@ class ReviewUnknownFacesWindow(QWidget):
                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
     
         if reply == QMessageBox.Yes:
+            # The other crops of this person are offered for deletion once they are registered
+            filename = self.unknown_images[self.current_index]
+            members = self.image_info.get(filename, {}).get('members', [filename])
+            self.known_cluster_members = [member for member in members if member != filename]
             self.mark_known_window = MarkKnownWindow(img_path, parent=self)
             self.mark_known_window.show()
 
-    def refresh_unknown_images(self):
-        """Reloads the unknown images after marking one as known."""
-        self.unknown_images = self.load_unknown_images()
+    def remove_current_image(self):
+        """Remove the current image from the review list."""
+        filename = self.unknown_images.pop(self.current_index)
+        self.image_info.pop(filename, None)
+        self.thumbnail_list.blockSignals(True)
+        self.thumbnail_list.takeItem(self.current_index)
+        self.thumbnail_list.blockSignals(False)
 
         if not self.unknown_images:
             self.image_label.setText("No unknown faces remaining.")
+            self.suggestion_label.setText("🔍 Possible match will appear here.")
+            self.cluster_label.setText("")
             self.disable_buttons()
         else:
             self.current_index = self.current_index % len(self.unknown_images)
             self.show_image(self.current_index)
 
+    def refresh_unknown_images(self):
+        """Reloads the unknown images after marking one as known."""
+        if self.known_cluster_members:
+            count = len(self.known_cluster_members)
+            reply = QMessageBox.question(self, "Delete Other Images",
+                                         f"This person has {count} other saved image{'s' if count > 1 else ''}.\n"
+                                         f"Delete {'them' if count > 1 else 'it'} now that the face is registered?",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply == QMessageBox.Yes:
+                self.delete_files(self.known_cluster_members)
+        self.known_cluster_members = []
+        self.current_index = 0
+        self.image_label.setText("⏳ Loading unknown faces...")
+        self.disable_buttons()
+        self.load_unknown_images()
+
+    def closeEvent(self, event):
+        self.stop_loader()
+        super().closeEvent(event)
+
 
     def open_registration_form(self, image_path):
         """Opens the student registration form with the image preloaded."""
@@ -286,3 +342,10 @@ class ReviewUnknownFacesWindow(QWidget):
         self.next_button.setEnabled(False)
         self.delete_button.setEnabled(False)
         self.mark_known_button.setEnabled(False)
+
+    def enable_buttons(self):
+        """Enable navigation and action buttons once images are available."""
+        self.prev_button.setEnabled(True)
+        self.next_button.setEnabled(True)
+        self.delete_button.setEnabled(True)
+        self.mark_known_button.setEnabled(True)
@@ -1,9 +1,11 @@
 import sqlite3
 from PyQt5.QtWidgets import (
     QMainWindow, QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout,
-    QCheckBox, QSpinBox, QTabWidget, QApplication, QFormLayout, QSlider, QMessageBox
+    QCheckBox, QSpinBox, QTabWidget, QApplication, QFormLayout, QSlider, QMessageBox,
+    QComboBox
 )
 from PyQt5.QtCore import Qt
+from admin.face_recognition_service import parse_detection_scale
 from config.utils_constants import DATABASE_PATH
 
 
@@ -119,11 +121,81 @@ class SettingsWindow(QMainWindow):
         self.required_matches_input.setObjectName("SettingsSpinBox")
         form_layout.addRow(QLabel("✅ Required Matches for Attendance:"), self.required_matches_input)
 
+        # ✅ Per-Student Match Scoring
+        self.match_reduction_combo = QComboBox()
+        self.match_reduction_combo.addItem("Best single encoding", "min")
+        self.match_reduction_combo.addItem("Mean of encodings", "mean")
+        self.match_reduction_combo.addItem("Trimmed mean of encodings", "trimmed_mean")
+        self.match_reduction_combo.setObjectName("SettingsComboBox")
+        form_layout.addRow(QLabel("🧮 Match Scoring:"), self.match_reduction_combo)
+
+        # ✅ High-Margin Fast Track
+        self.high_margin_threshold_input = QSpinBox()
+        self.high_margin_threshold_input.setRange(5, 100)
+        self.high_margin_threshold_input.setSuffix("%")
+        self.high_margin_threshold_input.setObjectName("SettingsSpinBox")
+        form_layout.addRow(QLabel("📏 High-Margin Threshold:"), self.high_margin_threshold_input)
+
+        self.high_margin_matches_input = QSpinBox()
+        self.high_margin_matches_input.setRange(1, 10)
+        self.high_margin_matches_input.setObjectName("SettingsSpinBox")
+        form_layout.addRow(QLabel("⚡ Required Matches (High Margin):"), self.high_margin_matches_input)
+
+        # ✅ Detection Scale
+        self.detection_scale_input = QSpinBox()
+        self.detection_scale_input.setRange(10, 100)
+        self.detection_scale_input.setSingleStep(5)
+        self.detection_scale_input.setSuffix("%")
+        self.detection_scale_input.setToolTip("Frames are resized to this scale for face detection; "
+                                              "encodings always use the full-resolution frame")
+        self.detection_scale_input.setObjectName("SettingsSpinBox")
+        form_layout.addRow(QLabel("🔎 Detection Scale:"), self.detection_scale_input)
+
+        # ✅ Face Quality Gate
+        self.quality_gate_checkbox = QCheckBox("🧪 Skip poor quality faces before recognition")
+        self.quality_gate_checkbox.setToolTip("Faces that are too small, blurry, badly lit or turned away "
+                                              "are not encoded or matched")
+        self.quality_gate_checkbox.setObjectName("SettingsCheckbox")
+        form_layout.addRow(QLabel("Quality Gate:"), self.quality_gate_checkbox)
+
+        self.min_sharpness_input = QSpinBox()
+        self.min_sharpness_input.setRange(0, 500)
+        self.min_sharpness_input.setSingleStep(10)
+        self.min_sharpness_input.setToolTip("Lowest sharpness (variance of the Laplacian) a face needs; "
+                                            "raise it to skip more motion blur")
+        self.min_sharpness_input.setObjectName("SettingsSpinBox")
+        form_layout.addRow(QLabel("🔬 Minimum Face Sharpness:"), self.min_sharpness_input)
+
+        # ✅ Tracking Mode
+        self.tracking_mode_checkbox = QCheckBox("🎯 Track faces between detections")
+        self.tracking_mode_checkbox.setObjectName("SettingsCheckbox")
+        form_layout.addRow(QLabel("Tracking Mode:"), self.tracking_mode_checkbox)
+
+        self.detect_interval_input = QSpinBox()
+        self.detect_interval_input.setRange(1, 60)
+        self.detect_interval_input.setSuffix(" frames")
+        self.detect_interval_input.setObjectName("SettingsSpinBox")
+        form_layout.addRow(QLabel("🔁 Full Detection Every:"), self.detect_interval_input)
+
+        self.tracker_type_combo = QComboBox()
+        self.tracker_type_combo.addItem("KCF (balanced)", "KCF")
+        self.tracker_type_combo.addItem("MOSSE (fastest)", "MOSSE")
+        self.tracker_type_combo.addItem("CSRT (most accurate)", "CSRT")
+        self.tracker_type_combo.addItem("Box overlap only", "IOU")
+        self.tracker_type_combo.setObjectName("SettingsComboBox")
+        form_layout.addRow(QLabel("🧭 Tracker:"), self.tracker_type_combo)
+
         # ✅ Save Unknown Faces Option
         self.save_unknown_faces_checkbox = QCheckBox("📸 Save Unknown Faces")
         self.save_unknown_faces_checkbox.setObjectName("SettingsCheckbox")
         form_layout.addRow(QLabel("Save Faces:"), self.save_unknown_faces_checkbox)
 
+        self.unknown_max_crops_input = QSpinBox()
+        self.unknown_max_crops_input.setRange(1, 50)
+        self.unknown_max_crops_input.setSuffix(" images")
+        self.unknown_max_crops_input.setObjectName("SettingsSpinBox")
+        form_layout.addRow(QLabel("👥 Max Images per Unknown Person:"), self.unknown_max_crops_input)
+
         layout.addLayout(form_layout)
 
         # ✅ Save & Reset Buttons
@@ -168,6 +240,18 @@ class SettingsWindow(QMainWindow):
         self.sensitivity_slider.setValue(int(settings.get("face_recognition_sensitivity", "50")))
         self.required_matches_input.setValue(int(settings.get("required_matches", "3")))
         self.save_unknown_faces_checkbox.setChecked(settings.get("save_unknown_faces", "0") == "1")
+        self.unknown_max_crops_input.setValue(int(settings.get("unknown_cluster_max_crops", "5")))
+        reduction_index = self.match_reduction_combo.findData(settings.get("match_reduction", "min"))
+        self.match_reduction_combo.setCurrentIndex(max(reduction_index, 0))
+        self.high_margin_threshold_input.setValue(int(settings.get("high_margin_threshold", "20")))
+        self.high_margin_matches_input.setValue(int(settings.get("high_margin_matches", "1")))
+        self.detection_scale_input.setValue(round(parse_detection_scale(settings.get("detection_scale", "100"))))
+        self.quality_gate_checkbox.setChecked(settings.get("quality_gate", "0") == "1")
+        self.min_sharpness_input.setValue(int(float(settings.get("min_face_sharpness", "50"))))
+        self.tracking_mode_checkbox.setChecked(settings.get("tracking_mode", "0") == "1")
+        self.detect_interval_input.setValue(int(settings.get("detect_interval", "10")))
+        tracker_index = self.tracker_type_combo.findData(settings.get("tracker_type", "KCF"))
+        self.tracker_type_combo.setCurrentIndex(max(tracker_index, 0))
 
     def save_settings(self):
         """Save updated settings to the database."""
@@ -182,6 +266,16 @@ class SettingsWindow(QMainWindow):
             "face_recognition_sensitivity": str(self.sensitivity_slider.value()),
             "required_matches": str(self.required_matches_input.value()),
             "save_unknown_faces": "1" if self.save_unknown_faces_checkbox.isChecked() else "0",
+            "unknown_cluster_max_crops": str(self.unknown_max_crops_input.value()),
+            "match_reduction": self.match_reduction_combo.currentData(),
+            "high_margin_threshold": str(self.high_margin_threshold_input.value()),
+            "high_margin_matches": str(self.high_margin_matches_input.value()),
+            "detection_scale": str(self.detection_scale_input.value()),
+            "quality_gate": "1" if self.quality_gate_checkbox.isChecked() else "0",
+            "min_face_sharpness": str(self.min_sharpness_input.value()),
+            "tracking_mode": "1" if self.tracking_mode_checkbox.isChecked() else "0",
+            "detect_interval": str(self.detect_interval_input.value()),
+            "tracker_type": self.tracker_type_combo.currentData(),
         }
 
         for key, value in settings.items():
@@ -1,17 +1,24 @@
+import os
 import sys
 import cv2
 import numpy as np
 import face_recognition
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QApplication, QLabel, 
                             QPushButton, QTableWidget, QTableWidgetItem, 
                             QProgressBar, QMessageBox, QComboBox, QHBoxLayout,
                             QHeaderView, QDialog, QTextEdit, QFileDialog)
-from PyQt5.QtCore import Qt, QTimer, QDate
+from PyQt5.QtCore import Qt, QTimer, QDate, pyqtSignal
  
 from PyQt5.QtPrintSupport import QPrinter
-from PyQt5.QtGui import QColor, QTextDocument
+from PyQt5.QtGui import QColor, QTextDocument, QPixmap
 
+from admin.attendance_pipeline import RecognitionWorker
+from admin.attendance_writer import AttendanceWriter
+from admin.face_tracker import FaceTracker
+from admin.gallery_cache import ClassGalleryCache
+from admin.face_quality import FaceQualityScorer
 from admin.face_recognition_service import FaceRecognitionService
 from admin.db_service import DatabaseService
 from admin.session_service import SessionService
@@ -19,10 +26,15 @@ from admin.view_attendance import ViewAttendanceWindow
 from config.utils_constants import *
 
 class StartAttendanceWindow(QWidget):
+    # Emitted from the attendance writer thread: student_id, newly marked, error message
+    attendance_saved = pyqtSignal(str, bool, str)
+    # Emitted from the unknown face saver thread: path of the saved image
+    unknown_face_saved = pyqtSignal(str)
+    
     def __init__(self):
         super().__init__()
         self.setWindowTitle("📡 Start Attendance")
-        self.setGeometry(300, 200, 800, 600)
+        self.setGeometry(300, 100, 800, 860)
         self.setObjectName("StartAttendanceWindow")
         self.setStyleSheet(QApplication.instance().styleSheet())
 
@@ -31,6 +43,7 @@ class StartAttendanceWindow(QWidget):
         self.session_service = SessionService(self.db_service)
         self.settings = self.db_service.load_settings()
         self.face_service = FaceRecognitionService(self.settings, self.db_service)
+        self.gallery_cache = ClassGalleryCache(self.db_service, self.face_service)
         
         # Session tracking variables
         self.current_session = None
@@ -38,6 +51,12 @@ class StartAttendanceWindow(QWidget):
         self.class_id = None
         self.attendance_running = False
         self.last_unknown_save_time = 0
+        self.recognition_worker = None
+        self.attendance_writer = None
+        self.unknown_face_saver = None
+        self.session_quality = None
+        self.attendance_saved.connect(self.on_attendance_saved)
+        self.unknown_face_saved.connect(self.on_unknown_face_saved)
         
         # Setup UI
         self.init_ui()
@@ -48,6 +67,7 @@ class StartAttendanceWindow(QWidget):
         # Track recognized students
         self.recognized_students = {}
         self.match_counter = {}
+        self.marked_students = set()
         self.unknown_counter = 0
         self.expected_students = []
         self.cap = None
@@ -85,6 +105,21 @@ class StartAttendanceWindow(QWidget):
         self.progress_bar.setStyleSheet("QProgressBar {border: 1px solid grey; border-radius: 2px; text-align: center;} QProgressBar::chunk {background-color: #3add36; width: 1px;}")
         layout.addWidget(self.progress_bar)
         
+        # Live camera feed
+        self.video_label = QLabel("Camera feed will appear here", self)
+        self.video_label.setAlignment(Qt.AlignCenter)
+        self.video_label.setMinimumSize(640, 360)
+        self.video_label.setStyleSheet("border: 1px solid #ccc; background-color: #000; color: #aaa;")
+        layout.addWidget(self.video_label)
+        
+        self.pipeline_stats_label = QLabel("", self)
+        self.pipeline_stats_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.pipeline_stats_label)
+        
+        self.detection_speed_label = QLabel("", self)
+        self.detection_speed_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.detection_speed_label)
+        
         # Attendance table
         table_header = QLabel("Expected Students:", self)
         table_header.setStyleSheet("font-size: 12pt; font-weight: bold; margin-top: 10px;")
@@ -124,6 +159,10 @@ class StartAttendanceWindow(QWidget):
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_progress)
         
+        # Timer for picking up new registrations during a session
+        self.gallery_refresh_timer = QTimer(self)
+        self.gallery_refresh_timer.timeout.connect(self.refresh_known_faces)
+        
         # Load today's sessions
         self.load_today_sessions()
         
@@ -282,8 +321,8 @@ class StartAttendanceWindow(QWidget):
         # Clear existing table
         self.attendance_table.setRowCount(0)
         
-        # Get students for this session using the improved method
-        self.expected_students = self.db_service.get_session_students(self.session_id)
+        # Get students for this session's class; the cached shard also warms its gallery
+        self.expected_students, _ = self.gallery_cache.get(self.class_id)
         
         # If no students found, try the fallback approach
         if not self.expected_students:
@@ -356,16 +395,26 @@ class StartAttendanceWindow(QWidget):
             self.attendance_table.setItem(row, 2, status_item)
 
     def refresh_known_faces(self):
-        """Reload known faces from the face recognition service"""
-        self.known_faces, self.student_ids = self.face_service.load_known_faces()
+        """Pick up new or changed encodings from the face recognition service"""
+        self.known_faces, self.student_ids = self.face_service.refresh_known_faces()
         
         # Store the original IDs with underscores (for file operations)
-        self.student_ids_original = self.student_ids.copy()
+        self.student_ids_original = list(self.face_service.original_ids)
         
         # Normalize student IDs to match database format (replacing underscores with slashes)
         self.student_ids = [sid.replace('_', '/') for sid in self.student_ids]
         
-        print(f"✅ Loaded {len(self.known_faces)} known faces")
+        changed = self.face_service.last_refresh_changes
+        if changed:
+            print(f"✅ Updated encodings for {len(changed)} students ({len(self.known_faces)} known faces)")
+        
+        # Students registered mid-lecture become recognizable without restarting the session
+        if (self.attendance_running and self.recognition_worker and
+                set(changed).intersection(self.class_student_ids)):
+            self.class_gallery = self.face_service.gallery.subset(self.class_student_ids)
+            self.db_service.preload_student_names(changed)
+            self.recognition_worker.set_gallery(self.class_gallery)
+            print(f"✅ Class gallery updated: {self.class_gallery.student_count} students")
 
     def start_attendance(self):
         """Start the attendance process"""
@@ -391,7 +440,11 @@ class StartAttendanceWindow(QWidget):
             return
             
         # Make sure we have expected students loaded
-        self.load_expected_students()     
+        self.load_expected_students()
+        
+        # Pick up any students registered since the window opened
+        self.refresh_known_faces()
+        
         # Get student IDs for this class only
         self.class_student_ids = [s['student_id'] for s in self.expected_students]
         print("Class student IDs:")
@@ -417,19 +470,16 @@ class StartAttendanceWindow(QWidget):
                             "No students in this class have registered face data.\nAsk students to register their faces first.")
             return
             
-        # Filter known faces to only include students in this class
-        self.class_known_faces = []
-        self.class_student_ids_for_recognition = []
-        
-        for face, student_id in zip(self.known_faces, self.student_ids):
-            if student_id in self.class_student_ids:
-                self.class_known_faces.append(face)
-                self.class_student_ids_for_recognition.append(student_id)
+        # Restrict the gallery to students in this class (cached per class across sessions)
+        self.class_gallery = self.gallery_cache.get_gallery(self.class_id, self.class_student_ids)
         
-        if not self.class_known_faces:
+        if len(self.class_gallery) == 0:
             QMessageBox.warning(self, "No Registered Faces", "No students in this class have registered face data")
             return
         
+        # Resolve every expected student's name up front so recognition never queries the database
+        self.db_service.preload_student_names(self.class_student_ids)
+        
         # Show loading status
         self.status_label.setText("🔄 Initializing camera...")
         self.progress_bar.setValue(10)
@@ -465,11 +515,24 @@ class StartAttendanceWindow(QWidget):
         
         # Initialize tracking variables
         self.match_counter = {}  # Track repeated matches for known faces
+        self.marked_students = set()  # Students already marked during this run
         self.unknown_counter = 0  # Track repeated unknown face appearances
         self.attendance_running = True
         
+        # Attendance is written in the background so bursts never stall recognition
+        self.attendance_writer = AttendanceWriter(self.db_service)
+        self.attendance_writer.start()
+        
+        # Unknown faces are checked for duplicates and saved off the GUI thread as well
+        self.unknown_face_saver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="unknown-faces")
+        
         # Start the recognition loop
         self.run_face_recognition()
+        
+        # Periodically look for newly registered students
+        refresh_seconds = int(self.settings.get("gallery_refresh_interval", "30"))
+        if refresh_seconds > 0:
+            self.gallery_refresh_timer.start(refresh_seconds * 1000)
 
     def is_session_eligible_for_attendance(self):
         """Check if the selected session is eligible for attendance tracking"""
@@ -492,108 +555,196 @@ class StartAttendanceWindow(QWidget):
         return False
 
     def run_face_recognition(self):
-        """Run the face recognition process in a loop"""
-        required_matches = int(self.settings.get("required_matches", "3"))
-        
-        while self.attendance_running:
-            ret, frame = self.cap.read()
-            if not ret:
-                break
-
-            # Check light conditions
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            avg_brightness = gray.mean()
-
-            if avg_brightness < 20:  # Too dark
-                cv2.putText(frame, "Low light detected", (10, 30), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
-                cv2.imshow("Attendance System", frame)
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
-                continue
-
-            # Detect faces
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            face_locations = face_recognition.face_locations(rgb_frame, model="hog")
+        """Start the threaded recognition pipeline; results arrive through signals"""
+        self.required_matches = int(self.settings.get("required_matches", "3"))
+        self.high_margin_threshold = float(self.settings.get("high_margin_threshold", "20")) / 100
+        self.high_margin_matches = min(int(self.settings.get("high_margin_matches", "1")), self.required_matches)
+        tolerance = float(self.settings.get("face_recognition_sensitivity", "50")) / 100
+        workers = int(self.settings.get("pipeline_workers", "0")) or None
+        self.session_quality = None
+        
+        # Tracking mode: detect every N frames and carry identities in between
+        tracker = None
+        if self.settings.get("tracking_mode", "0") == "1":
+            tracker = FaceTracker(
+                detect_interval=int(self.settings.get("detect_interval", "10")),
+                tracker_type=self.settings.get("tracker_type", "KCF"),
+                required_votes=self.required_matches
+            )
+        
+        self.recognition_worker = RecognitionWorker(
+            self.cap,
+            self.face_service,
+            self.class_gallery,
+            tolerance,
+            workers=workers,
+            tracker=tracker,
+            parent=self
+        )
+        self.recognition_worker.frame_ready.connect(self.display_frame)
+        self.recognition_worker.faces_processed.connect(self.handle_recognition_results)
+        self.recognition_worker.stats_updated.connect(self.update_pipeline_stats)
+        self.recognition_worker.capture_stopped.connect(self.on_capture_stopped)
+        self.recognition_worker.detection_calibrated.connect(self.show_detection_speedup)
+        self.recognition_worker.start()
 
-            if not face_locations:
-                cv2.putText(frame, "No face detected", (10, 30), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
-                self.unknown_counter = 0  # Reset counter
-                cv2.imshow("Attendance System", frame)
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
+    def handle_recognition_results(self, frame, results):
+        """Update match counters and attendance for one processed frame (GUI thread)"""
+        if not self.attendance_running:
+            return
+        
+        if not results:
+            self.unknown_counter = 0  # Reset counter
+            return
+        
+        for result in results:
+            # Identities carried forward by the tracker are not new evidence
+            if not result.get('fresh', True):
                 continue
-
-            # Get face encodings
-            face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-
-            # Process each detected face
-            for face_encoding, face_location in zip(face_encodings, face_locations):
-                # Compare with class-specific known faces
-                student_id, name, is_known = self.face_service.recognize_face(
-                    face_encoding, 
-                    self.class_known_faces,
-                    self.class_student_ids_for_recognition,
-                    float(self.settings.get("face_recognition_sensitivity", "50")) / 100
-                )
+            
+            if result['is_known']:
+                # Convert to database format (with slashes) for database operations
+                normalized_student_id = result['student_id'].replace('_', '/')
                 
-                if is_known:
-                    # Original ID format from face recognition (with underscores)
-                    original_student_id = student_id
-                    
-                    # Convert to database format (with slashes) for database operations
-                    normalized_student_id = original_student_id.replace('_', '/')
-                    
-                    # Count repeated recognitions using database format
-                    self.match_counter[normalized_student_id] = self.match_counter.get(normalized_student_id, 0) + 1
-                    
-                    # Mark attendance after required matches
-                    if self.match_counter[normalized_student_id] == required_matches:
-                        if self.db_service.mark_attendance(normalized_student_id, self.session_id):
-                            self.update_student_status(normalized_student_id, "Present")
+                # Count repeated recognitions using database format
+                self.match_counter[normalized_student_id] = self.match_counter.get(normalized_student_id, 0) + 1
+                
+                # Unambiguous matches (large gap to the runner-up) need fewer frames
+                if result['margin'] >= self.high_margin_threshold:
+                    needed = self.high_margin_matches
                 else:
-                    # Handle unknown face - this is someone not enrolled in this class
-                    self.unknown_counter += 1
-                    
-                    # Save unknown face if enabled and seen multiple times
-                    if (self.settings.get("save_unknown_faces", "1") == "1" and 
-                        self.unknown_counter >= required_matches):
-                        current_time = datetime.now().timestamp()
-                        # Only save once every 10 seconds to avoid too many files
-                        if current_time - self.last_unknown_save_time > 10:
-                            self.face_service.save_unknown_face(
-                                frame, 
-                                face_location,
-                                self.settings
-                            )
-                            self.last_unknown_save_time = current_time
-                        self.unknown_counter = 0  # Reset counter
-
-                # Draw face box
-                top, right, bottom, left = face_location
-                color = (0, 255, 0) if is_known else (0, 0, 255)
-                cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+                    needed = self.required_matches
                 
-                # Display name
-                label = f"{name} ({student_id})" if is_known else "Unknown Person"
-                cv2.putText(frame, label, (left, top - 10), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-
-            # Display the frame
-            cv2.imshow("Attendance System", frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+                # Mark attendance after required matches
+                if (self.match_counter[normalized_student_id] >= needed and 
+                    normalized_student_id not in self.marked_students):
+                    self.marked_students.add(normalized_student_id)
+                    self.queue_attendance_mark(normalized_student_id)
+            else:
+                # Handle unknown face - this is someone not enrolled in this class
+                self.unknown_counter += 1
                 
-            # Process UI events
-            QApplication.processEvents()
+                # Save unknown face if enabled and seen multiple times
+                if (self.settings.get("save_unknown_faces", "1") == "1" and 
+                    self.unknown_counter >= self.required_matches):
+                    current_time = datetime.now().timestamp()
+                    # Only save once every 10 seconds to avoid too many files
+                    if current_time - self.last_unknown_save_time > 10:
+                        self.queue_unknown_face(frame, result['face_location'], result.get('encoding'))
+                        self.last_unknown_save_time = current_time
+                    self.unknown_counter = 0  # Reset counter
 
-        # Cleanup
-        if self.cap and self.cap.isOpened():
-            self.cap.release()
-        cv2.destroyAllWindows()
+    def queue_attendance_mark(self, student_id):
+        """Hand a mark to the background writer; the table updates once it is saved"""
+        future = self.attendance_writer.submit(student_id, self.session_id)
+        
+        def report(done):
+            error = done.exception()
+            if error is not None:
+                self.attendance_saved.emit(student_id, False, str(error))
+            else:
+                self.attendance_saved.emit(student_id, done.result(), "")
+        
+        future.add_done_callback(report)
+
+    def queue_unknown_face(self, frame, face_location, face_encoding):
+        """Hand an unknown face to the saver thread; the status updates once it is saved"""
+        if self.unknown_face_saver is None:
+            return
+        future = self.unknown_face_saver.submit(
+            self.face_service.save_unknown_face, frame, face_location, face_encoding)
+        
+        def report(done):
+            if done.cancelled() or done.exception() is not None:
+                return
+            if done.result():
+                self.unknown_face_saved.emit(done.result())
+        
+        future.add_done_callback(report)
+
+    def on_unknown_face_saved(self, file_path):
+        """Tell the operator an unknown face was stored for review (GUI thread)"""
+        if self.attendance_running:
+            self.status_label.setText(f"📸 Unknown face saved for review: {os.path.basename(file_path)}")
 
+    def stop_unknown_face_saver(self):
+        """Finish the unknown face being saved and drop any still queued"""
+        if self.unknown_face_saver:
+            self.unknown_face_saver.shutdown(wait=True, cancel_futures=True)
+            self.unknown_face_saver = None
 
+    def on_attendance_saved(self, student_id, newly_marked, error):
+        """Reflect a completed attendance write in the table (GUI thread)"""
+        if error:
+            print(f"❌ {error}")
+            # Allow the student to be marked again on the next recognition
+            self.marked_students.discard(student_id)
+            self.match_counter[student_id] = 0
+            return
+        if newly_marked:
+            self.update_student_status(student_id, "Present")
+
+    def stop_attendance_writer(self):
+        """Write every pending mark durably and stop the writer thread"""
+        if self.attendance_writer:
+            self.attendance_writer.stop()
+            self.attendance_writer = None
+
+    def display_frame(self, image):
+        """Show an annotated frame from the recognition pipeline"""
+        pixmap = QPixmap.fromImage(image)
+        self.video_label.setPixmap(pixmap.scaled(
+            self.video_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation
+        ))
+
+    def update_pipeline_stats(self, stats):
+        """Show pipeline throughput under the camera feed"""
+        self.pipeline_stats_label.setText(
+            f"⚡ {stats['fps']:.1f} FPS | {stats['detections_per_second']:.1f} detections/s | "
+            f"latency {stats['latency'] * 1000:.0f} ms | "
+            f"{stats['workers']} workers | {stats['dropped_frames']} frames skipped"
+            + self.format_quality_stats(stats.get('quality'))
+        )
+
+    @staticmethod
+    def format_quality_stats(quality):
+        """Short quality gate summary for the stats line"""
+        if not quality or not quality['checked']:
+            return ""
+        text = f" | 🧪 {quality['rejected']}/{quality['checked']} faces skipped"
+        if quality['reasons']:
+            reason, count = max(quality['reasons'].items(), key=lambda item: item[1])
+            text += f" (mostly {FaceQualityScorer.REASON_LABELS[reason].lower()})"
+        return text
+
+    def show_detection_speedup(self, calibration):
+        """Report how much faster detection runs on the downscaled frame"""
+        self.detection_speed_label.setText(
+            f"🔎 Detecting at {calibration['scale'] * 100:.0f}% scale: "
+            f"{calibration['full_fps']:.1f} → {calibration['scaled_fps']:.1f} detections/s "
+            f"({calibration['speedup']:.1f}x faster)"
+        )
+
+    def on_capture_stopped(self):
+        """Handle the camera closing unexpectedly during a session"""
+        if self.attendance_running:
+            QMessageBox.warning(self, "Camera Error", "The camera stopped delivering frames")
+            self.stop_attendance()
+
+    def stop_recognition_worker(self):
+        """Stop the recognition pipeline and wait for it to release the camera"""
+        if self.recognition_worker:
+            self.recognition_worker.stop()
+            self.recognition_worker.wait()
+            # Final quality gate totals for the session summary
+            self.session_quality = self.recognition_worker.quality_stats.as_dict()
+            self.recognition_worker = None
+
+    def closeEvent(self, event):
+        """Make sure the camera and workers are released when the window closes"""
+        if self.attendance_running:
+            self.stop_attendance()
+        super().closeEvent(event)
 
     def stop_attendance(self):
         """Stop the attendance process"""
@@ -606,11 +757,20 @@ class StartAttendanceWindow(QWidget):
         self.session_combo.setEnabled(True)
         self.refresh_button.setEnabled(True)
         self.timer.stop()
+        self.gallery_refresh_timer.stop()
         
         # Release resources
+        self.stop_recognition_worker()
         if self.cap and self.cap.isOpened():
             self.cap.release()
-        cv2.destroyAllWindows()
+        
+        # Pending marks must be on disk before the summary reads them back
+        self.stop_attendance_writer()
+        self.stop_unknown_face_saver()
+        QApplication.processEvents()  # Deliver the final table updates
+        self.video_label.clear()
+        self.video_label.setText("Camera feed will appear here")
+        self.detection_speed_label.clear()
         
         # Update session end time
         if self.session_id:
@@ -658,6 +818,19 @@ class StartAttendanceWindow(QWidget):
         summary += f"<p><b>Students Present:</b> {present_count} / {total_students} ({attendance_percentage}%)<br>"
         summary += f"<b>Students Absent:</b> {absent_count}</p>"
         
+        # Add face quality gate statistics
+        quality = self.session_quality
+        if quality and quality['checked']:
+            rejected_percentage = int(quality['rejected']/quality['checked']*100)
+            summary += f"<h3>Face Quality</h3>"
+            summary += f"<p><b>Faces Checked:</b> {quality['checked']}<br>"
+            summary += f"<b>Skipped Before Recognition:</b> {quality['rejected']} ({rejected_percentage}%)</p>"
+            if quality['reasons']:
+                summary += "<ul>"
+                for reason, count in sorted(quality['reasons'].items(), key=lambda item: -item[1]):
+                    summary += f"<li>{FaceQualityScorer.REASON_LABELS[reason]}: {count}</li>"
+                summary += "</ul>"
+        
         # Add present students list
         summary += f"<h3>Present Students ({present_count})</h3>"
         if present_students_names:
@@ -1,28 +1,34 @@
 import os
 import sqlite3
 import pickle
-import face_recognition
-import numpy as np
 from typing import List, Optional
 
+from admin.encoding_store import EncodingStore
+from admin.face_augmentation import FaceAugmenter
+
 class StudentEncodingMigrator:
     """
     Helps migrate existing student records to the new encoding storage system
     """
     ENCODING_DIR = "student_encodings"
     
-    def __init__(self, db_path="attendance.db"):
+    def __init__(self, db_path="attendance.db", use_store=True):
         """
         Initialize migration process
         
         Args:
             db_path (str): Path to the SQLite database
+            use_store (bool): Save encodings to the binary encoding store
+                              instead of per-student pickle files
         """
         # Ensure encoding directory exists
         if not os.path.exists(self.ENCODING_DIR):
             os.makedirs(self.ENCODING_DIR)
         
         self.db_path = db_path
+        self.use_store = use_store
+        self.encoding_store = EncodingStore(self.ENCODING_DIR)
+        self.augmenter = FaceAugmenter(os.path.join(self.ENCODING_DIR, "augmentation_cache"))
         self._prepare_database()
     
     def _prepare_database(self):
@@ -64,6 +70,9 @@ class StudentEncodingMigrator:
         """
         Generate augmented face encodings for a given image
         
+        Uses the shared FaceAugmenter, so images already encoded by a previous
+        migration, registration or bulk import come straight from its cache.
+        
         Args:
             image_path (str): Path to the student's image
         
@@ -71,74 +80,54 @@ class StudentEncodingMigrator:
             List of face encodings or None if no face detected
         """
         try:
-            # Load image
-            image = face_recognition.load_image_file(image_path)
-            
-            # Detect faces
-            face_locations = face_recognition.face_locations(image)
+            result = self.augmenter.encode_file(image_path)
             
             # No faces detected
-            if not face_locations:
+            if not result['face_locations']:
                 print(f"❌ No face detected in image: {image_path}")
                 return None
             
             # Multiple faces detected
-            if len(face_locations) > 1:
+            if len(result['face_locations']) > 1:
                 print(f"⚠️ Multiple faces detected in image: {image_path}")
                 return None
             
-            # Generate encodings with augmentations
-            augmented_encodings = []
-            
-            # Original encoding
-            original_encodings = face_recognition.face_encodings(image, face_locations)
-            if not original_encodings:
+            if len(result['encodings']) == 0:
                 print(f"❌ Could not generate encoding for: {image_path}")
                 return None
             
-            augmented_encodings.append(original_encodings[0])
-            
-            # Simplified augmentation techniques
-            augmentations = [
-                # Slightly darker
-                lambda img: np.clip(img * 0.9, 0, 255).astype(np.uint8),
-                # Slightly brighter
-                lambda img: np.clip(img * 1.1, 0, 255).astype(np.uint8)
-            ]
-            
-            for augment in augmentations:
-                try:
-                    # Apply augmentation
-                    aug_image = augment(image)
-                    
-                    # Generate encoding with locations
-                    aug_encodings = face_recognition.face_encodings(aug_image, face_locations)
-                    
-                    if aug_encodings:
-                        augmented_encodings.append(aug_encodings[0])
-                except Exception as e:
-                    print(f"⚠️ Augmentation error: {e}")
-            
-            return augmented_encodings
+            return list(result['encodings'])
         
         except Exception as e:
             print(f"❌ Error processing image {image_path}: {e}")
             return None
     
     def save_student_encodings(self, student_id: str, encodings: List[List[float]]) -> bool:
+        """
+        Save a student's encodings and update the database record
         
+        Args:
+            student_id (str): Student ID in database format
+            encodings: Face encodings to store
         
+        Returns:
+            bool: True if saved successfully
+        """
         try:
-            # Sanitize student ID for filename
-            sanitized_id = student_id.replace('/', '_')
-            encoding_path = os.path.join(
-                self.ENCODING_DIR, 
-                f"student_{sanitized_id}_encodings.pkl"
-            )
-            
-            # Save encodings to pickle file
-            with open(encoding_path, 'wb') as f:
-                pickle.dump(encodings, f)
+            if self.use_store:
+                self.encoding_store.append(student_id, encodings)
+                encoding_path = None
+            else:
+                # Sanitize student ID for filename
+                sanitized_id = student_id.replace('/', '_')
+                encoding_path = os.path.join(
+                    self.ENCODING_DIR, 
+                    f"student_{sanitized_id}_encodings.pkl"
+                )
+                
+                # Save encodings to pickle file
+                with open(encoding_path, 'wb') as f:
+                    pickle.dump(encodings, f)
             
             # Convert to blob for database storage
             encoding_blob = pickle.dumps(encodings)
@@ -161,6 +150,98 @@ class StudentEncodingMigrator:
             print(f"❌ Error saving encodings for student {student_id}: {e}")
             return False
     
+    def migrate_to_store(self, remove_legacy: bool = False, dry_run: bool = False) -> dict:
+        """
+        Move existing encodings into the binary encoding store without re-encoding
+        
+        Reads every legacy student_<id>_encodings.pkl file, plus database BLOBs
+        of students that have no file, and appends them to the store in one write.
+        
+        Args:
+            remove_legacy (bool): Delete the pickle files once they are in the store
+            dry_run (bool): If True, only report what would be migrated
+        
+        Returns:
+            dict: Migration statistics
+        """
+        stats = {
+            "legacy_files": 0,
+            "database_only": 0,
+            "already_in_store": 0,
+            "migrated_successfully": 0,
+            "migration_failed": 0
+        }
+        
+        stored = set(self.encoding_store.read_index())
+        pending = {}
+        legacy_paths = {}
+        
+        # Legacy per-student pickle files
+        for encoding_file in os.listdir(self.ENCODING_DIR):
+            if not encoding_file.endswith('_encodings.pkl'):
+                continue
+            student_id = encoding_file.replace('student_', '').replace('_encodings.pkl', '').replace('_', '/')
+            file_path = os.path.join(self.ENCODING_DIR, encoding_file)
+            stats["legacy_files"] += 1
+            legacy_paths[student_id] = file_path
+            if student_id in stored:
+                stats["already_in_store"] += 1
+                continue
+            try:
+                with open(file_path, 'rb') as f:
+                    pending[student_id] = pickle.load(f)
+            except Exception as e:
+                print(f"❌ Error reading {file_path}: {e}")
+                legacy_paths.pop(student_id)  # Keep unreadable files for inspection
+                stats["migration_failed"] += 1
+        
+        # Students whose encodings only exist as a database BLOB
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute("SELECT student_id, face_encoding FROM students WHERE face_encoding IS NOT NULL")
+            for student_id, encoding_blob in cursor.fetchall():
+                if student_id in stored or student_id in pending or student_id in legacy_paths:
+                    continue
+                try:
+                    pending[student_id] = pickle.loads(encoding_blob)
+                    stats["database_only"] += 1
+                except Exception as e:
+                    print(f"❌ Error reading stored encodings for {student_id}: {e}")
+                    stats["migration_failed"] += 1
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not read database encodings: {e}")
+        
+        if dry_run:
+            for student_id in pending:
+                print(f"Would move encodings for student {student_id} into the store")
+            stats["migrated_successfully"] = len(pending)
+            return stats
+        
+        try:
+            self.encoding_store.append_many(pending.items())
+            stats["migrated_successfully"] = len(pending)
+        except Exception as e:
+            print(f"❌ Error writing to the encoding store: {e}")
+            stats["migration_failed"] += len(pending)
+            return stats
+        
+        if remove_legacy:
+            for student_id, file_path in legacy_paths.items():
+                try:
+                    os.remove(file_path)
+                except OSError as e:
+                    print(f"⚠️ Could not remove {file_path}: {e}")
+            
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("UPDATE students SET face_encoding_path = NULL WHERE face_encoding_path LIKE '%_encodings.pkl'")
+            conn.commit()
+            conn.close()
+        
+        print(f"✅ Moved encodings for {stats['migrated_successfully']} students into {self.encoding_store.data_path}")
+        return stats
+    
     def migrate_all_students(self, dry_run: bool = False) -> dict:
         """
         Migrate all existing students to new encoding system
@@ -255,6 +336,14 @@ def run_migration():
         migrator.print_migration_report(migration_stats)
     else:
         print("Migration cancelled.")
+        return
+    
+    # Move any remaining pickle files into the binary encoding store
+    store_stats = migrator.migrate_to_store(dry_run=True)
+    if store_stats["migrated_successfully"]:
+        confirm = input(f"\nMove {store_stats['migrated_successfully']} legacy encoding sets into the encoding store? (yes/no): ")
+        if confirm.lower() in ['yes', 'y']:
+            migrator.migrate_to_store(remove_legacy=True)
 
 # Run the migration
 if __name__ == "__main__":
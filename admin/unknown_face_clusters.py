@@ -0,0 +1,292 @@
+import os
+import json
+import threading
+import numpy as np
+
+from admin.hash_index import HashIndex, hamming_distances
+from admin.unknown_face_index import UnknownFaceIndex
+
+
+class _UnionFind:
+    """Disjoint sets over row numbers"""
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def crop_quality(image_path):
+    """
+    Quality of a saved face crop, used to pick cluster representatives
+
+    Sharpness (variance of the Laplacian) weighted by size, so a large sharp
+    crop beats a small or blurred one.
+
+    Returns:
+        float: Quality score, 0.0 if the image cannot be read
+    """
+    import cv2
+
+    image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return 0.0
+    sharpness = float(cv2.Laplacian(image, cv2.CV_64F).var())
+    size_factor = min(1.0, min(image.shape[:2]) / 150.0)
+    return sharpness * size_factor
+
+
+class UnknownFaceClusters:
+    """
+    Groups saved unknown faces by identity.
+
+    Crops are linked when their face encodings are within `eps` of each other
+    or their perceptual hashes are within `hash_radius` bits, and clusters are
+    the connected components of those links (single linkage, kept in a
+    union-find). A newly saved crop is placed with add(), which compares it
+    once against the index; update() links crops that appeared on disk
+    against the existing ones and, when crops were removed, relinks only the
+    members of the clusters they belonged to, since only those can split.
+    Each cluster is represented by its best-quality crop.
+
+    Assignments and crop qualities are persisted in clusters.json next to the
+    images, so the work is not repeated across runs.
+    """
+    STATE_FILE = "clusters.json"
+    CHUNK_ROWS = 1024
+
+    def __init__(self, directory="unknown_faces", eps=0.5, hash_radius=6, index=None):
+        """
+        Initialize the clustering
+
+        Args:
+            directory (str): Directory holding the unknown face images
+            eps (float): Face distance that links two crops
+            hash_radius (int): phash bit difference that links two crops
+            index (UnknownFaceIndex): Index to cluster; created if not given
+        """
+        self.directory = directory
+        self.eps = eps
+        self.hash_radius = hash_radius
+        self.index = index if index is not None else UnknownFaceIndex(directory)
+        self.state_path = os.path.join(directory, self.STATE_FILE)
+        self._lock = threading.Lock()
+
+        # filename -> root filename of its cluster, and filename -> crop quality
+        self._roots = {}
+        self._quality = {}
+        self._clusters = []
+        self._load()
+
+    def __len__(self):
+        return len(self._clusters)
+
+    def _load(self):
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self._roots = state.get('roots', {})
+            self._quality = state.get('quality', {})
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Reclustering unknown faces, state unreadable: {e}")
+
+    def _save(self):
+        tmp_path = self.state_path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'roots': self._roots, 'quality': self._quality}, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            print(f"⚠️ Could not save unknown face clusters: {e}")
+
+    def _link(self, union_find, rows, filenames, encodings, phashes, hash_index):
+        """Union every row in `rows` with all rows it is close to"""
+        valid = ~np.isnan(encodings[:, 0])
+        sq_norms = np.einsum('ij,ij->i', np.nan_to_num(encodings), np.nan_to_num(encodings))
+
+        for start in range(0, len(rows), self.CHUNK_ROWS):
+            chunk = np.asarray(rows[start:start + self.CHUNK_ROWS])
+            chunk = chunk[valid[chunk]]
+            if len(chunk):
+                probes = encodings[chunk]
+                sq = sq_norms[chunk][:, None] + sq_norms[None, :] - 2.0 * (probes @ np.nan_to_num(encodings).T)
+                close = (sq <= self.eps * self.eps) & valid[None, :]
+                for i, j in zip(*np.nonzero(close)):
+                    union_find.union(int(chunk[i]), int(j))
+
+        rows_by_name = {name: row for row, name in enumerate(filenames)}
+        for row in rows:
+            for name, _ in hash_index.query(int(phashes[row]), self.hash_radius):
+                union_find.union(int(row), rows_by_name[name])
+
+    def _relink(self, union_find, rows, filenames, encodings, phashes):
+        """Link `rows` only among themselves and carry the result into union_find"""
+        local = _UnionFind(len(rows))
+        names = [filenames[row] for row in rows]
+        hash_index = HashIndex.from_items(zip(names, phashes[rows].tolist()))
+        self._link(local, list(range(len(rows))), names, encodings[rows], phashes[rows], hash_index)
+        for i, row in enumerate(rows):
+            union_find.union(row, rows[local.find(i)])
+
+    def update(self):
+        """
+        Bring the clusters up to date with the unknown face folder
+
+        Returns:
+            list: Clusters, largest first; each a dict with 'id',
+                  'representative', 'members' (best first) and 'size'
+        """
+        self.index.sync()
+        with self._lock:
+            filenames, hashes, encodings = self.index.snapshot()
+            phashes = hashes[:, 0]
+
+            current = set(filenames)
+            known = set(self._roots)
+            removed = known - current
+            new_rows = [row for row, name in enumerate(filenames) if name not in self._roots]
+
+            # A root that is not a known crop means the saved state is inconsistent: start over
+            full = any(root not in known for root in self._roots.values())
+            if not full and not removed and not new_rows and self._clusters:
+                return self._clusters
+
+            rows_by_name = {name: row for row, name in enumerate(filenames)}
+            union_find = _UnionFind(len(filenames))
+
+            if full:
+                hash_index = HashIndex.from_items(zip(filenames, phashes.tolist()))
+                self._link(union_find, list(range(len(filenames))), filenames, encodings, phashes, hash_index)
+            else:
+                # Removing crops can split only the clusters they were in
+                split_roots = {self._roots[name] for name in removed}
+                split_rows = []
+                for name in known - removed:
+                    if self._roots[name] in split_roots:
+                        split_rows.append(rows_by_name[name])
+                    else:
+                        union_find.union(rows_by_name[name], rows_by_name[self._roots[name]])
+                if split_rows:
+                    self._relink(union_find, split_rows, filenames, encodings, phashes)
+                if new_rows:
+                    hash_index = HashIndex.from_items(zip(filenames, phashes.tolist()))
+                    self._link(union_find, new_rows, filenames, encodings, phashes, hash_index)
+
+            for name in removed:
+                self._quality.pop(name, None)
+            for row in new_rows:
+                name = filenames[row]
+                if name not in self._quality:
+                    self._quality[name] = crop_quality(os.path.join(self.directory, name))
+
+            self._roots = {name: filenames[union_find.find(row)] for row, name in enumerate(filenames)}
+            self._clusters = self._build_clusters()
+            self._save()
+
+            if full or new_rows:
+                print(f"✅ Grouped {len(filenames)} unknown faces into {len(self._clusters)} clusters")
+            return self._clusters
+
+    def add(self, filename, encoding, phash):
+        """
+        Place a newly saved crop without a clustering pass
+
+        The crop must already be in the index. It joins (and merges) every
+        cluster holding a crop within eps or hash_radius of it.
+
+        Args:
+            filename (str): Image file name inside the directory
+            encoding: 128-d face encoding, or None
+            phash (int): Perceptual hash of the crop
+
+        Returns:
+            dict: The cluster the crop ended up in
+        """
+        filenames, hashes, encodings = self.index.snapshot()
+        close = hamming_distances(hashes[:, 0], phash) <= self.hash_radius
+        if encoding is not None and len(filenames):
+            distances = np.linalg.norm(encodings - np.asarray(encoding, dtype=np.float32), axis=1)
+            close |= np.nan_to_num(distances, nan=np.inf) <= self.eps
+
+        with self._lock:
+            roots = {self._roots[filenames[row]] for row in np.nonzero(close)[0]
+                     if filenames[row] in self._roots}
+            if roots:
+                # Merge into the largest cluster so its id stays stable
+                sizes = {}
+                for root in self._roots.values():
+                    if root in roots:
+                        sizes[root] = sizes.get(root, 0) + 1
+                root = max(roots, key=lambda item: (sizes[item], item))
+                for name, old_root in self._roots.items():
+                    if old_root in roots:
+                        self._roots[name] = root
+            else:
+                root = filename
+            self._roots[filename] = root
+            self._quality[filename] = crop_quality(os.path.join(self.directory, filename))
+            self._clusters = self._build_clusters()
+            self._save()
+            return self.cluster_of(filename)
+
+    def _build_clusters(self):
+        members = {}
+        for name, root in self._roots.items():
+            members.setdefault(root, []).append(name)
+
+        clusters = []
+        for root, names in members.items():
+            names.sort(key=lambda name: self._quality.get(name, 0.0), reverse=True)
+            clusters.append({
+                'id': root,
+                'representative': names[0],
+                'members': names,
+                'size': len(names)
+            })
+        clusters.sort(key=lambda cluster: (-cluster['size'], cluster['id']))
+        return clusters
+
+    @property
+    def clusters(self):
+        return self._clusters
+
+    def cluster_of(self, filename):
+        """Cluster containing a crop, or None"""
+        root = self._roots.get(filename)
+        for cluster in self._clusters:
+            if cluster['id'] == root:
+                return cluster
+        return None
+
+    def matching_cluster(self, encoding):
+        """
+        Cluster a new face would join
+
+        Args:
+            encoding: 128-d face encoding
+
+        Returns:
+            dict: The closest cluster within eps, or None
+        """
+        filenames, _, encodings = self.index.snapshot()
+        if not filenames:
+            return None
+        distances = np.linalg.norm(encodings - np.asarray(encoding, dtype=np.float32), axis=1)
+        distances = np.where(np.isnan(distances), np.inf, distances)
+        closest = int(np.argmin(distances))
+        if distances[closest] > self.eps:
+            return None
+        return self.cluster_of(filenames[closest])
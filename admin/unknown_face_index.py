@@ -0,0 +1,327 @@
+import os
+import threading
+import numpy as np
+
+from admin.face_gallery import FaceGallery
+from admin.hash_index import HashIndex, hash_to_int, hamming_distances
+
+HASH_WEIGHTS = np.array([0.5, 0.3, 0.2], dtype=np.float32)
+
+
+class UnknownFaceIndex:
+    """
+    Sidecar index of the saved unknown faces.
+
+    Holds, per image in the unknown faces directory, its perceptual, difference
+    and average hashes as 64-bit integers and its face encoding, persisted in
+    one .npz file next to the images. Duplicate checks become a Hamming/L2
+    comparison against the index instead of decoding and re-hashing every
+    stored image on each save, and each hash type is kept in a HashIndex so
+    only nearby entries are compared at all. Images that appear without an
+    index entry (older files, copies) are hashed once and added; entries whose
+    image was deleted (reviewed or removed) are dropped.
+    """
+    INDEX_FILE = "unknown_index.npz"
+    IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+    def __init__(self, directory="unknown_faces"):
+        """
+        Initialize the index
+
+        Args:
+            directory (str): Directory holding the unknown face images
+        """
+        self.directory = directory
+        self.index_path = os.path.join(directory, self.INDEX_FILE)
+        self._lock = threading.Lock()
+        self._dir_mtime = None
+
+        self.filenames = []
+        self.hashes = np.empty((0, 3), dtype=np.uint64)
+        self.encodings = np.empty((0, FaceGallery.ENCODING_SIZE), dtype=np.float32)
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+        self._rebuild_hash_indexes()
+
+    def __len__(self):
+        return len(self.filenames)
+
+    @staticmethod
+    def compute_hashes(pil_image):
+        """
+        Hashes used for duplicate detection
+
+        Args:
+            pil_image (PIL.Image): Face image
+
+        Returns:
+            tuple: (phash, dhash, average hash) as integers
+        """
+        import imagehash
+
+        standardized = pil_image.convert("L").resize((128, 128))
+        return (hash_to_int(imagehash.phash(standardized)),
+                hash_to_int(imagehash.dhash(standardized)),
+                hash_to_int(imagehash.average_hash(standardized)))
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with np.load(self.index_path, allow_pickle=False) as data:
+                self.filenames = [str(name) for name in data['filenames']]
+                self.hashes = data['hashes'].astype(np.uint64).reshape(-1, 3)
+                self.encodings = data['encodings'].astype(np.float32).reshape(-1, FaceGallery.ENCODING_SIZE)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Rebuilding unreadable unknown face index: {e}")
+            self.filenames = []
+
+        if len(self.filenames) != len(self.hashes) or len(self.filenames) != len(self.encodings):
+            print("⚠️ Unknown face index is inconsistent, rebuilding")
+            self.filenames = []
+            self.hashes = np.empty((0, 3), dtype=np.uint64)
+            self.encodings = np.empty((0, FaceGallery.ENCODING_SIZE), dtype=np.float32)
+
+    def _rebuild_hash_indexes(self):
+        self._hash_indexes = [HashIndex.from_items(zip(self.filenames, self.hashes[:, i].tolist()))
+                              for i in range(3)]
+        self._rows = {name: row for row, name in enumerate(self.filenames)}
+
+    def _save(self):
+        tmp_path = self.index_path + ".tmp.npz"
+        try:
+            np.savez(
+                tmp_path,
+                filenames=np.array(self.filenames, dtype=str),
+                hashes=self.hashes,
+                encodings=self.encodings
+            )
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"⚠️ Could not save unknown face index: {e}")
+
+    def sync(self):
+        """
+        Reconcile the index with the files in the directory
+
+        Only file names are listed; images are decoded only when they have no
+        index entry yet. Skipped while the directory is unchanged.
+        """
+        with self._lock:
+            try:
+                mtime = os.stat(self.directory).st_mtime_ns
+            except OSError:
+                return
+            if mtime == self._dir_mtime:
+                return
+
+            present = {name for name in os.listdir(self.directory)
+                       if name.lower().endswith(self.IMAGE_EXTENSIONS)}
+            changed = False
+
+            keep = [i for i, name in enumerate(self.filenames) if name in present]
+            if len(keep) != len(self.filenames):
+                self._keep_rows(keep)
+                changed = True
+
+            missing = sorted(present - set(self.filenames))
+            for name in missing:
+                entry = self._index_file(name)
+                if entry is not None:
+                    self._append(name, *entry)
+                    changed = True
+
+            if changed:
+                self._save()
+            # Read after saving, since writing the index itself touches the directory
+            self._dir_mtime = os.stat(self.directory).st_mtime_ns
+
+    def _index_file(self, name):
+        """Hash (and encode) an image that has no index entry yet"""
+        from PIL import Image
+
+        path = os.path.join(self.directory, name)
+        try:
+            image = Image.open(path).convert("RGB")
+            hashes = self.compute_hashes(image)
+        except Exception as e:
+            print(f"Error indexing unknown face {name}: {e}")
+            return None
+
+        encoding = None
+        try:
+            import face_recognition
+            encodings = face_recognition.face_encodings(np.array(image))
+            if encodings:
+                encoding = encodings[0]
+        except Exception as e:
+            print(f"Error encoding unknown face {name}: {e}")
+        return hashes, encoding
+
+    def _keep_rows(self, rows):
+        removed = set(self.filenames) - {self.filenames[i] for i in rows}
+        self.filenames = [self.filenames[i] for i in rows]
+        self.hashes = self.hashes[rows]
+        self.encodings = self.encodings[rows]
+        for index in self._hash_indexes:
+            for name in removed:
+                index.remove(name)
+        self._rows = {name: row for row, name in enumerate(self.filenames)}
+
+    def _append(self, filename, hashes, encoding):
+        if encoding is None:
+            # Rows without an encoding never match on face distance
+            row = np.full((1, FaceGallery.ENCODING_SIZE), np.nan, dtype=np.float32)
+        else:
+            row = np.asarray(encoding, dtype=np.float32).reshape(1, -1)
+        self._rows[filename] = len(self.filenames)
+        self.filenames.append(filename)
+        self.hashes = np.vstack([self.hashes, np.array([hashes], dtype=np.uint64)])
+        self.encodings = np.vstack([self.encodings, row])
+        for index, value in zip(self._hash_indexes, hashes):
+            index.add(filename, value)
+
+    def add(self, filename, hashes, encoding=None):
+        """
+        Record a newly saved image
+
+        Args:
+            filename (str): Image file name inside the directory
+            hashes (tuple): (phash, dhash, average hash) integers
+            encoding: 128-d face encoding, if known
+        """
+        with self._lock:
+            self._append(filename, hashes, encoding)
+            self._save()
+            self._dir_mtime = os.stat(self.directory).st_mtime_ns
+
+    def snapshot(self):
+        """
+        Consistent copy of the index contents
+
+        Returns:
+            tuple: (filenames, (N, 3) uint64 hashes, (N, 128) float32 encodings)
+        """
+        with self._lock:
+            return list(self.filenames), self.hashes.copy(), self.encodings.copy()
+
+    def encoding_for(self, filename):
+        """
+        Stored face encoding of an image
+
+        Returns:
+            np.ndarray: 128-d encoding, or None if the image has none or is not indexed
+        """
+        with self._lock:
+            row = self._rows.get(filename)
+            if row is None or np.isnan(self.encodings[row, 0]):
+                return None
+            return self.encodings[row].copy()
+
+    def remove(self, filenames):
+        """Drop entries for images that were deleted or moved out"""
+        names = set(filenames)
+        with self._lock:
+            keep = [i for i, name in enumerate(self.filenames) if name not in names]
+            if len(keep) != len(self.filenames):
+                self._keep_rows(keep)
+                self._save()
+
+    def hash_differences(self, hashes, rows=None):
+        """
+        Weighted hash difference to indexed images
+
+        Args:
+            hashes (tuple): (phash, dhash, average hash) of the new image
+            rows: Rows to compare against (default: every row)
+
+        Returns:
+            np.ndarray: 0.5 * phash + 0.3 * dhash + 0.2 * average hash bit differences
+        """
+        stored = self.hashes if rows is None else self.hashes[rows]
+        if len(stored) == 0:
+            return np.empty(0, dtype=np.float32)
+        diffs = np.stack([hamming_distances(stored[:, i], hashes[i]) for i in range(3)], axis=1)
+        return diffs.astype(np.float32) @ HASH_WEIGHTS
+
+    def candidate_rows(self, hashes, max_difference):
+        """
+        Rows whose weighted hash difference can be at most max_difference
+
+        A weighted average is never below its smallest term, so every such
+        row is within max_difference bits on at least one of the three hashes.
+
+        Returns:
+            np.ndarray: Candidate row numbers
+        """
+        radius = int(np.floor(max_difference))
+        names = set()
+        for index, value in zip(self._hash_indexes, hashes):
+            names.update(name for name, _ in index.query(value, radius))
+        return np.array(sorted(self._rows[name] for name in names), dtype=np.int64)
+
+    def find_duplicate(self, hashes, encoding=None, hash_threshold=10, face_threshold=0.6):
+        """
+        Find an already saved image of the same face
+
+        A stored image is a duplicate when its weighted hash difference is
+        below hash_threshold, or when it is borderline (up to twice the
+        threshold) and its face encoding is within face_threshold.
+
+        Args:
+            hashes (tuple): (phash, dhash, average hash) of the new image
+            encoding: 128-d face encoding of the new image
+            hash_threshold (float): Weighted hash difference for a duplicate
+            face_threshold (float): Face distance for borderline duplicates
+
+        Returns:
+            tuple: (filename, reason, value) or None if there is no duplicate
+        """
+        self.sync()
+        with self._lock:
+            if not self.filenames:
+                return None
+
+            max_difference = hash_threshold * 2 if encoding is not None else hash_threshold
+            rows = self.candidate_rows(hashes, max_difference)
+            if len(rows) == 0:
+                return None
+            combined = self.hash_differences(hashes, rows)
+
+            closest = int(np.argmin(combined))
+            if combined[closest] < hash_threshold:
+                return self.filenames[rows[closest]], "hash", float(combined[closest])
+
+            if encoding is None:
+                return None
+            borderline = rows[combined <= hash_threshold * 2]
+            if len(borderline) == 0:
+                return None
+
+            query = np.asarray(encoding, dtype=np.float32)
+            distances = np.linalg.norm(self.encodings[borderline] - query, axis=1)
+            distances = np.where(np.isnan(distances), np.inf, distances)
+            best = int(np.argmin(distances))
+            if distances[best] < face_threshold:
+                return self.filenames[borderline[best]], "face", float(distances[best])
+            return None
+
+    def near_duplicate_groups(self, radius):
+        """
+        Group images whose phash is within a Hamming radius of an earlier image
+
+        Returns:
+            dict: filename -> filename of the first image it duplicates
+        """
+        self.sync()
+        with self._lock:
+            seen = HashIndex()
+            duplicates = {}
+            for name, value in zip(self.filenames, self.hashes[:, 0].tolist()):
+                match = seen.nearest(value, radius)
+                if match is not None:
+                    duplicates[name] = duplicates.get(match[0], match[0])
+                else:
+                    seen.add(name, value)
+            return duplicates
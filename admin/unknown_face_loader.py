@@ -0,0 +1,190 @@
+import os
+import json
+import face_recognition
+from PyQt5.QtCore import QThread, pyqtSignal, Qt
+from PyQt5.QtGui import QImage
+
+from admin.face_recognition_service import FaceRecognitionService
+from admin.unknown_face_clusters import UnknownFaceClusters
+from admin.unknown_face_index import UnknownFaceIndex
+
+
+class DetectionCache:
+    """
+    Face detection results for unknown face images, persisted as JSON.
+
+    Entries are keyed by file name and remembered together with the file's
+    size and modification time, so an image is only run through face
+    detection again when the file itself changes.
+    """
+    CACHE_FILE = "detections.json"
+
+    def __init__(self, directory):
+        """
+        Initialize the cache
+
+        Args:
+            directory (str): Directory holding the unknown face images
+        """
+        self.directory = directory
+        self.path = os.path.join(directory, self.CACHE_FILE)
+        self._entries = {}
+        self._dirty = False
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Ignoring unreadable detection cache: {e}")
+
+    def _stamp(self, filename):
+        stat = os.stat(os.path.join(self.directory, filename))
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def get(self, filename):
+        """
+        Cached face locations for an image
+
+        Returns:
+            list: (top, right, bottom, left) boxes, or None if not cached
+        """
+        entry = self._entries.get(filename)
+        try:
+            if entry is None or entry['stamp'] != self._stamp(filename):
+                return None
+        except OSError:
+            return None
+        return [tuple(box) for box in entry['faces']]
+
+    def put(self, filename, face_locations):
+        try:
+            self._entries[filename] = {
+                'stamp': self._stamp(filename),
+                'faces': [list(box) for box in face_locations]
+            }
+            self._dirty = True
+        except OSError:
+            pass
+
+    def prune(self, filenames):
+        """Forget images that are no longer in the directory"""
+        stale = set(self._entries) - set(filenames)
+        for filename in stale:
+            del self._entries[filename]
+        self._dirty = self._dirty or bool(stale)
+
+    def save(self):
+        if not self._dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            print(f"⚠️ Could not save detection cache: {e}")
+
+
+class UnknownFaceLoader(QThread):
+    """
+    Loads the unknown faces for review on a background thread.
+
+    The shared face gallery is made ready first, for match suggestions. Then
+    the saved crops are grouped by identity and one crop per cluster (the
+    best-quality one that contains a face, using cached detection results)
+    is streamed to the window as a thumbnail, together with the face
+    encoding stored in the unknown face index and the cluster's members.
+    """
+    gallery_ready = pyqtSignal(object)
+    image_loaded = pyqtSignal(str, QImage, object)
+    progress = pyqtSignal(int, int)
+    loading_finished = pyqtSignal(int)
+
+    SAVE_EVERY = 25
+
+    def __init__(self, directory, duplicate_radius=6, thumbnail_size=64, parent=None):
+        """
+        Initialize the loader
+
+        Args:
+            directory (str): Directory holding the unknown face images
+            duplicate_radius (int): phash bit difference that puts crops in one cluster
+            thumbnail_size (int): Largest side of the emitted thumbnails
+            parent (QObject): Parent object
+        """
+        super().__init__(parent)
+        self.directory = directory
+        self.duplicate_radius = duplicate_radius
+        self.thumbnail_size = thumbnail_size
+        self._stopped = False
+
+    def stop(self):
+        """Ask the loader to finish after the current image"""
+        self._stopped = True
+
+    def run(self):
+        try:
+            self.gallery_ready.emit(FaceRecognitionService.shared().gallery)
+        except Exception as e:
+            print(f"⚠️ Could not load face gallery for suggestions: {e}")
+            self.gallery_ready.emit(None)
+
+        clusters = UnknownFaceClusters(self.directory, hash_radius=self.duplicate_radius)
+        queue = clusters.update()
+
+        filenames = [f for f in os.listdir(self.directory)
+                     if f.lower().endswith(UnknownFaceIndex.IMAGE_EXTENSIONS)]
+        cache = DetectionCache(self.directory)
+        cache.prune(filenames)
+        loaded = 0
+
+        for position, cluster in enumerate(queue, 1):
+            if self._stopped:
+                break
+
+            # Best-quality member that actually contains a face
+            representative, face_locations = None, None
+            for filename in cluster['members']:
+                face_locations = self._detect(cache, filename)
+                if face_locations:
+                    representative = filename
+                    break
+                print(f"⚠️ Skipped {filename} (No face detected)")
+
+            if representative is not None:
+                img_path = os.path.join(self.directory, representative)
+                thumbnail = QImage(img_path)
+                if not thumbnail.isNull():
+                    thumbnail = thumbnail.scaled(self.thumbnail_size, self.thumbnail_size,
+                                                 Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                info = {
+                    'face_locations': face_locations,
+                    'encoding': clusters.index.encoding_for(representative),
+                    'members': cluster['members'],
+                    'size': cluster['size']
+                }
+                self.image_loaded.emit(representative, thumbnail, info)
+                loaded += 1
+
+            if position % self.SAVE_EVERY == 0:
+                cache.save()
+            self.progress.emit(position, len(queue))
+
+        cache.save()
+        print(f"✅ Loaded {loaded} unknown people for review.")
+        self.loading_finished.emit(loaded)
+
+    def _detect(self, cache, filename):
+        """Face locations in an image, from the cache when possible"""
+        face_locations = cache.get(filename)
+        if face_locations is None:
+            try:
+                image = face_recognition.load_image_file(os.path.join(self.directory, filename))
+                face_locations = face_recognition.face_locations(image)
+            except Exception as e:
+                print(f"❌ Error loading {filename}: {e}")
+                return []
+            cache.put(filename, face_locations)
+        return face_locations
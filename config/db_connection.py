@@ -0,0 +1,236 @@
+"""
+Shared SQLite connection layer
+
+Every thread keeps one persistent connection per database (and connect
+options) instead of opening and closing a connection for each query. New
+connections are switched to WAL journal mode, so readers (the student
+portal, reports) and the writer (live attendance marking) no longer block
+each other, and are tuned with synchronous=NORMAL, a memory-mapped I/O
+window and a larger prepared-statement cache.
+
+Callers keep the familiar pattern:
+
+    conn = get_connection(DATABASE_PATH)
+    cursor = conn.cursor()
+    ...
+    conn.close()
+
+close() only releases the handle. When the last handle of a thread's
+connection is released, any uncommitted work is rolled back so the next
+user starts from a clean state; the underlying connection stays open.
+
+Handles share the connection's transaction, so a handle taken while
+another caller on the same thread has one open is nested: it works inside
+a SAVEPOINT of its own. Its commit() releases the savepoint into the
+enclosing transaction (which the outer caller still commits or rolls
+back), and its rollback() or an uncommitted close() only undoes its own
+writes.
+
+Code that must not join a caller's transaction at all, such as schema
+migrations, uses open_connection() for a dedicated connection.
+"""
+
+import itertools
+import sqlite3
+import threading
+
+from config.utils_constants import DATABASE_PATH
+
+BUSY_TIMEOUT_MS = 5000
+MMAP_SIZE = 256 * 1024 * 1024
+CACHED_STATEMENTS = 256
+
+_local = threading.local()
+_savepoint_ids = itertools.count(1)
+
+
+class ManagedConnection:
+    """
+    Handle to a thread's shared sqlite3 connection
+
+    Behaves like a sqlite3.Connection. The row factory is per handle and is
+    applied to the cursors it creates, so one caller asking for sqlite3.Row
+    does not change the rows another caller gets from the same connection.
+    """
+
+    def __init__(self, entry, row_factory=None):
+        self._entry = entry
+        self._conn = entry['connection']
+        self._closed = False
+        self.row_factory = row_factory
+        self._savepoint = None
+        if self._conn.in_transaction:
+            # Someone on this thread is mid-transaction: keep our work separable from theirs
+            self._savepoint = f"handle_{next(_savepoint_ids)}"
+            self._conn.execute(f"SAVEPOINT {self._savepoint}")
+
+    @property
+    def nested(self):
+        """Whether this handle works inside another caller's transaction"""
+        return self._savepoint is not None
+
+    def cursor(self):
+        cursor = self._conn.cursor()
+        cursor.row_factory = self.row_factory
+        return cursor
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, script):
+        if self._savepoint is not None:
+            # sqlite3 commits before running a script, which would commit the outer caller's work
+            raise sqlite3.ProgrammingError("executescript() is not allowed inside another transaction")
+        return self._conn.executescript(script)
+
+    def _end_savepoint(self, keep):
+        """
+        Release (keep=True) or undo and release this handle's savepoint
+
+        Returns:
+            bool: False if the savepoint was already gone because the
+                  enclosing transaction ended; the handle is then no longer nested
+        """
+        try:
+            if not keep:
+                self._conn.execute(f"ROLLBACK TO SAVEPOINT {self._savepoint}")
+            self._conn.execute(f"RELEASE SAVEPOINT {self._savepoint}")
+            return True
+        except sqlite3.OperationalError:
+            self._savepoint = None
+            return False
+
+    def commit(self):
+        if self._savepoint is None:
+            self._conn.commit()
+            return
+        if self._end_savepoint(keep=True):
+            # Later work through this handle stays separable as well
+            self._conn.execute(f"SAVEPOINT {self._savepoint}")
+        elif self._conn.in_transaction:
+            self._conn.commit()
+
+    def rollback(self):
+        if self._savepoint is None:
+            self._conn.rollback()
+            return
+        try:
+            self._conn.execute(f"ROLLBACK TO SAVEPOINT {self._savepoint}")
+        except sqlite3.OperationalError:
+            # The enclosing transaction already ended; only our own later work is left
+            self._savepoint = None
+            self._conn.rollback()
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    @property
+    def total_changes(self):
+        return self._conn.total_changes
+
+    @property
+    def raw_connection(self):
+        """The underlying sqlite3.Connection, for APIs that need the real object"""
+        return self._conn
+
+    def close(self):
+        """Release this handle; the shared connection stays open for reuse"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._savepoint is not None:
+            # Uncommitted work of a nested handle is discarded, the caller's is left alone
+            self._end_savepoint(keep=False)
+            self._savepoint = None
+        self._entry['refs'] -= 1
+        if self._entry['refs'] == 0 and self._conn.in_transaction:
+            # Nobody committed: don't leak a half-finished transaction to the next user
+            self._conn.rollback()
+
+    def __del__(self):
+        # A handle dropped without close() (e.g. on an early return) still releases its reference
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Same semantics as sqlite3.Connection: commit on success, rollback on error;
+        # for a nested handle both only apply to its own savepoint
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def open_connection(db_path=DATABASE_PATH, detect_types=0):
+    """
+    Open a dedicated connection, not shared with other callers on the thread
+
+    It gets the same pragmas as shared connections. The caller owns it and
+    must close() it.
+    """
+    conn = sqlite3.connect(
+        db_path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        detect_types=detect_types,
+        cached_statements=CACHED_STATEMENTS
+    )
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    except sqlite3.Error as e:
+        print(f"⚠️ Could not apply connection pragmas to {db_path}: {e}")
+    return conn
+
+
+def get_connection(db_path=DATABASE_PATH, row_factory=None, detect_types=0):
+    """
+    Get a handle to this thread's persistent connection for a database
+
+    Args:
+        db_path (str): Path to the SQLite database
+        row_factory: Row factory for cursors created through this handle
+        detect_types (int): sqlite3 detect_types flags
+
+    Returns:
+        ManagedConnection: Connection handle; call close() when done
+    """
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    key = (db_path, detect_types)
+    entry = connections.get(key)
+    if entry is None:
+        entry = connections[key] = {
+            'connection': open_connection(db_path, detect_types),
+            'refs': 0
+        }
+
+    entry['refs'] += 1
+    return ManagedConnection(entry, row_factory)
+
+
+def close_thread_connections():
+    """Really close every connection opened by the calling thread"""
+    connections = getattr(_local, 'connections', None) or {}
+    for entry in connections.values():
+        try:
+            entry['connection'].close()
+        except sqlite3.Error:
+            pass
+    connections.clear()
@@ -3,6 +3,7 @@ import sys
 import sqlite3
 from PyQt5.QtWidgets import QApplication
 from admin.login_window import LoginWindow
+from admin.db_migrations import run_migrations
 from styles.theme_manager import ThemeManager
 
 
@@ -26,6 +27,13 @@ def main():
     """Initialize and start the application."""
     app = QApplication(sys.argv)
 
+    # Bring the schema (indexes, constraints) up to date before anything queries it
+    try:
+        run_migrations(DATABASE_PATH)
+    except sqlite3.Error as e:
+        # Already reported by the runner; the application still works on the old schema
+        print(f"⚠️ Starting without pending migrations: {e}")
+
     # Initialize theme manager with database path
     theme_manager = ThemeManager(app, DATABASE_PATH)
     
@@ -13,6 +13,14 @@ app.config['DATABASE'] = 'attendance.db'  # Update this path
 app.config['STUDENT_IMAGES_PATH'] = 'student_images'  # Update this path
 app.permanent_session_lifetime = timedelta(hours=2)  # Session timeout
 
+# Cache of rendered dashboard, courses and attendance pages ("memory", "file" or "none")
+app.config['RESPONSE_CACHE_BACKEND'] = 'memory'
+app.config['RESPONSE_CACHE_TTL'] = 300  # Seconds
+
+# PDF reports are rendered in background processes and kept for a week
+app.config['REPORT_JOBS_WORKERS'] = 2
+app.config['REPORT_CACHE_DAYS'] = 7
+
 # Flask-Mail config
 app.config['MAIL_SERVER'] = 'smtp.gmail.com'
 app.config['MAIL_PORT'] = 587
@@ -27,9 +35,16 @@ login_manager.login_view = 'login'
 mail = Mail(app)
 
 # Import routes after app creation to avoid circular imports
+from student_portal.models import db
+from student_portal import cache, report_jobs
 from student_portal.models.student import Student
 from student_portal.routes import auth, dashboard, attendance, profile, courses
 
+# Release the request's database handle when the app context ends
+db.init_app(app)
+cache.init_app(app)
+report_jobs.init_app(app)
+
 # Register blueprints
 app.register_blueprint(auth.bp)
 app.register_blueprint(dashboard.bp)
@@ -0,0 +1,235 @@
+"""
+Response cache for the student portal's read-only pages
+
+Rendered pages are cached per student under a key made of the student,
+the view, its query arguments and the student's data version. The data
+version comes from the data_versions table, which database triggers bump
+whenever attendance is marked, enrollment changes or a session starts or
+ends (see migration 5 in admin.db_migrations), so a cached page is never
+served after the data behind it changed. Entries also expire after a TTL.
+
+Two backends are available: "memory" (per process, the default) and
+"file" (a local directory, shared by every worker process on the host).
+"""
+
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+
+from flask import request, session, jsonify, abort
+from flask_login import current_user
+
+from admin.db_migrations import data_version
+from student_portal.models.db import get_db
+
+
+class MemoryBackend:
+    """Bounded in-process LRU store"""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileBackend:
+    """Store entries as files in a local directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.cache")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                expires_at, value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.PickleError, EOFError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable cache entry {key}: {e}")
+            return None
+        if expires_at < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return value
+
+    def set(self, key, value, ttl):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((time.time() + ttl, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not write cache entry: {e}")
+
+    def clear(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.cache'):
+                    try:
+                        os.remove(os.path.join(root, name))
+                    except OSError:
+                        pass
+
+
+class ResponseCache:
+    """Cache of rendered portal pages keyed by student, view, arguments and data version"""
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = 300
+        self._stats = {'hits': 0, 'misses': 0, 'bypassed': 0}
+        self._stats_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure the cache from the app config
+
+        Config keys:
+            RESPONSE_CACHE_BACKEND: "memory", "file" or "none"
+            RESPONSE_CACHE_TTL: Seconds an entry stays valid
+            RESPONSE_CACHE_DIR: Directory of the file backend
+            RESPONSE_CACHE_MAX_ENTRIES: Size of the memory backend
+        """
+        kind = app.config.get('RESPONSE_CACHE_BACKEND', 'memory')
+        self.ttl = int(app.config.get('RESPONSE_CACHE_TTL', 300))
+        if kind == 'file':
+            directory = app.config.get('RESPONSE_CACHE_DIR',
+                                       os.path.join(app.instance_path, 'response_cache'))
+            self.backend = FileBackend(directory)
+        elif kind == 'memory':
+            self.backend = MemoryBackend(int(app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1000)))
+        else:
+            self.backend = None
+        app.extensions['response_cache'] = self
+
+    def _count(self, outcome):
+        with self._stats_lock:
+            self._stats[outcome] += 1
+
+    def stats(self):
+        """
+        Hit and miss counters of this process
+
+        Returns:
+            dict: 'hits', 'misses', 'bypassed' and 'hit_ratio' (0-1)
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def make_key(self, name):
+        """Cache key of the current request for a cached view, or None if it cannot be built"""
+        student_id = current_user.id
+        try:
+            version = data_version(get_db().cursor(), student_id)
+        except sqlite3.Error as e:
+            # Without a data version a cached page could be stale
+            print(f"⚠️ Response cache disabled for this request: {e}")
+            return None
+        parts = (
+            student_id,
+            name,
+            sorted(request.args.items(multi=True)),
+            version,
+            # Pages default to "today" and the coming week
+            datetime.now().strftime('%Y-%m-%d')
+        )
+        return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    def cached(self, name=None):
+        """
+        Cache a view's rendered page
+
+        Only rendered pages (strings) are stored; redirects, errors and other
+        responses pass through. Requests with pending flash messages skip the
+        cache, since the page would show or swallow them.
+
+        Args:
+            name (str): Name in the key; defaults to the request endpoint
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if (self.backend is None or not current_user.is_authenticated
+                        or session.get('_flashes')):
+                    self._count('bypassed')
+                    return view(*args, **kwargs)
+
+                key = self.make_key(name or request.endpoint)
+                if key is None:
+                    self._count('bypassed')
+                    return view(*args, **kwargs)
+
+                page = self.backend.get(key)
+                if page is not None:
+                    self._count('hits')
+                    return page
+
+                self._count('misses')
+                page = view(*args, **kwargs)
+                if isinstance(page, str) and not session.get('_flashes'):
+                    self.backend.set(key, page, self.ttl)
+                return page
+            return wrapper
+        return decorator
+
+
+response_cache = ResponseCache()
+
+
+def init_app(app):
+    """Set up the response cache and its stats endpoint"""
+    response_cache.init_app(app)
+
+    @app.route('/cache/stats')
+    def cache_stats():
+        # Operational data, only for the machine running the portal
+        if request.remote_addr not in ('127.0.0.1', '::1'):
+            abort(404)
+        return jsonify(response_cache.stats())
@@ -0,0 +1,133 @@
+import base64
+import binascii
+import json
+
+# One row per attendance mark; enrollment is checked per row so a class linked
+# to several of the student's courses is not listed twice
+HISTORY_QUERY = '''
+    SELECT a.session_id, a.timestamp, a.status,
+           cs.date, cs.start_time, cs.end_time,
+           cl.class_name, cl.class_id,
+           c.course_name, c.course_code
+    FROM attendance a
+    JOIN class_sessions cs ON a.session_id = cs.session_id
+    JOIN classes cl ON cs.class_id = cl.class_id
+    LEFT JOIN courses c ON cl.course_code = c.course_code
+    WHERE a.student_id = ?
+    AND cs.date BETWEEN ? AND ?
+    AND EXISTS (
+        SELECT 1
+        FROM student_courses sc
+        JOIN class_courses cc ON cc.course_code = sc.course_code
+        WHERE sc.student_id = a.student_id
+        AND sc.status = 'Active'
+        AND sc.semester = cl.semester
+        AND cc.class_id = cl.class_id
+    )
+'''
+
+# Sort key of a row; start_time may be NULL, which would break row comparisons
+SORT_KEY = "(cs.date, COALESCE(cs.start_time, ''), a.session_id)"
+
+
+def encode_cursor(key, page, total):
+    """Opaque continuation token for a position in the history"""
+    payload = json.dumps({'k': list(key), 'p': page, 'n': total}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Read a continuation token
+
+    Returns:
+        tuple: (key, page, total), or None when the token is missing or invalid
+    """
+    if not token:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        date, start_time, session_id = payload['k']
+        return (str(date), str(start_time), int(session_id)), int(payload['p']), int(payload['n'])
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        return None
+
+
+def _filters(student_id, from_date, to_date, class_id):
+    query = HISTORY_QUERY
+    params = [student_id, from_date, to_date]
+    if class_id:
+        query += ' AND cl.class_id = ?'
+        params.append(class_id)
+    return query, params
+
+
+def count_records(db, student_id, from_date, to_date, class_id=None):
+    """Number of attendance records matching the history filters"""
+    query, params = _filters(student_id, from_date, to_date, class_id)
+    return db.execute(f"SELECT COUNT(*) as total FROM ({query})", params).fetchone()['total']
+
+
+def _row_key(row):
+    return row['date'], row['start_time'] or '', row['session_id']
+
+
+def history_page(db, student_id, from_date, to_date, class_id=None,
+                 after=None, before=None, per_page=10):
+    """
+    One page of a student's attendance history, newest first
+
+    Pages are addressed with keyset cursors on (date, start_time, session_id)
+    instead of an offset, so every page costs the same as the first. The
+    total is counted once, on the first page, and carried in the cursors.
+
+    Args:
+        after (str): Cursor of the previous page's next link
+        before (str): Cursor of the next page's previous link
+        per_page (int): Records per page
+
+    Returns:
+        tuple: (records as dicts, pagination dict with 'page', 'pages',
+               'total', 'next_cursor' and 'prev_cursor')
+    """
+    query, params = _filters(student_id, from_date, to_date, class_id)
+
+    cursor = decode_cursor(after)
+    backwards = cursor is None and decode_cursor(before) is not None
+    if backwards:
+        cursor = decode_cursor(before)
+    if cursor is None:
+        page, total = 1, count_records(db, student_id, from_date, to_date, class_id)
+        order = 'DESC'
+    else:
+        key, page, total = cursor
+        # The redundant date bound lets the planner range-scan the session index
+        if backwards:
+            query += f' AND cs.date >= ? AND {SORT_KEY} > (?, ?, ?)'
+            order = 'ASC'
+        else:
+            query += f' AND cs.date <= ? AND {SORT_KEY} < (?, ?, ?)'
+            order = 'DESC'
+        params.extend([key[0], *key])
+
+    query += f" ORDER BY cs.date {order}, COALESCE(cs.start_time, '') {order}, a.session_id {order} LIMIT ?"
+    params.append(per_page + 1)
+    rows = db.execute(query, params).fetchall()
+
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = page > 1, more
+
+    pages = max(1, (total + per_page - 1) // per_page)
+    pagination = {
+        'page': page,
+        'pages': max(pages, page),
+        'total': total,
+        'next_cursor': encode_cursor(_row_key(rows[-1]), page + 1, total) if rows and has_next else None,
+        'prev_cursor': encode_cursor(_row_key(rows[0]), max(1, page - 1), total) if rows and has_prev else None
+    }
+    return [dict(row) for row in rows], pagination
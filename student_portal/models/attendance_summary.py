@@ -0,0 +1,136 @@
+from datetime import datetime
+
+# Sessions so far this month, per class; past months come from attendance_summary
+LIVE_MONTH_QUERY = '''
+    SELECT e.class_id,
+           COUNT(*) as scheduled,
+           SUM(CASE WHEN a.status = 'Present' THEN 1 ELSE 0 END) as present
+    FROM class_enrollment e
+    JOIN class_sessions cs ON cs.class_id = e.class_id
+    LEFT JOIN attendance a ON a.session_id = cs.session_id
+        AND a.student_id = e.student_id
+    WHERE e.student_id = ?
+        AND cs.date >= ? AND cs.date <= ?
+    GROUP BY e.class_id
+'''
+
+
+def _current_month():
+    today = datetime.now()
+    return today.strftime('%Y-%m'), today.strftime('%Y-%m-%d')
+
+
+def _live_month(db, student_id):
+    """Per-class (scheduled, present) for the current month up to today"""
+    month, today = _current_month()
+    rows = db.execute(LIVE_MONTH_QUERY, (student_id, f"{month}-01", today)).fetchall()
+    return {row['class_id']: (row['scheduled'], row['present'] or 0) for row in rows}
+
+
+def class_totals(db, student_id):
+    """
+    Sessions held so far and sessions attended, per enrolled class
+
+    Completed months are read from the attendance_summary table, which
+    triggers keep up to date; only the current month is counted live, so
+    future sessions scheduled later this month are not included.
+
+    Returns:
+        dict: class_id -> (scheduled, present)
+    """
+    month, _ = _current_month()
+    rows = db.execute('''
+        SELECT class_id, SUM(scheduled) as scheduled, SUM(present) as present
+        FROM attendance_summary
+        WHERE student_id = ? AND month < ?
+        GROUP BY class_id
+    ''', (student_id, month)).fetchall()
+
+    totals = {row['class_id']: (row['scheduled'], row['present']) for row in rows}
+    for class_id, (scheduled, present) in _live_month(db, student_id).items():
+        past_scheduled, past_present = totals.get(class_id, (0, 0))
+        totals[class_id] = (past_scheduled + scheduled, past_present + present)
+    return totals
+
+
+def overall_stats(db, student_id):
+    """
+    Overall attendance of a student
+
+    Returns:
+        dict: 'total_sessions', 'present_count', 'absent_count' and, when
+              any session was held, 'attendance_rate' in percent
+    """
+    totals = class_totals(db, student_id).values()
+    total = sum(scheduled for scheduled, _ in totals)
+    present = sum(present for _, present in totals)
+    stats = {
+        'total_sessions': total,
+        'present_count': present,
+        'absent_count': total - present
+    }
+    if total > 0:
+        stats['attendance_rate'] = present / total * 100
+    return stats
+
+
+def monthly_stats(db, student_id, months=6):
+    """
+    Attendance per month for the last few months, newest first
+
+    Returns:
+        list: Dicts with 'month' (YYYY-MM), 'total_sessions' and 'present_count'
+    """
+    month, _ = _current_month()
+    rows = db.execute('''
+        SELECT month, SUM(scheduled) as total_sessions, SUM(present) as present_count
+        FROM attendance_summary
+        WHERE student_id = ? AND month >= strftime('%Y-%m', 'now', ?) AND month < ?
+        GROUP BY month
+    ''', (student_id, f"-{months} months", month)).fetchall()
+
+    stats = [{
+        'month': row['month'],
+        'total_sessions': int(row['total_sessions']),
+        'present_count': int(row['present_count'])
+    } for row in rows]
+
+    live = _live_month(db, student_id).values()
+    if live:
+        stats.append({
+            'month': month,
+            'total_sessions': sum(scheduled for scheduled, _ in live),
+            'present_count': sum(present for _, present in live)
+        })
+    stats.sort(key=lambda stat: stat['month'], reverse=True)
+    return stats
+
+
+def class_stats(db, student_id):
+    """
+    Attendance per enrolled class, ordered by class name
+
+    Returns:
+        list: Dicts with 'class_id', 'class_name', 'course_name',
+              'total_sessions' and 'present_count'
+    """
+    totals = class_totals(db, student_id)
+    if not totals:
+        return []
+
+    placeholders = ", ".join("?" for _ in totals)
+    classes = db.execute(f'''
+        SELECT cl.class_id, cl.class_name, c.course_name
+        FROM classes cl
+        LEFT JOIN courses c ON cl.course_code = c.course_code
+        WHERE cl.class_id IN ({placeholders})
+        ORDER BY cl.class_name
+    ''', list(totals)).fetchall()
+
+    return [{
+        'class_id': str(row['class_id']),
+        'class_name': str(row['class_name']),
+        'course_name': str(row['course_name']),
+        'total_sessions': int(totals[row['class_id']][0]),
+        'present_count': int(totals[row['class_id']][1])
+    } for row in classes]
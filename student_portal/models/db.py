@@ -1,13 +1,18 @@
 import sqlite3
 from flask import g, current_app
+from config.db_connection import get_connection
+from admin.db_migrations import ensure_migrated
 
 def get_db():
     if 'db' not in g:
-        g.db = sqlite3.connect(
+        # Summary tables and their triggers; runs once per process
+        ensure_migrated(current_app.config['DATABASE'])
+        # Handle to the worker thread's persistent WAL connection
+        g.db = get_connection(
             current_app.config['DATABASE'],
+            row_factory=sqlite3.Row,
             detect_types=sqlite3.PARSE_DECLTYPES
         )
-        g.db.row_factory = sqlite3.Row
     return g.db
 
 def close_db(e=None):
@@ -1,20 +1,7 @@
 from flask_login import UserMixin
 import sqlite3
 from flask import current_app, g
-
-def get_db():
-    if 'db' not in g:
-        g.db = sqlite3.connect(
-            current_app.config['DATABASE'],
-            detect_types=sqlite3.PARSE_DECLTYPES
-        )
-        g.db.row_factory = sqlite3.Row
-    return g.db
-
-def close_db(e=None):
-    db = g.pop('db', None)
-    if db is not None:
-        db.close()
+from student_portal.models.db import get_db, close_db
 
 class Student(UserMixin):
     def __init__(self, student_id, fname, lname, email=None, phone=None, 
@@ -0,0 +1,188 @@
+"""
+Background rendering of PDF attendance reports for the student portal
+
+WeasyPrint takes seconds per report, so the request only renders the HTML
+and hands it to a process pool; the browser then polls the job and
+downloads the file when it is ready. Finished PDFs are kept on disk under
+a key made of the student, the report filters, the student's data version
+and the day, so asking again for an unchanged report is served straight
+from the cache. Jobs are identified by that key, which lets any portal
+process answer for a report once its file exists.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+JOB_ID_PATTERN = re.compile(r'[0-9a-f]{40}')
+
+
+def render_pdf(html, output_path):
+    """
+    Render HTML to a PDF file (runs in a worker process)
+
+    The file is written under a temporary name and moved into place, so a
+    half-written PDF is never served.
+    """
+    from weasyprint import HTML
+
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        HTML(string=html).write_pdf(tmp_path)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return output_path
+
+
+class ReportJobs:
+    """Queue of PDF report jobs rendered in a process pool"""
+
+    def __init__(self, app=None):
+        self.cache_dir = None
+        self.max_workers = 2
+        self.max_age = 7 * 24 * 3600
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure the queue from the app config
+
+        Config keys:
+            REPORT_JOBS_WORKERS: Rendering processes
+            REPORT_CACHE_DIR: Directory of rendered PDFs
+            REPORT_CACHE_DAYS: Days a rendered PDF is kept
+        """
+        self.max_workers = int(app.config.get('REPORT_JOBS_WORKERS', 2))
+        self.cache_dir = app.config.get('REPORT_CACHE_DIR',
+                                        os.path.join(app.instance_path, 'reports'))
+        self.max_age = float(app.config.get('REPORT_CACHE_DAYS', 7)) * 24 * 3600
+        app.extensions['report_jobs'] = self
+
+    def _get_executor(self):
+        # Started on first use, not at import, so the dev server's reloader does not fork a pool
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    @staticmethod
+    def job_id(student_id, filters, version, day):
+        """Key of a report; identical reports on unchanged data share it"""
+        return hashlib.sha1(repr((student_id, filters, version, day)).encode()).hexdigest()
+
+    def report_path(self, student_id, job_id):
+        """Where a student's report is stored, or None for a malformed job id"""
+        if not JOB_ID_PATTERN.fullmatch(job_id or ''):
+            return None
+        # One directory per student, so a job id alone never reaches another student's report
+        return os.path.join(self.cache_dir, student_id.replace('/', '_'), f"{job_id}.pdf")
+
+    def cached(self, student_id, job_id):
+        """Path of an already rendered report, or None"""
+        path = self.report_path(student_id, job_id)
+        return path if path and os.path.exists(path) else None
+
+    def submit(self, student_id, job_id, html):
+        """
+        Queue a report for rendering
+
+        A report that is already rendered or being rendered is not queued again.
+
+        Args:
+            student_id (str): Owner of the report
+            job_id (str): Key from job_id()
+            html (str): Rendered report HTML
+        """
+        if self.cached(student_id, job_id):
+            return job_id
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job['status'] == 'pending':
+                return job_id
+
+        path = self.report_path(student_id, job_id)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        except OSError as e:
+            print(f"⚠️ Could not create report directory: {e}")
+        self.prune()
+
+        job = {'student_id': student_id, 'status': 'pending', 'error': None, 'created': time.time()}
+        with self._lock:
+            self._jobs[job_id] = job
+        try:
+            future = self._get_executor().submit(render_pdf, html, path)
+        except (BrokenProcessPool, RuntimeError) as e:
+            # A crashed pool cannot take work; start a fresh one for the next report
+            print(f"❌ Could not queue PDF report {job_id}: {e}")
+            with self._lock:
+                self._executor = None
+                job.update(status='failed', error=str(e))
+            return job_id
+        future.add_done_callback(lambda f: self._finished(job_id, f))
+        return job_id
+
+    def _finished(self, job_id, future):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            try:
+                future.result()
+                job['status'] = 'done'
+            except Exception as e:
+                print(f"❌ PDF report {job_id} failed: {e}")
+                job['status'] = 'failed'
+                job['error'] = str(e)
+
+    def status(self, student_id, job_id):
+        """
+        State of a job for its owner
+
+        Returns:
+            dict: 'status' ("pending", "done", "failed" or "missing") and 'error'
+        """
+        if self.cached(student_id, job_id):
+            return {'status': 'done', 'error': None}
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['student_id'] != student_id:
+                return {'status': 'missing', 'error': None}
+            return {'status': job['status'], 'error': job['error']}
+
+    def prune(self):
+        """Delete rendered reports older than the cache age and forget old jobs"""
+        cutoff = time.time() - self.max_age
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items()
+                           if job['status'] != 'pending' and job['created'] < cutoff]:
+                del self._jobs[job_id]
+
+        if not self.cache_dir or not os.path.isdir(self.cache_dir):
+            return
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+
+report_jobs = ReportJobs()
+
+
+def init_app(app):
+    report_jobs.init_app(app)
@@ -1,12 +1,14 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from flask_login import login_required, current_user
 from student_portal.models.db import get_db
+from student_portal.cache import response_cache
 from datetime import datetime
 
 bp = Blueprint('courses', __name__, url_prefix='/courses')
 
 @bp.route('/')
 @login_required
+@response_cache.cached()
 def index():
     db = get_db()
     
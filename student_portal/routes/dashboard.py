@@ -1,6 +1,8 @@
 from flask import Blueprint, render_template
 from flask_login import login_required, current_user
 from student_portal.models.db import get_db
+from student_portal.models import attendance_summary
+from student_portal.cache import response_cache
 from datetime import datetime, timedelta
 
 bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
@@ -8,6 +10,12 @@ bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
 @bp.route('/')
 @login_required
 def index():
+    # Log dashboard view, including views served from the cache
+    current_user.log_activity('view_dashboard')
+    return _render_dashboard()
+
+@response_cache.cached('dashboard.index')
+def _render_dashboard():
     db = get_db()
     
     # Get student information
@@ -51,29 +59,9 @@ def index():
         LIMIT 5
     ''', (current_user.id, today, next_week)).fetchall()
     
-    # Get attendance statistics
-    attendance_stats = db.execute('''
-        SELECT 
-            COUNT(DISTINCT cs.session_id) as total_sessions,
-            SUM(CASE WHEN a.status = 'Present' THEN 1 ELSE 0 END) as present_count
-        FROM class_sessions cs
-        JOIN classes cl ON cs.class_id = cl.class_id
-        JOIN class_courses cc ON cl.class_id = cc.class_id
-        JOIN student_courses sc ON cc.course_code = sc.course_code
-        LEFT JOIN attendance a ON cs.session_id = a.session_id 
-            AND a.student_id = sc.student_id
-        WHERE sc.student_id = ?
-            AND sc.status = 'Active'
-            AND cs.date <= date('now')
-    ''', (current_user.id,)).fetchone()
-    
-    # Calculate attendance percentage
-    attendance_percentage = 0
-    if attendance_stats and attendance_stats['total_sessions'] > 0:
-        attendance_percentage = round(
-            (attendance_stats['present_count'] / attendance_stats['total_sessions']) * 100, 
-            1
-        )
+    # Get attendance statistics from the maintained summary
+    attendance_stats = attendance_summary.overall_stats(db, current_user.id)
+    attendance_percentage = round(attendance_stats.get('attendance_rate', 0), 1)
     
     # Get recent attendance records
     recent_attendance = db.execute('''
@@ -91,9 +79,6 @@ def index():
         LIMIT 5
     ''', (current_user.id,)).fetchall()
     
-    # Log dashboard view
-    current_user.log_activity('view_dashboard')
-    
     return render_template('dashboard/index.html', 
                          student=student,
                          courses=courses,
@@ -0,0 +1,110 @@
+import random
+import sqlite3
+
+from student_portal.models.attendance_history import (
+    encode_cursor, decode_cursor, history_page, count_records
+)
+
+SCHEMA = """
+    CREATE TABLE courses (course_code TEXT PRIMARY KEY, course_name TEXT);
+    CREATE TABLE classes (class_id INTEGER PRIMARY KEY, class_name TEXT, course_code TEXT, semester TEXT);
+    CREATE TABLE class_courses (class_id INTEGER, course_code TEXT);
+    CREATE TABLE student_courses (student_id TEXT, course_code TEXT, semester TEXT, status TEXT);
+    CREATE TABLE class_sessions (session_id INTEGER PRIMARY KEY, class_id INTEGER, date TEXT,
+                                 start_time TEXT, end_time TEXT);
+    CREATE TABLE attendance (id INTEGER PRIMARY KEY, student_id TEXT, session_id INTEGER,
+                             timestamp TEXT, status TEXT);
+
+    INSERT INTO courses VALUES ('C1', 'Course One'), ('C2', 'Course Two');
+    INSERT INTO classes VALUES (1, 'Class A', 'C1', '1.1'), (2, 'Class B', 'C2', '1.1');
+    -- Class A is linked to both of the student's courses and must still be listed once
+    INSERT INTO class_courses VALUES (1, 'C1'), (1, 'C2'), (2, 'C2');
+    INSERT INTO student_courses VALUES ('S', 'C1', '1.1', 'Active'), ('S', 'C2', '1.1', 'Active');
+"""
+
+STUDENT = 'S'
+FROM_DATE, TO_DATE = '2025-01-01', '2025-01-31'
+
+
+def make_database(sessions=199):
+    """In-memory history with many sessions per day and some missing start times"""
+    db = sqlite3.connect(':memory:')
+    db.row_factory = sqlite3.Row
+    db.executescript(SCHEMA)
+    rng = random.Random(1)
+    for session_id in range(1, sessions + 1):
+        db.execute("INSERT INTO class_sessions VALUES (?, ?, ?, ?, NULL)",
+                   (session_id, rng.choice([1, 2]), f"2025-01-{rng.randint(1, 28):02d}",
+                    rng.choice([None, '09:00', '11:00'])))
+        db.execute("INSERT INTO attendance (student_id, session_id, status) VALUES (?, ?, 'Present')",
+                   (STUDENT, session_id))
+    return db
+
+
+def session_ids(rows):
+    return [row['session_id'] for row in rows]
+
+
+def test_cursor_round_trip():
+    token = encode_cursor(('2025-01-05', '09:00', 42), 3, 120)
+    assert decode_cursor(token) == (('2025-01-05', '09:00', 42), 3, 120)
+    assert '=' not in token
+
+    for bad in (None, '', 'garbage!', encode_cursor(('2025-01-05', '09:00'), 1, 1)):
+        assert decode_cursor(bad) is None
+
+
+def test_forward_pages_cover_history_once():
+    db = make_database()
+    everything, _ = history_page(db, STUDENT, FROM_DATE, TO_DATE, per_page=1000)
+    assert len(everything) == count_records(db, STUDENT, FROM_DATE, TO_DATE) == 199
+
+    pages, after = [], None
+    while True:
+        rows, pagination = history_page(db, STUDENT, FROM_DATE, TO_DATE, after=after, per_page=10)
+        pages.append(rows)
+        assert pagination['page'] == len(pages)
+        assert pagination['total'] == 199 and pagination['pages'] == 20
+        if not pagination['next_cursor']:
+            break
+        after = pagination['next_cursor']
+
+    assert len(pages) == 20
+    assert session_ids(row for page in pages for row in page) == session_ids(everything)
+
+
+def test_backward_pages_match_forward_pages():
+    db = make_database()
+    pages, cursors, after = [], [], None
+    while True:
+        rows, pagination = history_page(db, STUDENT, FROM_DATE, TO_DATE, after=after, per_page=10)
+        pages.append(session_ids(rows))
+        cursors.append(pagination['prev_cursor'])
+        if not pagination['next_cursor']:
+            break
+        after = pagination['next_cursor']
+
+    before, page = cursors[-1], len(pages) - 1
+    while before:
+        rows, pagination = history_page(db, STUDENT, FROM_DATE, TO_DATE, before=before, per_page=10)
+        assert session_ids(rows) == pages[page - 1]
+        assert pagination['page'] == page
+        before, page = pagination['prev_cursor'], page - 1
+    # Walked all the way back to the first page
+    assert page == 0
+
+
+def test_invalid_cursor_restarts_at_first_page():
+    db = make_database(sessions=25)
+    first, _ = history_page(db, STUDENT, FROM_DATE, TO_DATE, per_page=10)
+    rows, pagination = history_page(db, STUDENT, FROM_DATE, TO_DATE, after='garbage!', per_page=10)
+    assert pagination['page'] == 1
+    assert session_ids(rows) == session_ids(first)
+
+
+if __name__ == "__main__":
+    test_cursor_round_trip()
+    test_forward_pages_cover_history_once()
+    test_backward_pages_match_forward_pages()
+    test_invalid_cursor_restarts_at_first_page()
+    print("✅ Attendance history tests passed")
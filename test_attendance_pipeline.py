@@ -0,0 +1,65 @@
+import time
+
+import numpy as np
+from PyQt5.QtCore import QCoreApplication
+
+from admin.attendance_pipeline import DropOldestQueue, RecognitionWorker
+from admin.face_recognition_service import face_crops
+
+
+class FakeCamera:
+    """Endless stream of small dark frames"""
+
+    def read(self):
+        time.sleep(0.01)
+        return True, np.zeros((120, 160, 3), dtype=np.uint8)
+
+
+class FakeFaceService:
+    def detection_options(self):
+        # Every frame counts as too dark, so no detection work is queued
+        return {'min_frame_brightness': 255, 'detection_scale': 1.0}
+
+    def recognize_faces(self, face_encodings, gallery, tolerance):
+        return []
+
+
+def test_drop_oldest_queue_keeps_newest_items():
+    queue = DropOldestQueue(maxsize=2)
+    for item in range(5):
+        queue.put(item)
+    assert queue.dropped == 3
+    assert [queue.get(timeout=0), queue.get(timeout=0)] == [3, 4]
+    assert queue.get(timeout=0) is None
+
+    queue.close()
+    assert queue.closed
+
+
+def test_stop_right_after_start_ends_the_worker():
+    app = QCoreApplication.instance() or QCoreApplication([])
+    worker = RecognitionWorker(FakeCamera(), FakeFaceService(), gallery=None, tolerance=0.6, workers=1)
+    worker.start()
+    # Usually lands before run() is scheduled; the stop must not be lost
+    worker.stop()
+    assert worker.wait(10000), "worker kept running after stop()"
+
+
+def test_face_crops_hold_the_face_pixels():
+    rng = np.random.default_rng(0)
+    rgb_frame = rng.integers(0, 255, size=(240, 320, 3), dtype=np.uint8)
+    boxes = [(50, 150, 130, 70), (0, 319, 60, 260)]
+
+    for (crop, (top, right, bottom, left)), box in zip(face_crops(rgb_frame, boxes), boxes):
+        full_top, full_right, full_bottom, full_left = box
+        assert np.array_equal(crop[top:bottom, left:right],
+                              rgb_frame[full_top:full_bottom, full_left:full_right])
+        # Padding is kept inside the frame
+        assert crop.shape[0] <= rgb_frame.shape[0] and crop.shape[1] <= rgb_frame.shape[1]
+
+
+if __name__ == "__main__":
+    test_drop_oldest_queue_keeps_newest_items()
+    test_stop_right_after_start_ends_the_worker()
+    test_face_crops_hold_the_face_pixels()
+    print("✅ Attendance pipeline tests passed")
@@ -0,0 +1,150 @@
+import os
+import random
+import sqlite3
+import tempfile
+
+from admin.db_migrations import main as migrate, SUMMARY_REFRESH_SQL
+
+SCHEMA = """
+    CREATE TABLE students (student_id TEXT PRIMARY KEY, fname TEXT, lname TEXT,
+                           year_of_study INTEGER, current_semester TEXT);
+    CREATE TABLE courses (course_code TEXT PRIMARY KEY, course_name TEXT);
+    CREATE TABLE classes (class_id INTEGER PRIMARY KEY, class_name TEXT, course_code TEXT, semester TEXT);
+    CREATE TABLE class_courses (class_id INTEGER, course_code TEXT);
+    CREATE TABLE student_courses (student_id TEXT, course_code TEXT, semester TEXT,
+                                  status TEXT DEFAULT 'Active', enrollment_date TEXT);
+    CREATE TABLE class_sessions (session_id INTEGER PRIMARY KEY, class_id INTEGER, date TEXT,
+                                 start_time TEXT, end_time TEXT, status TEXT);
+    CREATE TABLE attendance (id INTEGER PRIMARY KEY, student_id TEXT, session_id INTEGER,
+                             timestamp TEXT, status TEXT);
+    CREATE TABLE class_instructors (class_id INTEGER, instructor_id INTEGER);
+"""
+
+STUDENTS = [f"S{i:02d}/00001/24" for i in range(20)]
+CLASSES = 6
+COURSES = 3
+SEMESTERS = ["1.1", "1.2"]
+
+
+def random_date(rng):
+    return f"2025-{rng.randint(1, 4):02d}-{rng.randint(1, 28):02d}"
+
+
+def create_database(path, rng):
+    """Scratch database with a few classes, enrollments, sessions and marks"""
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    for class_id in range(CLASSES):
+        conn.execute("INSERT INTO classes VALUES (?, ?, ?, ?)",
+                     (class_id, f"Class {class_id}", f"C{class_id % COURSES}", rng.choice(SEMESTERS)))
+        conn.execute("INSERT INTO class_courses VALUES (?, ?)", (class_id, f"C{class_id % COURSES}"))
+    for student_id in STUDENTS:
+        for course in rng.sample(range(COURSES), 2):
+            conn.execute("INSERT INTO student_courses (student_id, course_code, semester) VALUES (?, ?, ?)",
+                         (student_id, f"C{course}", rng.choice(SEMESTERS)))
+    for _ in range(30):
+        conn.execute("INSERT INTO class_sessions (class_id, date, start_time) VALUES (?, ?, '09:00')",
+                     (rng.randrange(CLASSES), random_date(rng)))
+    for _ in range(150):
+        conn.execute("INSERT INTO attendance (student_id, session_id, status) VALUES (?, ?, ?)",
+                     (rng.choice(STUDENTS), rng.randint(1, 30), rng.choice(["Present", "Absent"])))
+    conn.commit()
+    conn.close()
+
+
+def random_write(conn, rng):
+    """One random change to the tables the summary depends on"""
+    pick_session = "(SELECT session_id FROM class_sessions ORDER BY random() LIMIT 1)"
+    pick_mark = "(SELECT id FROM attendance ORDER BY random() LIMIT 1)"
+    operation = rng.randrange(9)
+    if operation == 0:
+        conn.execute("INSERT INTO class_sessions (class_id, date) VALUES (?, ?)",
+                     (rng.randrange(CLASSES), random_date(rng)))
+    elif operation == 1:
+        conn.execute(f"DELETE FROM class_sessions WHERE session_id = {pick_session}")
+    elif operation == 2:
+        conn.execute(f"UPDATE class_sessions SET date = ?, class_id = ? WHERE session_id = {pick_session}",
+                     (random_date(rng), rng.randrange(CLASSES)))
+    elif operation == 3:
+        conn.execute("""
+            INSERT INTO attendance (student_id, session_id, status) VALUES (?, ?, ?)
+            ON CONFLICT(student_id, session_id) DO NOTHING
+        """, (rng.choice(STUDENTS), rng.randint(1, 40), rng.choice(["Present", "Absent"])))
+    elif operation == 4:
+        conn.execute(f"UPDATE attendance SET status = ? WHERE id = {pick_mark}",
+                     (rng.choice(["Present", "Absent"]),))
+    elif operation == 5:
+        conn.execute(f"DELETE FROM attendance WHERE id = {pick_mark}")
+    elif operation == 6:
+        conn.execute("""
+            UPDATE student_courses SET status = ?
+            WHERE rowid = (SELECT rowid FROM student_courses ORDER BY random() LIMIT 1)
+        """, (rng.choice(["Active", "Dropped"]),))
+    elif operation == 7:
+        conn.execute("UPDATE classes SET semester = ? WHERE class_id = ?",
+                     (rng.choice(SEMESTERS), rng.randrange(CLASSES)))
+    else:
+        conn.execute("INSERT INTO student_courses (student_id, course_code, semester) VALUES (?, ?, ?)",
+                     (rng.choice(STUDENTS), f"C{rng.randrange(COURSES)}", rng.choice(SEMESTERS)))
+
+
+def summary_rows(conn):
+    return sorted(conn.execute("SELECT * FROM attendance_summary").fetchall())
+
+
+def expected_rows(conn):
+    """The summary recomputed from scratch, left unapplied"""
+    conn.execute("SAVEPOINT expected")
+    try:
+        conn.execute("DELETE FROM attendance_summary")
+        conn.execute(SUMMARY_REFRESH_SQL.format(filter="1 = 1"))
+        return summary_rows(conn)
+    finally:
+        conn.execute("ROLLBACK TO SAVEPOINT expected")
+        conn.execute("RELEASE SAVEPOINT expected")
+
+
+def test_summary_matches_full_refresh():
+    """The trigger-maintained summary equals a full recompute after every write"""
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "attendance.db")
+        create_database(path, rng)
+        # The random marks include repeats, which the unique index needs gone
+        assert migrate(["--db", path, "--dedupe-attendance"]) == 0
+
+        conn = sqlite3.connect(path, isolation_level=None)
+        try:
+            assert summary_rows(conn), "scratch data produced an empty summary"
+            assert summary_rows(conn) == expected_rows(conn)
+            for step in range(300):
+                random_write(conn, rng)
+                assert summary_rows(conn) == expected_rows(conn), f"summary differs after write {step}"
+        finally:
+            conn.close()
+
+
+def test_marking_does_not_recompute_cells():
+    """Attendance triggers touch one counter instead of re-running the enrollment aggregate"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "attendance.db")
+        create_database(path, random.Random(2))
+        assert migrate(["--db", path, "--dedupe-attendance"]) == 0
+
+        conn = sqlite3.connect(path)
+        try:
+            triggers = conn.execute("""
+                SELECT name, sql FROM sqlite_master
+                WHERE type = 'trigger' AND name LIKE 'trg_summary_attendance_%'
+            """).fetchall()
+        finally:
+            conn.close()
+        assert len(triggers) == 3
+        for name, sql in triggers:
+            assert "class_enrollment" not in sql and "DELETE FROM attendance_summary" not in sql, name
+
+
+if __name__ == "__main__":
+    test_summary_matches_full_refresh()
+    test_marking_does_not_recompute_cells()
+    print("✅ Attendance summary matches a full refresh")
@@ -0,0 +1,73 @@
+from admin.attendance_writer import AttendanceWriter
+
+
+class FakeDatabaseService:
+    """Records each batch; a student counts as marked once per session"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+        self.marked = set()
+        self.checkpoints = 0
+
+    def mark_attendance_batch(self, marks):
+        self.batches.append(list(marks))
+        if self.fail:
+            return None
+        results = []
+        for student_id, session_id, _ in marks:
+            results.append((student_id, session_id) not in self.marked)
+            self.marked.add((student_id, session_id))
+        return results
+
+    def checkpoint(self):
+        self.checkpoints += 1
+        return True
+
+
+def test_marks_are_written_in_batches():
+    db_service = FakeDatabaseService()
+    writer = AttendanceWriter(db_service, batch_window=0.5)
+    writer.start()
+
+    # A burst of marks goes out in one transaction; the repeat is reported as already marked
+    futures = [writer.submit(student_id, 1) for student_id in ["S01", "S02", "S01", "S03"]]
+    assert writer.flush(timeout=5)
+    assert [future.result(timeout=1) for future in futures] == [True, True, False, True]
+    assert [len(batch) for batch in db_service.batches] == [4]
+    assert db_service.checkpoints == 1
+
+    later = writer.submit("S04", 1)
+    writer.stop(timeout=5)
+    assert later.result(timeout=1) is True
+    assert [len(batch) for batch in db_service.batches] == [4, 1]
+    assert not writer.is_alive()
+
+
+def test_failed_batch_resolves_every_future_with_an_error():
+    writer = AttendanceWriter(FakeDatabaseService(fail=True), batch_window=0.05)
+    writer.start()
+    futures = [writer.submit(f"S{i:02d}", 1) for i in range(3)]
+    writer.stop(timeout=5)
+    for future in futures:
+        assert isinstance(future.exception(timeout=1), RuntimeError)
+
+
+def test_marks_after_stop_are_refused():
+    db_service = FakeDatabaseService()
+    writer = AttendanceWriter(db_service, batch_window=0.05)
+    writer.start()
+    writer.stop(timeout=5)
+
+    future = writer.submit("S01", 1)
+    assert isinstance(future.exception(timeout=1), RuntimeError)
+    assert not writer.flush(timeout=1)
+    # Stopping made the (empty) last batch durable
+    assert db_service.checkpoints == 1 and db_service.batches == []
+
+
+if __name__ == "__main__":
+    test_marks_are_written_in_batches()
+    test_failed_batch_resolves_every_future_with_an_error()
+    test_marks_after_stop_are_refused()
+    print("✅ Attendance writer tests passed")
@@ -0,0 +1,100 @@
+import os
+import sqlite3
+import tempfile
+
+import numpy as np
+
+from admin.bulk_enroll import BulkEnroller
+from admin.face_gallery import FaceGallery
+from admin.hash_index import HashIndex
+
+SCHEMA = """
+    CREATE TABLE students (student_id TEXT PRIMARY KEY, fname TEXT, lname TEXT, image_path TEXT,
+                           image_hash TEXT, face_encoding BLOB, face_only_path TEXT, course TEXT,
+                           year_of_study INTEGER, email TEXT, phone TEXT, current_semester TEXT,
+                           face_encoding_path TEXT);
+    CREATE TABLE student_courses (student_id TEXT, course_code TEXT, semester TEXT, enrollment_date TEXT);
+    CREATE TABLE activity_log (id INTEGER PRIMARY KEY, user_id TEXT, activity_type TEXT, timestamp TEXT);
+"""
+
+
+def make_enroller(directory):
+    db_path = os.path.join(directory, "attendance.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    conn.commit()
+    conn.close()
+
+    image_dir = os.path.join(directory, "student_images")
+    staging_dir = os.path.join(image_dir, ".staging")
+    os.makedirs(staging_dir)
+    enroller = BulkEnroller(db_path=db_path, encoding_dir=os.path.join(directory, "encodings"),
+                            image_dir=image_dir, workers=1)
+    return enroller, staging_dir
+
+
+def processed(enroller, staging_dir, student_id, seed):
+    """A result as the worker pool returns it, with its photo staged"""
+    filename = student_id.replace('/', '_') + ".jpg"
+    staged_path = os.path.join(staging_dir, filename)
+    final_path = os.path.join(enroller.image_dir, filename)
+    with open(staged_path, 'wb') as f:
+        f.write(b"photo")
+    row = {'student_id': student_id, 'fname': "Jane", 'lname': "Doe", 'course': "S11",
+           'year_of_study': 1, 'semester': "1.1", 'email': "", 'phone': "", 'image': filename}
+    return {
+        'row': row,
+        'image_path': final_path,
+        'face_path': None,
+        'image_hash': f"{seed:016x}",
+        'encodings': np.random.default_rng(seed).normal(size=(3, 128)).astype(np.float32),
+        'staged': [(staged_path, final_path)],
+    }
+
+
+def student_ids(enroller):
+    conn = sqlite3.connect(enroller.db_path)
+    rows = [row[0] for row in conn.execute("SELECT student_id FROM students ORDER BY student_id")]
+    conn.close()
+    return rows
+
+
+def test_failed_batch_leaves_nothing_behind():
+    with tempfile.TemporaryDirectory() as directory:
+        enroller, staging_dir = make_enroller(directory)
+        good = [processed(enroller, staging_dir, f"S11/0000{i}/24", i) for i in range(1, 3)]
+        assert enroller._write_batch(good) == 2
+
+        # The second student was enrolled by someone else after validation
+        batch = [processed(enroller, staging_dir, "S11/00003/24", 3),
+                 processed(enroller, staging_dir, "S11/00001/24", 4)]
+        assert enroller._write_batch(batch) == 0
+
+        assert student_ids(enroller) == ["S11/00001/24", "S11/00002/24"]
+        assert sorted(enroller.encoding_store.read_index()) == ["S11/00001/24", "S11/00002/24"]
+        # Staged copies are gone and the committed students' photos were not replaced
+        assert os.listdir(staging_dir) == []
+        assert not os.path.exists(batch[0]['image_path'])
+        assert os.path.exists(good[0]['image_path'])
+        assert [(reject['student_id'], reject['reason']) for reject in enroller.rejects] == \
+            [("S11/00003/24", "database_error"), ("S11/00001/24", "database_error")]
+
+
+def test_rolled_back_students_are_not_duplicates():
+    with tempfile.TemporaryDirectory() as directory:
+        enroller, staging_dir = make_enroller(directory)
+        batch = [processed(enroller, staging_dir, "S11/00005/24", 5)]
+        gallery, hash_index = FaceGallery(), HashIndex()
+        gallery.add("S11/00005/24", batch[0]['encodings'])
+        hash_index.add("S11/00005/24", 5)
+
+        enroller.hash_threshold = 6
+        enroller._forget(batch, gallery, hash_index)
+        assert "S11/00005/24" not in gallery and len(hash_index) == 0
+        assert enroller._find_duplicate(batch[0], gallery, hash_index) is None
+
+
+if __name__ == "__main__":
+    test_failed_batch_leaves_nothing_behind()
+    test_rolled_back_students_are_not_duplicates()
+    print("✅ Bulk enrollment tests passed")
@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import tempfile
+
+from config.db_connection import get_connection, close_thread_connections
+
+
+def names(path):
+    conn = sqlite3.connect(path)
+    rows = [row[0] for row in conn.execute("SELECT name FROM items ORDER BY name")]
+    conn.close()
+    return rows
+
+
+def make_database(directory):
+    path = os.path.join(directory, "scratch.db")
+    conn = get_connection(path)
+    conn.execute("CREATE TABLE items (name TEXT)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_nested_rollback_only_undoes_its_own_writes():
+    with tempfile.TemporaryDirectory() as directory:
+        path = make_database(directory)
+        outer = get_connection(path)
+        outer.execute("INSERT INTO items VALUES ('outer')")
+
+        inner = get_connection(path)
+        assert inner.nested
+        inner.execute("INSERT INTO items VALUES ('inner')")
+        inner.rollback()
+        inner.close()
+
+        outer.commit()
+        outer.close()
+        assert names(path) == ['outer']
+        close_thread_connections()
+
+
+def test_nested_commit_joins_the_outer_transaction():
+    with tempfile.TemporaryDirectory() as directory:
+        path = make_database(directory)
+        outer = get_connection(path)
+        outer.execute("INSERT INTO items VALUES ('outer')")
+
+        with get_connection(path) as inner:
+            inner.execute("INSERT INTO items VALUES ('inner')")
+        # Not on disk until the outer caller commits
+        assert names(path) == []
+
+        outer.rollback()
+        outer.close()
+        assert names(path) == []
+        close_thread_connections()
+
+
+def test_uncommitted_nested_close_is_discarded():
+    with tempfile.TemporaryDirectory() as directory:
+        path = make_database(directory)
+        outer = get_connection(path)
+        outer.execute("INSERT INTO items VALUES ('outer')")
+
+        inner = get_connection(path)
+        inner.execute("INSERT INTO items VALUES ('forgotten')")
+        inner.close()
+
+        outer.commit()
+        outer.close()
+        assert names(path) == ['outer']
+        close_thread_connections()
+
+
+def test_last_handle_rolls_back_unfinished_work():
+    with tempfile.TemporaryDirectory() as directory:
+        path = make_database(directory)
+        conn = get_connection(path)
+        conn.execute("INSERT INTO items VALUES ('abandoned')")
+        conn.close()
+
+        conn = get_connection(path)
+        assert not conn.nested and not conn.in_transaction
+        conn.close()
+        assert names(path) == []
+        close_thread_connections()
+
+
+def test_nested_handle_survives_outer_commit():
+    with tempfile.TemporaryDirectory() as directory:
+        path = make_database(directory)
+        outer = get_connection(path)
+        outer.execute("INSERT INTO items VALUES ('outer')")
+        inner = get_connection(path)
+
+        # The outer caller finishes first; the inner handle's later work still commits
+        outer.commit()
+        outer.close()
+        inner.execute("INSERT INTO items VALUES ('inner')")
+        inner.commit()
+        inner.close()
+        assert names(path) == ['inner', 'outer']
+        close_thread_connections()
+
+
+if __name__ == "__main__":
+    test_nested_rollback_only_undoes_its_own_writes()
+    test_nested_commit_joins_the_outer_transaction()
+    test_uncommitted_nested_close_is_discarded()
+    test_last_handle_rolls_back_unfinished_work()
+    test_nested_handle_survives_outer_commit()
+    print("✅ Shared connection tests passed")
@@ -0,0 +1,132 @@
+import os
+import sqlite3
+import tempfile
+
+from admin import db_migrations
+from admin.db_migrations import (
+    MIGRATIONS, MigrationError, UNIQUE_ATTENDANCE_INDEX, applied_versions,
+    check_query_plans, ensure_migrated, main as migrate, migration, run_migrations
+)
+from admin.db_service import DatabaseService
+from config.db_connection import close_thread_connections
+
+SCHEMA = """
+    CREATE TABLE students (student_id TEXT PRIMARY KEY, fname TEXT, lname TEXT, course TEXT,
+                           year_of_study INTEGER, current_semester TEXT);
+    CREATE TABLE courses (course_code TEXT PRIMARY KEY, course_name TEXT);
+    CREATE TABLE classes (class_id INTEGER PRIMARY KEY, class_name TEXT, course_code TEXT, semester TEXT);
+    CREATE TABLE class_courses (class_id INTEGER, course_code TEXT);
+    CREATE TABLE student_courses (student_id TEXT, course_code TEXT, semester TEXT,
+                                  status TEXT DEFAULT 'Active', enrollment_date TEXT);
+    CREATE TABLE class_sessions (session_id INTEGER PRIMARY KEY, class_id INTEGER, date TEXT,
+                                 start_time TEXT, end_time TEXT, status TEXT);
+    CREATE TABLE attendance (id INTEGER PRIMARY KEY, student_id TEXT, session_id INTEGER,
+                             timestamp TEXT, status TEXT);
+    CREATE TABLE class_instructors (class_id INTEGER, instructor_id INTEGER);
+    CREATE TABLE activity_log (id INTEGER PRIMARY KEY, user_id TEXT, activity_type TEXT, timestamp TEXT);
+"""
+
+
+def create_database(directory, marks=()):
+    path = os.path.join(directory, "attendance.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.executemany("INSERT INTO attendance (student_id, session_id, status) VALUES (?, ?, ?)", marks)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def has_unique_index(path):
+    conn = sqlite3.connect(path)
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?",
+                       (UNIQUE_ATTENDANCE_INDEX,)).fetchone()
+    conn.close()
+    return row is not None
+
+
+def attendance_rows(path, table="attendance"):
+    conn = sqlite3.connect(path)
+    rows = conn.execute(f"SELECT student_id, session_id, status FROM {table} ORDER BY id").fetchall()
+    conn.close()
+    return rows
+
+
+def test_migrations_run_once():
+    with tempfile.TemporaryDirectory() as directory:
+        path = create_database(directory)
+        assert run_migrations(path) == [version for version, _, _ in MIGRATIONS]
+        assert run_migrations(path) == []
+        assert applied_versions(path) == {version for version, _, _ in MIGRATIONS}
+        assert has_unique_index(path)
+
+
+def test_duplicates_are_only_removed_on_request():
+    marks = [("S1", 1, "Absent"), ("S1", 1, "Present"), ("S1", 1, "Present"), ("S2", 1, "Absent")]
+    with tempfile.TemporaryDirectory() as directory:
+        path = create_database(directory, marks)
+        run_migrations(path)
+        assert attendance_rows(path) == marks
+        assert not has_unique_index(path)
+
+        # Marking still refuses repeats without the unique index
+        service = DatabaseService(path)
+        assert service.mark_attendance_batch([("S1", 1), ("S3", 1), ("S3", 1)]) == [False, True, False]
+        close_thread_connections()
+
+        assert migrate(["--db", path, "--dedupe-attendance"]) == 0
+        assert has_unique_index(path)
+        # The first 'Present' mark wins; the others are kept in the backup table
+        assert attendance_rows(path) == [("S1", 1, "Present"), ("S2", 1, "Absent"), ("S3", 1, "Present")]
+        assert attendance_rows(path, "attendance_duplicates_backup") == [("S1", 1, "Absent"),
+                                                                          ("S1", 1, "Present")]
+
+
+def test_failed_migration_is_not_remembered():
+    @migration(999, "Always fails")
+    def _broken(cursor):
+        cursor.execute("CREATE TABLE scratch (x)")
+        cursor.execute("SELECT * FROM missing_table")
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path = create_database(directory)
+            try:
+                run_migrations(path)
+            except MigrationError:
+                pass
+            else:
+                raise AssertionError("the failing migration was not reported")
+            assert 999 not in applied_versions(path)
+
+            assert ensure_migrated(path) is False
+            assert path not in db_migrations._migrated_paths
+
+            MIGRATIONS.remove((999, "Always fails", _broken))
+            assert ensure_migrated(path) is True
+            assert path in db_migrations._migrated_paths
+    finally:
+        if (999, "Always fails", _broken) in MIGRATIONS:
+            MIGRATIONS.remove((999, "Always fails", _broken))
+
+
+def test_query_plans_use_indexes_after_migrating():
+    with tempfile.TemporaryDirectory() as directory:
+        path = create_database(directory)
+        report = check_query_plans(path)
+        assert report['mark_attendance_lookup']['full_scans']
+        # Tables created by the migrations do not exist yet
+        assert report['portal_data_version']['error']
+
+        run_migrations(path)
+        report = check_query_plans(path)
+        assert all(result['ok'] for result in report.values()), \
+            {name: result for name, result in report.items() if not result['ok']}
+
+
+if __name__ == "__main__":
+    test_migrations_run_once()
+    test_duplicates_are_only_removed_on_request()
+    test_failed_migration_is_not_remembered()
+    test_query_plans_use_indexes_after_migrating()
+    print("✅ Migration tests passed")
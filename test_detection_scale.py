@@ -0,0 +1,32 @@
+from admin.face_recognition_service import (
+    parse_detection_scale, detection_scale_for, scale_face_locations
+)
+
+
+def test_detection_scale_is_parsed_defensively():
+    assert parse_detection_scale("50") == 50.0
+    assert parse_detection_scale("0.5") == 0.5
+    assert parse_detection_scale("250") == 100.0
+    # Anything unusable means full resolution
+    for bad in ("", "abc", None, "0", "-20", "nan", "inf"):
+        assert parse_detection_scale(bad) == 100.0, bad
+
+
+def test_detection_scale_keeps_a_minimum_size():
+    assert detection_scale_for((1080, 1920, 3), 1.0) == 1.0
+    assert detection_scale_for((1080, 1920, 3), 0.5) == 0.5
+    # Half of 360 would fall below the 240 pixel floor
+    assert detection_scale_for((360, 640, 3), 0.5) == 240 / 360
+    assert detection_scale_for((200, 300, 3), 0.5) == 1.0
+
+
+def test_face_locations_are_mapped_back_and_clamped():
+    boxes = scale_face_locations([(10, 60, 50, 20), (0, 320, 180, 300)], 0.5, (360, 640, 3))
+    assert boxes == [(20, 120, 100, 40), (0, 640, 360, 600)]
+
+
+if __name__ == "__main__":
+    test_detection_scale_is_parsed_defensively()
+    test_detection_scale_keeps_a_minimum_size()
+    test_face_locations_are_mapped_back_and_clamped()
+    print("✅ Detection scale tests passed")
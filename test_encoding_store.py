@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+import tempfile
+
+import numpy as np
+
+from admin.encoding_store import EncodingStore
+
+
+def random_encodings(rng, count):
+    return rng.normal(scale=0.3, size=(count, 128)).astype(np.float32)
+
+
+def assert_gallery_matches(store, expected):
+    gallery = store.load_gallery()
+    assert sorted(gallery.student_ids) == sorted(expected)
+    for student_id, encodings in expected.items():
+        assert np.array_equal(store.get(student_id), encodings), student_id
+        # Every stored encoding is its own best match in the gallery
+        matches = gallery.best_matches(encodings, tolerance=0.05)
+        assert all(match == student_id for match, _ in matches), student_id
+
+
+def test_append_replace_and_remove():
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        store = EncodingStore(directory)
+        expected = {}
+        for i in range(10):
+            student_id = f"S{i:02d}/00001/24"
+            expected[student_id] = random_encodings(rng, i % 4 + 1)
+            store.append(student_id, expected[student_id])
+        assert_gallery_matches(store, expected)
+
+        # A later write replaces a student's encodings, a count of 0 removes them
+        expected["S03/00001/24"] = random_encodings(rng, 2)
+        store.append("S03/00001/24", expected["S03/00001/24"])
+        store.remove("S05/00001/24")
+        del expected["S05/00001/24"]
+        batch = {f"S{i:02d}/00002/24": random_encodings(rng, 3) for i in range(4)}
+        store.append_many(batch.items())
+        expected.update(batch)
+        assert_gallery_matches(store, expected)
+
+
+def test_compact_reclaims_superseded_rows():
+    rng = np.random.default_rng(1)
+    with tempfile.TemporaryDirectory() as directory:
+        store = EncodingStore(directory)
+        expected = {}
+        for round_number in range(3):
+            for i in range(6):
+                student_id = f"S{i:02d}/00001/24"
+                expected[student_id] = random_encodings(rng, round_number + 1)
+                store.append(student_id, expected[student_id])
+        store.remove("S00/00001/24")
+        del expected["S00/00001/24"]
+
+        live_rows = sum(len(encodings) for encodings in expected.values())
+        reclaimed = store.compact()
+        assert reclaimed == 6 * (1 + 2 + 3) - live_rows
+        assert store.row_count() == live_rows
+        assert not os.path.exists(store.data_path + ".tmp")
+        assert_gallery_matches(store, expected)
+
+
+def test_partial_row_is_ignored_and_overwritten():
+    rng = np.random.default_rng(2)
+    with tempfile.TemporaryDirectory() as directory:
+        store = EncodingStore(directory)
+        first = random_encodings(rng, 2)
+        store.append("S01/00001/24", first)
+
+        # An interrupted write leaves half a row behind
+        with open(store.data_path, 'ab') as f:
+            f.write(b"\0" * (EncodingStore.ROW_BYTES // 2))
+        assert store.row_count() == 2
+
+        second = random_encodings(rng, 1)
+        store.append("S02/00001/24", second)
+        assert_gallery_matches(store, {"S01/00001/24": first, "S02/00001/24": second})
+
+
+def append_students(directory, worker):
+    rng = np.random.default_rng(worker)
+    store = EncodingStore(directory)
+    for i in range(25):
+        # Each student's rows hold its own number, so misplaced rows are easy to spot
+        store.append(f"S{worker}{i:02d}/00001/24",
+                     np.full((i % 3 + 1, 128), worker * 100 + i, dtype=np.float32))
+        if rng.random() < 0.2:
+            store.compact()
+
+
+def test_processes_do_not_interleave_writes():
+    with tempfile.TemporaryDirectory() as directory:
+        processes = [multiprocessing.Process(target=append_students, args=(directory, worker))
+                     for worker in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            assert process.exitcode == 0
+
+        store = EncodingStore(directory)
+        assert len(store.read_index()) == 100
+        for worker in range(4):
+            for i in range(25):
+                encodings = store.get(f"S{worker}{i:02d}/00001/24")
+                assert len(encodings) == i % 3 + 1
+                assert np.all(encodings == worker * 100 + i)
+
+
+if __name__ == "__main__":
+    test_append_replace_and_remove()
+    test_compact_reclaims_superseded_rows()
+    test_partial_row_is_ignored_and_overwritten()
+    test_processes_do_not_interleave_writes()
+    print("✅ EncodingStore tests passed")
@@ -0,0 +1,82 @@
+import tempfile
+
+import dlib
+import numpy as np
+
+from admin.face_augmentation import FaceAugmenter
+
+BOX = (10, 50, 50, 10)
+
+
+class CountingAugmenter(FaceAugmenter):
+    """Skips the dlib models; each variant's encoding is derived from the image"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.encoded = 0
+
+    def _encode_variants(self, image, face_location):
+        self.encoded += 1
+        base = float(image.mean())
+        return np.array([np.full(128, base + i) for i in range(len(self.VARIANTS))], dtype=np.float32)
+
+
+def make_image(value):
+    return np.full((64, 64, 3), value, dtype=np.uint8)
+
+
+def test_results_are_cached_by_content():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        augmenter = CountingAugmenter(cache_dir=cache_dir)
+        first = augmenter.encode(make_image(100), face_location=BOX)
+        assert not first['cached'] and augmenter.encoded == 1
+        assert first['encodings'].shape == (len(FaceAugmenter.VARIANTS), 128)
+
+        again = augmenter.encode(make_image(100), face_location=BOX)
+        assert again['cached'] and augmenter.encoded == 1
+        assert np.array_equal(again['encodings'], first['encodings'])
+        assert again['face_locations'] == [BOX]
+
+        # A different photo, or another face in the same photo, is encoded again
+        augmenter.encode(make_image(120), face_location=BOX)
+        augmenter.encode(make_image(100), face_location=(5, 40, 40, 5))
+        assert augmenter.encoded == 3
+
+        # Another instance shares the cache on disk
+        other = CountingAugmenter(cache_dir=cache_dir)
+        assert other.encode(make_image(100), face_location=BOX)['cached'] and other.encoded == 0
+
+
+def test_cache_can_be_disabled_and_is_versioned():
+    augmenter = CountingAugmenter(cache_dir=None)
+    augmenter.encode(make_image(100), face_location=BOX)
+    assert not augmenter.encode(make_image(100), face_location=BOX)['cached']
+    assert augmenter.encoded == 2
+
+    class FewerVariants(CountingAugmenter):
+        VARIANTS = ("original", "darker")
+
+    # Changing the variants must not reuse entries computed with the old ones
+    assert FewerVariants(cache_dir=None).cache_key(b"photo") != augmenter.cache_key(b"photo")
+
+
+def test_rotated_landmarks_follow_the_pixels():
+    rect = dlib.rectangle(20, 20, 40, 40)
+    parts = dlib.points()
+    for x, y in [(25, 25), (35, 25), (30, 30), (25, 35), (35, 35)]:
+        parts.append(dlib.point(x, y))
+    shape = dlib.full_object_detection(rect, parts)
+
+    # A pure shift by (5, -3)
+    matrix = np.array([[1.0, 0.0, 5.0], [0.0, 1.0, -3.0]])
+    moved = FaceAugmenter._transform_shape(shape, matrix, 64, 64)
+    assert [(p.x, p.y) for p in moved.parts()] == [(p.x + 5, p.y - 3) for p in shape.parts()]
+    # dlib boxes are inclusive: 21 pixels wide, centred on the shifted centre (35, 27)
+    assert (moved.rect.left(), moved.rect.top()) == (24, 16)
+
+
+if __name__ == "__main__":
+    test_results_are_cached_by_content()
+    test_cache_can_be_disabled_and_is_versioned()
+    test_rotated_landmarks_follow_the_pixels()
+    print("✅ Face augmentation tests passed")
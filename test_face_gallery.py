@@ -0,0 +1,110 @@
+import numpy as np
+
+from admin.face_gallery import FaceGallery
+
+
+def make_gallery(seed=0, students=12):
+    """Gallery with a different number of encodings per student, plus the plain data"""
+    rng = np.random.default_rng(seed)
+    encodings = {}
+    gallery = FaceGallery(capacity=4)  # Small on purpose: adding must grow it
+    for i in range(students):
+        student_id = f"S{i:02d}/00001/24"
+        encodings[student_id] = rng.normal(scale=0.3, size=(rng.integers(1, 7), 128)).astype(np.float32)
+        gallery.add(student_id, encodings[student_id])
+    return gallery, encodings
+
+
+def test_distances_match_direct_computation():
+    gallery, encodings = make_gallery()
+    probes = np.random.default_rng(1).normal(scale=0.3, size=(5, 128)).astype(np.float32)
+    rows = np.vstack([encodings[student_id] for student_id in gallery.student_ids])
+
+    expected = np.linalg.norm(probes[:, None, :] - rows[None, :, :], axis=2)
+    assert np.allclose(gallery.distances(probes), expected, atol=1e-4)
+
+
+def test_reductions_match_per_student_loops():
+    gallery, encodings = make_gallery()
+    probes = np.random.default_rng(2).normal(scale=0.3, size=(4, 128)).astype(np.float32)
+    trim = FaceGallery.TRIM_FRACTION
+
+    for reduction in FaceGallery.REDUCTIONS:
+        scores = gallery.student_scores(probes, reduction=reduction)
+        for column, student_id in enumerate(gallery.student_ids):
+            for row, probe in enumerate(probes):
+                dists = np.sort(np.linalg.norm(encodings[student_id] - probe, axis=1))
+                if reduction == "min":
+                    expected = dists[0]
+                elif reduction == "mean":
+                    expected = dists.mean()
+                else:
+                    cut = int(np.floor(len(dists) * trim))
+                    expected = dists[cut:len(dists) - cut].mean()
+                assert abs(scores[row, column] - expected) < 1e-4, (reduction, student_id)
+
+
+def test_rank_students_orders_by_score():
+    gallery, _ = make_gallery()
+    probe = np.random.default_rng(3).normal(scale=0.3, size=128)
+    scores = gallery.student_scores(probe, reduction="mean")[0]
+
+    ranking = gallery.rank_students(probe, reduction="mean", top_n=3)[0]
+    best = np.argsort(scores)[:3]
+    assert ranking['student_ids'] == [gallery.student_ids[i] for i in best]
+    assert abs(ranking['margin'] - (scores[best[1]] - scores[best[0]])) < 1e-5
+
+
+def test_trim_fraction_is_validated():
+    gallery, _ = make_gallery()
+    probe = np.zeros(128, dtype=np.float32)
+    for trim in (-0.1, 0.5, 0.8):
+        try:
+            gallery.student_scores(probe, reduction="trimmed_mean", trim=trim)
+        except ValueError:
+            continue
+        raise AssertionError(f"trim={trim} was accepted")
+    # Other reductions ignore the trim fraction
+    gallery.student_scores(probe, reduction="min", trim=0.8)
+
+
+def test_single_candidate_has_infinite_margin():
+    gallery = FaceGallery()
+    gallery.add("S01/00001/24", np.zeros((2, 128), dtype=np.float32))
+    ranking = gallery.rank_students(np.zeros(128, dtype=np.float32), top_n=2)[0]
+    assert ranking['student_ids'] == ["S01/00001/24"]
+    assert ranking['margin'] == float('inf')
+
+
+def test_best_matches_respects_tolerance():
+    gallery, encodings = make_gallery()
+    known = encodings[gallery.student_ids[2]][0]
+    stranger = np.full(128, 5.0, dtype=np.float32)
+
+    matches = gallery.best_matches([known, stranger], tolerance=0.05)
+    assert matches[0][0] == gallery.student_ids[2]
+    assert matches[1][0] is None and matches[1][1] > 0.05
+    assert FaceGallery().best_matches(known, tolerance=0.6) == [(None, 1.0)]
+
+
+def test_remove_keeps_other_students_intact():
+    gallery, encodings = make_gallery()
+    removed = gallery.student_ids[3]
+    assert gallery.remove(removed) == len(encodings[removed])
+    assert removed not in gallery
+
+    probe = encodings[gallery.student_ids[5]][0]
+    student_id, distance = gallery.best_matches(probe, tolerance=0.05)[0]
+    assert student_id == gallery.student_ids[5]
+    assert distance < 0.01
+
+
+if __name__ == "__main__":
+    test_distances_match_direct_computation()
+    test_reductions_match_per_student_loops()
+    test_rank_students_orders_by_score()
+    test_trim_fraction_is_validated()
+    test_single_candidate_has_infinite_margin()
+    test_best_matches_respects_tolerance()
+    test_remove_keeps_other_students_intact()
+    print("✅ FaceGallery tests passed")
@@ -0,0 +1,61 @@
+import numpy as np
+
+from admin.face_quality import FaceQualityScorer, QualityStats
+
+SIZE = FaceQualityScorer.SAMPLE_SIZE
+BOX = (50, 50 + SIZE, 50 + SIZE, 50)
+
+
+def symmetric(half):
+    """Face-sized patch whose right half mirrors the left half"""
+    return np.hstack([half, half[:, ::-1]])
+
+
+def frame_with(face):
+    frame = np.full((200, 200, 3), 128, dtype=np.uint8)
+    top, right, bottom, left = BOX
+    frame[top:bottom, left:right] = np.clip(face, 0, 255).astype(np.uint8)[:, :, None]
+    return frame
+
+
+def test_each_check_rejects_its_own_problem():
+    rng = np.random.default_rng(0)
+    texture = rng.integers(60, 190, size=(SIZE, SIZE // 2)).astype(np.float32)
+    gradient = np.repeat(np.linspace(30, 220, SIZE)[:, None], SIZE // 2, axis=1)
+
+    faces = {
+        None: symmetric(texture),
+        "too_dark": symmetric(texture * 0.2),
+        "too_bright": symmetric(texture / 4 + 200),
+        "low_contrast": symmetric(120 + rng.integers(0, 15, size=(SIZE, SIZE // 2))),
+        "blurry": symmetric(gradient),
+        "off_angle": np.hstack([texture, rng.integers(60, 190, size=(SIZE, SIZE // 2))]),
+    }
+    scorer = FaceQualityScorer()
+    for expected, face in faces.items():
+        assert scorer.check(frame_with(face), BOX) == expected, expected
+
+    # Size is judged on the box alone
+    assert scorer.check(frame_with(faces[None]), (50, 80, 80, 50)) == "too_small"
+
+
+def test_filter_splits_faces_and_stats_count_reasons():
+    rng = np.random.default_rng(1)
+    texture = rng.integers(60, 190, size=(SIZE, SIZE // 2)).astype(np.float32)
+    frame = frame_with(symmetric(texture))
+    small = (0, 20, 20, 0)
+
+    accepted, rejected = FaceQualityScorer().filter(frame, [BOX, small])
+    assert accepted == [BOX]
+    assert rejected == [(small, "too_small")]
+
+    stats = QualityStats()
+    stats.add(2, [reason for _, reason in rejected])
+    stats.add(3, ["blurry", "too_small"])
+    assert stats.as_dict() == {'checked': 5, 'rejected': 3, 'reasons': {'too_small': 2, 'blurry': 1}}
+
+
+if __name__ == "__main__":
+    test_each_check_rejects_its_own_problem()
+    test_filter_splits_faces_and_stats_count_reasons()
+    print("✅ Face quality tests passed")
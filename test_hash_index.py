@@ -0,0 +1,97 @@
+import random
+
+from admin.hash_index import (
+    HashIndex, hash_to_int, duplicate_threshold, expected_hex_char_distance, hex_chars_to_bits,
+    DEFAULT_DUPLICATE_BITS
+)
+
+
+def flip_bits(value, count, rng):
+    for bit in rng.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+
+def make_hashes(seed=0, count=500):
+    """Random 64-bit hashes, a third of them near-duplicates of earlier ones"""
+    rng = random.Random(seed)
+    hashes = {}
+    for i in range(count):
+        if hashes and i % 3 == 0:
+            value = flip_bits(rng.choice(list(hashes.values())), rng.randint(0, 12), rng)
+        else:
+            value = rng.getrandbits(64)
+        hashes[f"key{i}"] = value
+    return hashes
+
+
+def linear_scan(hashes, value, radius):
+    return {(key, bin(stored ^ value).count("1")) for key, stored in hashes.items()
+            if bin(stored ^ value).count("1") <= radius}
+
+
+def test_query_matches_linear_scan():
+    hashes = make_hashes()
+    index = HashIndex.from_items(hashes.items())
+    rng = random.Random(1)
+
+    # Small radii probe the substring tables, large ones fall back to a scan
+    for radius in (0, 3, 7, 10, 15, 24):
+        for _ in range(40):
+            value = flip_bits(rng.choice(list(hashes.values())), rng.randint(0, 10), rng)
+            matches = index.query(value, radius)
+            assert set(matches) == linear_scan(hashes, value, radius), radius
+            assert [distance for _, distance in matches] == sorted(distance for _, distance in matches)
+
+
+def test_remove_and_replace():
+    hashes = make_hashes(seed=2, count=200)
+    index = HashIndex.from_items(hashes.items())
+    rng = random.Random(3)
+
+    for key in rng.sample(sorted(hashes), 120):
+        index.remove(key)
+        del hashes[key]
+    replaced = sorted(hashes)[0]
+    hashes[replaced] = rng.getrandbits(64)
+    index.add(replaced, hashes[replaced])
+
+    assert len(index) == len(hashes)
+    for value in list(hashes.values())[:30]:
+        assert set(index.query(value, 8)) == linear_scan(hashes, value, 8)
+
+
+def test_hex_hashes_are_parsed():
+    index = HashIndex.from_items([("a", "ff00ff00ff00ff00"), ("b", "not a hash")])
+    assert len(index) == 1
+    assert index.nearest(hash_to_int("ff00ff00ff00ff01"), 2) == ("a", 1)
+
+
+def hex_char_distance(a, b):
+    return sum(x != y for x, y in zip(f"{a:016x}", f"{b:016x}"))
+
+
+def test_bit_thresholds_keep_the_hex_character_sensitivity():
+    rng = random.Random(4)
+    for bits in (1, 4, 8, 14, 32):
+        pairs = [(a, flip_bits(a, bits, rng)) for a in (rng.getrandbits(64) for _ in range(400))]
+        measured = sum(hex_char_distance(a, b) for a, b in pairs) / len(pairs)
+        assert abs(measured - expected_hex_char_distance(bits)) < 0.3, bits
+
+    # 10 hex characters used to be the default and 5 the lowest threshold
+    assert DEFAULT_DUPLICATE_BITS == hex_chars_to_bits(10) == 14
+    assert hex_chars_to_bits(5) == 6
+    assert duplicate_threshold([]) == DEFAULT_DUPLICATE_BITS
+
+    # Unrelated hashes differ in ~15 of 16 characters, a third of which is 5
+    hashes = make_hashes(seed=5, count=300)
+    index = HashIndex.from_items((key, value) for key, value in hashes.items() if int(key[3:]) % 3)
+    assert duplicate_threshold(index.sample_distances(pairs=100, seed=0)) == 6
+
+
+if __name__ == "__main__":
+    test_query_matches_linear_scan()
+    test_remove_and_replace()
+    test_hex_hashes_are_parsed()
+    test_bit_thresholds_keep_the_hex_character_sensitivity()
+    print("✅ HashIndex tests passed")
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import time
+
+from student_portal import report_jobs as report_jobs_module
+from student_portal.report_jobs import ReportJobs
+
+STUDENT = "S01/00001/24"
+
+
+def fake_render(html, output_path):
+    """Stands in for WeasyPrint; a report body of "fail" raises"""
+    if html == "fail":
+        raise ValueError("bad report")
+    with open(output_path, 'w') as f:
+        f.write(html)
+    return output_path
+
+
+def make_jobs(directory):
+    jobs = ReportJobs()
+    jobs.cache_dir = directory
+    jobs.max_workers = 1
+    return jobs
+
+
+def wait_for(jobs, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while jobs.status(STUDENT, job_id)['status'] == 'pending':
+        assert time.time() < deadline, "report job never finished"
+        time.sleep(0.05)
+    return jobs.status(STUDENT, job_id)
+
+
+def test_job_ids_and_paths():
+    first = ReportJobs.job_id(STUDENT, {'course': 'C1'}, (1, 0), '2025-01-05')
+    assert first == ReportJobs.job_id(STUDENT, {'course': 'C1'}, (1, 0), '2025-01-05')
+    # New data or another day gives a new report
+    assert first != ReportJobs.job_id(STUDENT, {'course': 'C1'}, (2, 0), '2025-01-05')
+    assert first != ReportJobs.job_id(STUDENT, {'course': 'C1'}, (1, 0), '2025-01-06')
+
+    jobs = make_jobs("/reports")
+    assert jobs.report_path(STUDENT, first) == os.path.join("/reports", "S01_00001_24", f"{first}.pdf")
+    for bad in (None, "", "../" + first[3:], first.upper(), first + "0"):
+        assert jobs.report_path(STUDENT, bad) is None, bad
+
+
+def test_reports_are_rendered_once():
+    original = report_jobs_module.render_pdf
+    report_jobs_module.render_pdf = fake_render
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            jobs = make_jobs(directory)
+            job_id = ReportJobs.job_id(STUDENT, {}, (1, 0), '2025-01-05')
+            assert jobs.status(STUDENT, job_id)['status'] == 'missing'
+
+            assert jobs.submit(STUDENT, job_id, "<html>report</html>") == job_id
+            assert wait_for(jobs, job_id) == {'status': 'done', 'error': None}
+            path = jobs.cached(STUDENT, job_id)
+            with open(path) as f:
+                assert f.read() == "<html>report</html>"
+
+            # A rendered report is served as is, and only to its owner
+            jobs.submit(STUDENT, job_id, "<html>again</html>")
+            with open(path) as f:
+                assert f.read() == "<html>report</html>"
+            assert jobs.status("S02/00001/24", job_id)['status'] == 'missing'
+
+            failing = ReportJobs.job_id(STUDENT, {}, (2, 0), '2025-01-05')
+            jobs.submit(STUDENT, failing, "fail")
+            assert wait_for(jobs, failing) == {'status': 'failed', 'error': "bad report"}
+            assert jobs.cached(STUDENT, failing) is None
+            jobs._executor.shutdown()
+    finally:
+        report_jobs_module.render_pdf = original
+
+
+def test_prune_removes_old_reports():
+    with tempfile.TemporaryDirectory() as directory:
+        jobs = make_jobs(directory)
+        old, fresh = (ReportJobs.job_id(STUDENT, {}, (version, 0), '2025-01-05') for version in (1, 2))
+        for job_id in (old, fresh):
+            path = jobs.report_path(STUDENT, job_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write("pdf")
+        stale = time.time() - jobs.max_age - 60
+        os.utime(jobs.report_path(STUDENT, old), (stale, stale))
+        jobs._jobs[old] = {'student_id': STUDENT, 'status': 'failed', 'error': "x", 'created': stale}
+
+        jobs.prune()
+        assert jobs.cached(STUDENT, old) is None
+        assert jobs.cached(STUDENT, fresh)
+        assert old not in jobs._jobs
+
+
+if __name__ == "__main__":
+    test_job_ids_and_paths()
+    test_reports_are_rendered_once()
+    test_prune_removes_old_reports()
+    print("✅ Report job tests passed")
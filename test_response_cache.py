@@ -0,0 +1,100 @@
+import os
+import sqlite3
+import tempfile
+import time
+
+from flask import Flask
+from flask_login import LoginManager, UserMixin, login_user
+
+from admin.db_migrations import run_migrations
+from student_portal.cache import FileBackend, MemoryBackend, ResponseCache
+from student_portal.models.db import close_db
+
+
+class PortalUser(UserMixin):
+    def __init__(self, student_id):
+        self.id = student_id
+
+
+def test_memory_backend_evicts_and_expires():
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", "page a", ttl=60)
+    backend.set("b", "page b", ttl=60)
+    assert backend.get("a") == "page a"
+    backend.set("c", "page c", ttl=60)
+    # "b" was the least recently used entry
+    assert backend.get("b") is None
+    assert backend.get("a") == "page a" and backend.get("c") == "page c"
+
+    backend.set("old", "stale", ttl=-1)
+    assert backend.get("old") is None
+
+
+def test_file_backend_round_trip():
+    with tempfile.TemporaryDirectory() as directory:
+        backend = FileBackend(directory)
+        backend.set("ab12", {"page": "<html>"}, ttl=60)
+        assert FileBackend(directory).get("ab12") == {"page": "<html>"}
+
+        backend.set("cd34", "stale", ttl=-1)
+        assert backend.get("cd34") is None
+        assert not os.path.exists(backend._path("cd34"))
+
+        with open(backend._path("ab12"), 'wb') as f:
+            f.write(b"not a pickle")
+        assert backend.get("ab12") is None
+
+        backend.set("ef56", "page", ttl=60)
+        backend.clear()
+        assert backend.get("ef56") is None
+
+
+def make_app(directory):
+    db_path = os.path.join(directory, "attendance.db")
+    run_migrations(db_path)
+    app = Flask(__name__)
+    app.config.update(DATABASE=db_path, SECRET_KEY="test", RESPONSE_CACHE_BACKEND="memory")
+    app.teardown_appcontext(close_db)
+    LoginManager(app).user_loader(PortalUser)
+    return app
+
+
+def test_pages_are_cached_until_the_data_version_changes():
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(directory)
+        cache = ResponseCache(app)
+        renders = []
+
+        @cache.cached("dashboard")
+        def dashboard():
+            renders.append(time.time())
+            return f"page {len(renders)}"
+
+        def request_page(student_id="S01/00001/24", query=""):
+            with app.test_request_context(f"/dashboard{query}"):
+                login_user(PortalUser(student_id))
+                return dashboard()
+
+        assert request_page() == "page 1"
+        assert request_page() == "page 1"
+        # Other arguments and other students get their own entries
+        assert request_page(query="?week=2") == "page 2"
+        assert request_page(student_id="S02/00001/24") == "page 3"
+
+        # Marking attendance bumps the student's data version
+        conn = sqlite3.connect(app.config['DATABASE'])
+        conn.execute("INSERT INTO data_versions (scope, version) VALUES ('S01/00001/24', 1)")
+        conn.commit()
+        conn.close()
+        assert request_page() == "page 4"
+
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['bypassed']) == (1, 4, 0)
+        assert stats['hit_ratio'] == 0.2
+
+
+if __name__ == "__main__":
+    test_memory_backend_evicts_and_expires()
+    test_file_backend_round_trip()
+    test_pages_are_cached_until_the_data_version_changes()
+    print("✅ Response cache tests passed")
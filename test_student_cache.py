@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import tempfile
+
+from admin.db_service import DatabaseService
+from config.db_connection import close_thread_connections
+
+SCHEMA = """
+    CREATE TABLE students (student_id TEXT PRIMARY KEY, fname TEXT, lname TEXT, course TEXT,
+                           year_of_study INTEGER, current_semester TEXT);
+    CREATE TABLE classes (class_id INTEGER PRIMARY KEY, class_name TEXT, course_code TEXT, semester TEXT);
+    CREATE TABLE class_courses (class_id INTEGER, course_code TEXT);
+    CREATE TABLE student_courses (student_id TEXT, course_code TEXT, semester TEXT,
+                                  status TEXT DEFAULT 'Active', enrollment_date TEXT);
+    CREATE TABLE class_sessions (session_id INTEGER PRIMARY KEY, class_id INTEGER, date TEXT,
+                                 start_time TEXT, end_time TEXT, status TEXT);
+    CREATE TABLE attendance (id INTEGER PRIMARY KEY, student_id TEXT, session_id INTEGER,
+                             timestamp TEXT, status TEXT);
+"""
+
+STUDENTS = [f"S{i:02d}/00001/24" for i in range(8)]
+
+
+def create_database(directory):
+    path = os.path.join(directory, "attendance.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.executemany("INSERT INTO students VALUES (?, ?, 'Student', 'C1', 1, '1.1')",
+                     [(student_id, f"First{i}") for i, student_id in enumerate(STUDENTS)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def rename(path, student_id, fname):
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE students SET fname = ? WHERE student_id = ?", (fname, student_id))
+    conn.commit()
+    conn.close()
+
+
+def cached_ids():
+    return [student_id for _, student_id in DatabaseService._student_cache]
+
+
+def test_names_are_cached_until_invalidated():
+    DatabaseService.invalidate_student_cache()
+    with tempfile.TemporaryDirectory() as directory:
+        path = create_database(directory)
+        service = DatabaseService(path)
+        assert service.get_student_name(STUDENTS[0]) == "First0 Student"
+        assert service.get_student_name("S99/00001/24") == "Unknown"
+
+        # Served from the cache, so a rename is not seen until the entry is dropped
+        rename(path, STUDENTS[0], "Renamed")
+        assert service.get_student_name(STUDENTS[0]) == "First0 Student"
+        DatabaseService.invalidate_student_cache(STUDENTS[0])
+        assert service.get_student_name(STUDENTS[0]) == "Renamed Student"
+        close_thread_connections()
+    DatabaseService.invalidate_student_cache()
+
+
+def test_least_recently_used_students_are_evicted():
+    DatabaseService.invalidate_student_cache()
+    with tempfile.TemporaryDirectory() as directory:
+        service = DatabaseService(create_database(directory))
+        service.STUDENT_CACHE_SIZE = 4
+
+        assert service.preload_student_names(STUDENTS[:4]) == 4
+        assert service.preload_student_names(STUDENTS[:4]) == 0
+        # Touching the oldest entry keeps it; the next oldest goes instead
+        service.get_student_name(STUDENTS[0])
+        service.get_student_name(STUDENTS[4])
+        assert cached_ids() == [STUDENTS[2], STUDENTS[3], STUDENTS[0], STUDENTS[4]]
+
+        service.preload_student_names(STUDENTS[5:])
+        assert cached_ids() == [STUDENTS[4]] + STUDENTS[5:]
+        close_thread_connections()
+    DatabaseService.invalidate_student_cache()
+
+
+if __name__ == "__main__":
+    test_names_are_cached_until_invalidated()
+    test_least_recently_used_students_are_evicted()
+    print("✅ Student cache tests passed")
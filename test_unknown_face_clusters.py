@@ -0,0 +1,61 @@
+import os
+import random
+import tempfile
+
+import numpy as np
+
+from admin.unknown_face_index import UnknownFaceIndex
+from admin.unknown_face_clusters import UnknownFaceClusters
+
+
+def random_hashes(rng):
+    return tuple(rng.getrandbits(64) for _ in range(3))
+
+
+def encoding_at(offset):
+    """Encodings along one axis, so distances between them are easy to read"""
+    encoding = np.zeros(128, dtype=np.float32)
+    encoding[0] = offset
+    return encoding
+
+
+def save_crop(directory, filename):
+    # Only the file name matters to the index; an empty file stands in for the crop
+    open(os.path.join(directory, filename), 'wb').close()
+
+
+def add_crop(index, clusters, directory, filename, encoding, rng):
+    hashes = random_hashes(rng)
+    save_crop(directory, filename)
+    index.add(filename, hashes, encoding)
+    return clusters.add(filename, encoding, hashes[0])
+
+
+def test_clusters_grow_and_split():
+    rng = random.Random(2)
+    with tempfile.TemporaryDirectory() as directory:
+        index = UnknownFaceIndex(directory)
+        clusters = UnknownFaceClusters(directory, eps=0.5, index=index)
+
+        # a - b - d form a chain: a and d are only linked through b
+        add_crop(index, clusters, directory, "a.jpg", encoding_at(0.0), rng)
+        add_crop(index, clusters, directory, "c.jpg", encoding_at(5.0), rng)
+        add_crop(index, clusters, directory, "b.jpg", encoding_at(0.4), rng)
+        cluster = add_crop(index, clusters, directory, "d.jpg", encoding_at(0.8), rng)
+        assert sorted(cluster['members']) == ["a.jpg", "b.jpg", "d.jpg"]
+        assert [c['size'] for c in clusters.update()] == [3, 1]
+        assert clusters.matching_cluster(encoding_at(0.1))['id'] == cluster['id']
+        assert clusters.matching_cluster(encoding_at(3.0)) is None
+
+        os.remove(os.path.join(directory, "b.jpg"))
+        groups = sorted(sorted(c['members']) for c in clusters.update())
+        assert groups == [["a.jpg"], ["c.jpg"], ["d.jpg"]]
+
+        # A fresh instance picks up the saved assignments
+        restored = UnknownFaceClusters(directory, eps=0.5, index=UnknownFaceIndex(directory))
+        assert sorted(sorted(c['members']) for c in restored.update()) == groups
+
+
+if __name__ == "__main__":
+    test_clusters_grow_and_split()
+    print("✅ Unknown face cluster tests passed")
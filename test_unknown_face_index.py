@@ -0,0 +1,76 @@
+import os
+import random
+import tempfile
+
+import numpy as np
+
+from admin.unknown_face_index import UnknownFaceIndex
+
+
+def flip_bits(value, count, rng):
+    for bit in rng.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+
+def random_hashes(rng):
+    return tuple(rng.getrandbits(64) for _ in range(3))
+
+
+def encoding_at(offset):
+    """Encodings along one axis, so distances between them are easy to read"""
+    encoding = np.zeros(128, dtype=np.float32)
+    encoding[0] = offset
+    return encoding
+
+
+def save_crop(directory, filename):
+    # Only the file name matters to the index; an empty file stands in for the crop
+    open(os.path.join(directory, filename), 'wb').close()
+
+
+def test_duplicates_by_hash_and_by_face():
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        index = UnknownFaceIndex(directory)
+        stored = random_hashes(rng)
+        save_crop(directory, "a.jpg")
+        index.add("a.jpg", stored, encoding_at(0.0))
+
+        near = tuple(flip_bits(value, 3, rng) for value in stored)
+        assert index.find_duplicate(near, encoding_at(5.0))[:2] == ("a.jpg", "hash")
+
+        # Borderline hashes only count with a matching face
+        borderline = tuple(flip_bits(value, 15, rng) for value in stored)
+        assert index.find_duplicate(borderline, encoding_at(0.2))[:2] == ("a.jpg", "face")
+        assert index.find_duplicate(borderline, encoding_at(5.0)) is None
+        assert index.find_duplicate(borderline) is None
+        assert index.find_duplicate(random_hashes(rng), encoding_at(0.0)) is None
+
+
+def test_index_follows_the_directory():
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as directory:
+        index = UnknownFaceIndex(directory)
+        for name in ("a.jpg", "b.jpg", "c.jpg"):
+            save_crop(directory, name)
+            index.add(name, random_hashes(rng), encoding_at(len(index)))
+
+        # Reloaded from the sidecar file without touching the images
+        reloaded = UnknownFaceIndex(directory)
+        assert reloaded.filenames == ["a.jpg", "b.jpg", "c.jpg"]
+        assert np.array_equal(reloaded.encoding_for("b.jpg"), encoding_at(1.0))
+
+        os.remove(os.path.join(directory, "b.jpg"))
+        reloaded.sync()
+        assert reloaded.filenames == ["a.jpg", "c.jpg"]
+        assert reloaded.encoding_for("b.jpg") is None
+
+        index.remove(["a.jpg"])
+        assert "a.jpg" not in index.filenames
+
+
+if __name__ == "__main__":
+    test_duplicates_by_hash_and_by_face()
+    test_index_follows_the_directory()
+    print("✅ Unknown face index tests passed")
@@ -9,6 +9,8 @@ import numpy as np
 import os
 import json
 
+from config.db_connection import get_connection
+
 class AttendanceQueries:
     def __init__(self, db_path=None):
         """Initialize with path to database"""
@@ -17,9 +19,8 @@ class AttendanceQueries:
     def get_connection(self):
         """Get a database connection"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row  # Enable row factory for named columns
-            return conn
+            # Shared per-thread connection; cursors get named columns via sqlite3.Row
+            return get_connection(self.db_path, row_factory=sqlite3.Row)
         except sqlite3.Error as e:
             print(f"Database connection error: {e}")
             return None
@@ -149,7 +150,7 @@ class AttendanceQueries:
                 ORDER BY cs.start_time
             """
             
-            return pd.read_sql_query(query, conn, params=(date,))
+            return pd.read_sql_query(query, conn.raw_connection, params=(date,))
         except sqlite3.Error as e:
             print(f"Error fetching daily attendance: {e}")
             return pd.DataFrame()
@@ -187,7 +188,7 @@ class AttendanceQueries:
                 ORDER BY cs.date, cs.start_time
             """
             
-            return pd.read_sql_query(query, conn, params=(course_code, start_date, end_date))
+            return pd.read_sql_query(query, conn.raw_connection, params=(course_code, start_date, end_date))
         except sqlite3.Error as e:
             print(f"Error fetching course attendance: {e}")
             return pd.DataFrame()
@@ -236,7 +237,7 @@ class AttendanceQueries:
                 
             query += " ORDER BY cs.date, cs.start_time, student_name"
             
-            return pd.read_sql_query(query, conn, params=params)
+            return pd.read_sql_query(query, conn.raw_connection, params=params)
         except sqlite3.Error as e:
             print(f"Error fetching student attendance: {e}")
             return pd.DataFrame()
@@ -281,7 +282,7 @@ class AttendanceQueries:
                 ORDER BY cs.date
             """
             
-            return pd.read_sql_query(query, conn, params=params)
+            return pd.read_sql_query(query, conn.raw_connection, params=params)
         except sqlite3.Error as e:
             print(f"Error fetching class attendance stats: {e}")
             return pd.DataFrame()
@@ -333,7 +334,7 @@ class AttendanceQueries:
                 ORDER BY i.instructor_name, c.course_code
             """
             
-            return pd.read_sql_query(query, conn, params=params)
+            return pd.read_sql_query(query, conn.raw_connection, params=params)
         except sqlite3.Error as e:
             print(f"Error fetching instructor attendance stats: {e}")
             return pd.DataFrame()
@@ -386,7 +387,7 @@ class AttendanceQueries:
                 ORDER BY cs.date
             """
             
-            return pd.read_sql_query(query, conn, params=params)
+            return pd.read_sql_query(query, conn.raw_connection, params=params)
         except sqlite3.Error as e:
             print(f"Error fetching attendance trends: {e}")
             return pd.DataFrame()
@@ -447,7 +448,7 @@ class AttendanceQueries:
                     END
             """
             
-            return pd.read_sql_query(query, conn, params=params)
+            return pd.read_sql_query(query, conn.raw_connection, params=params)
         except sqlite3.Error as e:
             print(f"Error fetching attendance by time of day: {e}")
             return pd.DataFrame()
@@ -488,7 +489,7 @@ class AttendanceQueries:
                 ORDER BY attendance_rate DESC
             """
             
-            return pd.read_sql_query(query, conn, params=(start_date, end_date))
+            return pd.read_sql_query(query, conn.raw_connection, params=(start_date, end_date))
         except sqlite3.Error as e:
             print(f"Error fetching comparative attendance: {e}")
             return pd.DataFrame()
@@ -517,7 +518,7 @@ class AttendanceQueries:
                 ORDER BY student_name
             """
             
-            return pd.read_sql_query(query, conn, params=(session_id,))
+            return pd.read_sql_query(query, conn.raw_connection, params=(session_id,))
         except sqlite3.Error as e:
             print(f"Error fetching attendance details: {e}")
             return pd.DataFrame()